@@ -11,25 +11,19 @@ DATASET_NAME="$2"
 BACKUP_DIR="knowledge_base/live_kg_backups"
 BACKUP_FILE="$BACKUP_DIR/backup_$(date +\%Y_\%m_\%d-\%H_\%M_\%S).nt.gz"
 KG_SNAPSHOT_FILE="$BACKUP_DIR/kg_snapshot_$(date +\%Y_\%m_\%d-\%H_\%M_\%S).txt"
+KG_STRUCTURED_SNAPSHOT_FILE="$BACKUP_DIR/kg_snapshot_$(date +\%Y_\%m_\%d-\%H_\%M_\%S).jsonl.gz"
 
-# construct URL for backup request
-BACKUP_URL="$FUSEKI_URL/$DATASET_NAME/data?graph=default"
-
-# trigger backup using curl and compress the result using gzip
-curl -H "Accept: application/n-triples" "$BACKUP_URL" | gzip > "$BACKUP_FILE"
-
-# check HTTP response code to ensure the backup was successful (200 OK)
-HTTP_STATUS=$(curl -s -o /dev/null -w "%{http_code}" "$BACKUP_URL")
-
-echo "HTTP status: $HTTP_STATUS"
-
-# check if file was successfully created
-if [ -s "$BACKUP_FILE" ]; then
+# stream the dataset once (gzip compressed and hashed on the fly) - checks the HTTP status and the completeness of the
+# dump in the same pass and only creates the backup file if it was successful - the triples are sorted (canonical
+# backup), which improves the compression and allows streaming diffs between backups
+if python nesy_diag_ontology/backup.py --kg-url "$FUSEKI_URL" --dataset "$DATASET_NAME" --output "$BACKUP_FILE" --canonical; then
   echo "backup completed successfully"
 else
   echo "backup failed"
+  exit 1
 fi
 
+# create the snapshot from the backup itself (no further queries, consistent with the backup)
 echo "creating KG snapshot.."
-python nesy_diag_ontology/knowledge_snapshot.py --perspective expert >> "$KG_SNAPSHOT_FILE"
-python nesy_diag_ontology/knowledge_snapshot.py --perspective diag >> "$KG_SNAPSHOT_FILE"
+python nesy_diag_ontology/knowledge_snapshot.py --perspective all --from-file "$BACKUP_FILE" > "$KG_SNAPSHOT_FILE"
+python nesy_diag_ontology/structured_snapshot.py --perspective all --from-file "$BACKUP_FILE" | gzip > "$KG_STRUCTURED_SNAPSHOT_FILE"
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Dict, BinaryIO, Tuple
+
+import requests
+
+from nesy_diag_ontology.canonical_backup import ExternalSorter
+from nesy_diag_ontology.config import FUSEKI_URL, DATA_ENDPOINT
+
+COMPRESSION_SUFFIXES = {"gzip": ".nt.gz", "zstd": ".nt.zst", "none": ".nt"}
+# well-formed N-Triples statement: IRI / blank node subject, IRI predicate, IRI / blank node / literal object
+TRIPLE_PATTERN = re.compile(
+    rb'(?:<[^>]*>|_:\S+)[ \t]+<[^>]*>[ \t]+(?:<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:\^\^<[^>]*>|@[A-Za-z0-9-]+)?)[ \t]*\.[ \t]*\r?'
+)
+COUNT_QUERY = "SELECT (COUNT(*) AS ?n) WHERE { ?s ?p ?o }"
+
+
+def open_compressed_writer(f: BinaryIO, compression: str) -> BinaryIO:
+    """
+    Wraps the specified file in a compressing writer.
+
+    :param f: binary file to be written
+    :param compression: compression [gzip | zstd | none]
+    :return: writer (closing it does not close the file)
+    """
+    if compression == "gzip":
+        # level of the `gzip` command line tool - considerably faster than the maximum level
+        return gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6)
+    if compression == "zstd":
+        # optional dependency, only needed for zstd compressed backups
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False)
+    return f
+
+
+def count_triples(lines: bytes) -> int:
+    """
+    Counts the triples of the specified complete N-Triples lines - each line has to be a well-formed statement (or
+    empty / comment).
+
+    :param lines: N-Triples lines (each terminated by a line break)
+    :return: number of triples
+    """
+    count = 0
+    for line in lines.split(b"\n")[:-1]:
+        if len(line.strip()) == 0 or line.startswith(b"#"):
+            continue
+        if TRIPLE_PATTERN.fullmatch(line) is None:
+            raise RuntimeError("malformed triple in dump: " + line[:200].decode("utf-8", "replace"))
+        count += 1
+    return count
+
+
+def count_server_triples(kg_url: str, sparql_endpoint: str) -> int:
+    """
+    Queries the number of triples stored in the default graph of the dataset.
+
+    :param kg_url: URL of the knowledge graph server
+    :param sparql_endpoint: SPARQL endpoint of the dataset, e.g., /nesy_diag/sparql
+    :return: number of triples
+    """
+    res = requests.post(
+        kg_url + sparql_endpoint, data=COUNT_QUERY.encode(),
+        headers={'Content-Type': 'application/sparql-query', 'Accept': 'application/sparql-results+json'}
+    )
+    if res.status_code != 200:
+        raise RuntimeError("triple count query failed - HTTP status code: " + str(res.status_code))
+    return int(res.json()["results"]["bindings"][0]["n"]["value"])
+
+
+def backup_knowledge_graph(
+        kg_url: str, data_endpoint: str, path: str, compression: str = "gzip", chunk_size: int = 1024 * 1024,
+        canonical: bool = False, max_run_bytes: int = 256 * 1024 * 1024
+) -> Dict:
+    """
+    Backs up the knowledge graph in a single pass - the N-Triples dump is streamed, compressed and hashed on the fly.
+
+    The backup is written to a temporary file that only replaces the specified path if the download was successful
+    (HTTP status, complete transfer, complete last triple) and verified, i.e., there are no partial backups. Each line
+    of the dump has to be a well-formed triple, and their number has to match the number of triples the server holds
+    (counted before and after the dump - if the KG was modified in the meantime, any number in between is accepted).
+
+    :param kg_url: URL of the knowledge graph server
+    :param data_endpoint: data endpoint of the dataset, e.g., /nesy_diag/data
+    :param path: path of the backup file
+    :param compression: compression [gzip | zstd | none]
+    :param chunk_size: number of bytes read from the stream at a time
+    :param canonical: whether the triples should be sorted (external merge sort) and deduplicated before compression -
+                      compresses better, yields the same backup (and hash) for the same KG and allows streaming diffs
+    :param max_run_bytes: memory used for the lines of a sorted run before it is spilled to disk (canonical backups)
+    :return: metadata of the backup (also written to `<path>.json`)
+    """
+    url = kg_url + data_endpoint + "?graph=default"
+    sparql_endpoint = data_endpoint.rsplit("/", 1)[0] + "/sparql"
+    start = time.perf_counter()
+    sha256 = hashlib.sha256()
+    num_bytes, num_triples, last_byte = 0, 0, b"\n"
+    # incomplete last line of the previous chunk
+    remainder = b""
+    server_triples_before = count_server_triples(kg_url, sparql_endpoint)
+    with requests.get(url, headers={'Accept': 'application/n-triples'}, stream=True) as res:
+        if res.status_code != 200:
+            raise RuntimeError("backup of " + url + " failed - HTTP status code: " + str(res.status_code))
+        sorter = None
+        try:
+            # the runs of canonical backups are spilled next to the backup
+            sorter = ExternalSorter(max_run_bytes, os.path.dirname(os.path.abspath(path))) if canonical else None
+            with open(path + ".tmp", "wb") as f:
+                writer = open_compressed_writer(f, compression)
+                for chunk in res.iter_content(chunk_size=chunk_size):
+                    if sorter is None:
+                        sha256.update(chunk)
+                        writer.write(chunk)
+                        lines_end = chunk.rfind(b"\n") + 1
+                        num_triples += count_triples(remainder + chunk[:lines_end])
+                        remainder = chunk[lines_end:] if lines_end > 0 else remainder + chunk
+                    else:
+                        sorter.add_chunk(chunk)
+                    num_bytes += len(chunk)
+                    last_byte = chunk[-1:]
+                if sorter is not None:
+                    for line in sorter.merge():
+                        sha256.update(line)
+                        writer.write(line)
+                        num_triples += count_triples(line)
+                if writer is not f:
+                    writer.close()
+                f.flush()
+                os.fsync(f.fileno())
+            if last_byte != b"\n":
+                raise RuntimeError("backup of " + url + " failed - incomplete last triple")
+            # the content length refers to the encoded (e.g., compressed) transfer, if there is a content encoding
+            content_length = res.headers.get("Content-Length") if "Content-Encoding" not in res.headers else None
+            if content_length is not None and int(content_length) != num_bytes:
+                raise RuntimeError("backup of " + url + " failed - incomplete transfer")
+            server_triples_after = count_server_triples(kg_url, sparql_endpoint)
+            expected = sorted([server_triples_before, server_triples_after])
+            if not expected[0] <= num_triples <= expected[1]:
+                raise RuntimeError(
+                    "backup of " + url + " failed - " + str(num_triples) + " triples dumped, but the server holds "
+                    + " / ".join(str(n) for n in sorted(set(expected)))
+                )
+        except BaseException:
+            if sorter is not None:
+                # spilled runs of an interrupted download
+                sorter.close()
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+            raise
+    os.replace(path + ".tmp", path)
+    duration = time.perf_counter() - start
+    metadata = {
+        "url": url,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "compression": compression,
+        "canonical": canonical,
+        "triples": num_triples,
+        "server_triples": server_triples_after,
+        "bytes": num_bytes,
+        "compressed_bytes": os.path.getsize(path),
+        "sha256": sha256.hexdigest(),
+        "duration_s": round(duration, 3),
+        "throughput_mb_s": round(num_bytes / (1024 * 1024) / duration, 2) if duration > 0 else 0.0
+    }
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=4)
+    return metadata
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Single-pass streaming backup of the knowledge graph')
+    parser.add_argument('--kg-url', type=str, default=FUSEKI_URL, help='URL of the knowledge graph server')
+    parser.add_argument(
+        '--dataset', type=str, default=DATA_ENDPOINT.split("/")[1], help='name of the dataset, e.g., nesy_diag'
+    )
+    parser.add_argument(
+        '--backup-dir', type=str, default="knowledge_base/live_kg_backups", help='directory of the backups'
+    )
+    parser.add_argument('--output', type=str, default="", help='path of the backup (default: timestamp in backup dir)')
+    parser.add_argument(
+        '--compression', type=str, choices=list(COMPRESSION_SUFFIXES), default="gzip", help='compression of the backup'
+    )
+    parser.add_argument('--canonical', action='store_true', help='sort and deduplicate the triples (canonical backup)')
+    parser.add_argument('--max-run-mb', type=int, default=256, help='memory per sorted run in MB (canonical backup)')
+    args = parser.parse_args()
+
+    backup_name = "backup_" + datetime.now().strftime("%Y_%m_%d-%H_%M_%S") + COMPRESSION_SUFFIXES[args.compression]
+    backup_path = args.output if args.output != "" else os.path.join(args.backup_dir, backup_name)
+    try:
+        backup_metadata = backup_knowledge_graph(
+            args.kg_url, "/" + args.dataset + "/data", backup_path, args.compression,
+            canonical=args.canonical, max_run_bytes=args.max_run_mb * 1024 * 1024
+        )
+    except (RuntimeError, ImportError, requests.exceptions.RequestException) as e:
+        print(e)
+        sys.exit(1)
+    print("backup completed successfully:", backup_path)
+    for key, val in backup_metadata.items():
+        print("\t" + key + ":", val)
@@ -0,0 +1,461 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import inspect
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from nesy_diag_ontology.config import DATA_ENDPOINT
+from nesy_diag_ontology.expert_knowledge_enhancer import ExpertKnowledgeEnhancer
+from nesy_diag_ontology.knowledge_graph_query_tool import KnowledgeGraphQueryTool
+from nesy_diag_ontology.ntriples import iter_triples, open_n_triples
+from nesy_diag_ontology.ontology_instance_generator import OntologyInstanceGenerator
+from nesy_diag_ontology.restore import restore_knowledge_graph
+from nesy_diag_ontology.slow_query_log import QUERY_LOG
+from nesy_diag_ontology.standin_server import StandInServer
+from nesy_diag_ontology.synthetic_kg import SyntheticKnowledgeGraph, RDF_TYPE
+
+# parameters of the synthetic KGs (cf. `SyntheticKnowledgeGraph`) - approx. 3k, 22k and 124k triples
+SCALES = {
+    "small": {"components": 30, "error_codes": 20, "diag_entities": 5, "diagnoses": 50},
+    "medium": {"components": 129, "error_codes": 50, "diag_entities": 20, "diagnoses": 400},
+    "large": {"components": 300, "error_codes": 200, "diag_entities": 100, "diagnoses": 2000}
+}
+SIGNAL_LENGTH = 100
+# time budget per benchmarked operation in seconds (slow queries of the stand-in, large scales)
+MAX_SECONDS = 10.0
+# maximum number of samples per class / property the query parameters are drawn from
+MAX_SAMPLES = 1000
+
+
+class BenchmarkSamples:
+    """
+    Instances and literals of a generated KG the parameters of the benchmarked operations are drawn from.
+    """
+
+    def __init__(self, seed: int) -> None:
+        self.rand = random.Random(seed)
+        # class -> instances (local names), (class, property) -> literals
+        self.instances: Dict[str, List[str]] = {}
+        self.literals: Dict[Tuple[str, str], List[str]] = {}
+        # (error code, suspect component) pairs of the diagnostic associations
+        self.associations: List[Tuple[str, str]] = []
+        # suspect component -> ID of the model that assesses it
+        self.models: Dict[str, str] = {}
+
+    @staticmethod
+    def from_file(path: str, seed: int) -> "BenchmarkSamples":
+        """
+        Collects the samples of the specified KG file (streamed).
+
+        :param path: path of the N-Triples file
+        :param seed: seed of the random generator (sampling + parameter selection)
+        :return: samples
+        """
+        samples = BenchmarkSamples(seed)
+        rdf_type = RDF_TYPE[1:-1]
+        # instance -> class, error code / component instance -> name
+        classes, names, seen = {}, {}, {}
+        has_association, points_to, assesses = {}, {}, {}
+        with open_n_triples(path) as f:
+            for subj, pred, obj, is_literal, _ in iter_triples(f):
+                subj = subj.split("#")[-1]
+                if pred == rdf_type:
+                    classes[subj] = obj.split("#")[-1]
+                    samples.add(samples.instances, classes[subj], subj, seen)
+                    continue
+                pred = pred.split("#")[-1]
+                if is_literal:
+                    samples.add(samples.literals, (classes.get(subj, ""), pred), obj, seen)
+                    if pred in ("code", "component_name", "model_id"):
+                        names[subj] = obj
+                elif pred == "hasAssociation":
+                    has_association[obj.split("#")[-1]] = subj
+                elif pred == "pointsTo":
+                    points_to[subj] = obj.split("#")[-1]
+                elif pred == "assesses":
+                    assesses[subj] = obj.split("#")[-1]
+        for diag_association, error_code in has_association.items():
+            comp = points_to.get(diag_association, "")
+            if error_code in names and comp in names:
+                samples.associations.append((names[error_code], names[comp]))
+        for model, comp in assesses.items():
+            if model in names and comp in names:
+                samples.models[names[comp]] = names[model]
+        return samples
+
+    def add(self, samples: Dict, key, value: str, seen: Dict) -> None:
+        # reservoir sampling, i.e., uniform samples of arbitrarily large KGs
+        seen[key] = seen.get(key, 0) + 1
+        values = samples.setdefault(key, [])
+        if len(values) < MAX_SAMPLES:
+            values.append(value)
+        else:
+            idx = self.rand.randrange(seen[key])
+            if idx < MAX_SAMPLES:
+                values[idx] = value
+
+    def instance(self, *classes: str) -> str:
+        return self.rand.choice([inst for cls in classes for inst in self.instances.get(cls, [])])
+
+    def literal(self, cls: str, prop: str) -> str:
+        return self.rand.choice(self.literals[(cls, prop)])
+
+    def association(self) -> Tuple[str, str]:
+        return self.rand.choice(self.associations)
+
+
+# parameters of the `query_*` methods of the `KnowledgeGraphQueryTool` (by parameter name)
+QUERY_PARAMETERS: Dict[str, Callable[[BenchmarkSamples], str]] = {
+    'error_code': lambda s: s.literal("ErrorCode", "code"),
+    'code': lambda s: s.literal("ErrorCode", "code"),
+    'component_name': lambda s: s.literal("SuspectComponent", "component_name"),
+    'comp': lambda s: s.literal("SuspectComponent", "component_name"),
+    'sub_component_name': lambda s: s.literal("SubComponent", "component_name"),
+    'set_name': lambda s: s.literal("ComponentSet", "set_name"),
+    'comp_set_name': lambda s: s.literal("ComponentSet", "set_name"),
+    'chan_name': lambda s: s.literal("Channel", "channel_name"),
+    'model_id': lambda s: s.literal("Model", "model_id"),
+    'entity_id': lambda s: s.literal("DiagEntity", "entity_id"),
+    'desc': lambda s: s.literal("FaultCondition", "condition_desc"),
+    'component_id': lambda s: s.instance("SuspectComponent"),
+    'fault_condition_id': lambda s: s.instance("FaultCondition"),
+    'diag_entity_id': lambda s: s.instance("DiagEntity"),
+    'diag_log_id': lambda s: s.instance("DiagLog"),
+    'fault_path_id': lambda s: s.instance("FaultPath"),
+    'sensor_signal_id': lambda s: s.instance("SensorSignal"),
+    'heatmap_id': lambda s: s.instance("Heatmap"),
+    'signal_classification_id': lambda s: s.instance("SignalClassification"),
+    'manual_inspection_id': lambda s: s.instance("ManualInspection"),
+    'classification_id': lambda s: s.instance("SignalClassification", "ManualInspection")
+}
+
+
+def query_arguments(method: Callable, samples: BenchmarkSamples) -> List[str]:
+    """
+    Draws the arguments of the specified query method from the samples - error code / component pairs are drawn
+    from the diagnostic associations (i.e., the queries have results).
+
+    :param method: `query_*` method of the `KnowledgeGraphQueryTool`
+    :param samples: samples of the KG
+    :return: arguments
+    """
+    params = [p for p in inspect.signature(method).parameters if p not in ("self", "verbose")]
+    if params == ["error_code", "comp"]:
+        return list(samples.association())
+    return [QUERY_PARAMETERS[param](samples) for param in params]
+
+
+def benchmark_queries(kg_url: str, samples: BenchmarkSamples, repeat: int, max_seconds: float) -> Dict[str, Dict]:
+    """
+    Measures the latencies of all `query_*` methods of the `KnowledgeGraphQueryTool` (one warm-up call each).
+
+    :param kg_url: URL of the knowledge graph server
+    :param samples: samples of the KG (parameters)
+    :param repeat: number of measured calls per method
+    :param max_seconds: time budget per method - no further calls once exceeded (at least one measured call)
+    :return: latency percentiles per method
+    """
+    qt = KnowledgeGraphQueryTool(kg_url=kg_url, verbose=False)
+    results = {}
+    for name, method in inspect.getmembers(qt, inspect.ismethod):
+        if not name.startswith("query_"):
+            continue
+        method(*query_arguments(method, samples), verbose=False)
+        latencies = []
+        while len(latencies) < repeat and sum(latencies) < max_seconds:
+            args = query_arguments(method, samples)
+            start = time.perf_counter()
+            method(*args, verbose=False)
+            latencies.append(time.perf_counter() - start)
+        results[name] = latency_stats(latencies)
+    return results
+
+
+def latency_stats(latencies: List[float]) -> Dict:
+    if len(latencies) == 0:
+        # no measured calls (`--repeat 0`)
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {
+        "count": len(latencies), "p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3)
+    }
+
+
+# write operations: name -> (preparation (not measured), operation) for the i-th call
+WriteOperation = Callable[[ExpertKnowledgeEnhancer, OntologyInstanceGenerator, BenchmarkSamples, int], object]
+WRITE_OPERATIONS: Dict[str, Tuple[WriteOperation, WriteOperation]] = {
+    'add_channel_to_knowledge_graph': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: e.add_channel_to_knowledge_graph("BENCH_CHAN" + str(i))
+    ),
+    'add_component_to_knowledge_graph': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: e.add_component_to_knowledge_graph(
+            "BENCH_C" + str(i), [s.literal("SuspectComponent", "component_name")],
+            [s.literal("Channel", "channel_name")], [s.literal("Channel", "channel_name")]
+        )
+    ),
+    'add_sub_component_to_knowledge_graph': (
+        # the channel of a subcomponent has the name of the subcomponent
+        lambda e, g, s, i: e.add_channel_to_knowledge_graph("BENCH_SUB" + str(i)),
+        lambda e, g, s, i: e.add_sub_component_to_knowledge_graph(
+            "BENCH_SUB" + str(i), s.literal("SuspectComponent", "component_name")
+        )
+    ),
+    'add_component_set_to_knowledge_graph': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: e.add_component_set_to_knowledge_graph(
+            "BENCH_S" + str(i), list({s.literal("SuspectComponent", "component_name") for _ in range(3)}),
+            [s.literal("SuspectComponent", "component_name")]
+        )
+    ),
+    'add_model_to_knowledge_graph': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: e.add_model_to_knowledge_graph(
+            SIGNAL_LENGTH, "z-norm", "measure x", "BENCH_M" + str(i), s.literal("SuspectComponent", "component_name"),
+            [(0, s.literal("Channel", "channel_name"))], "CNN"
+        )
+    ),
+    'add_error_code_to_knowledge_graph': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: e.add_error_code_to_knowledge_graph(
+            "BENCH_E" + str(i), "fault condition of BENCH_E" + str(i),
+            list(dict.fromkeys(s.literal("SuspectComponent", "component_name") for _ in range(3)))
+        )
+    ),
+    'extend_knowledge_graph_with_diag_entity_data': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: g.extend_knowledge_graph_with_diag_entity_data("BENCH_ENTITY" + str(i))
+    ),
+    'extend_knowledge_graph_with_sensor_signal': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: g.extend_knowledge_graph_with_sensor_signal(
+            [round(s.rand.uniform(0, 20), 2) for _ in range(SIGNAL_LENGTH)]
+        )
+    ),
+    'extend_knowledge_graph_with_heatmap': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: g.extend_knowledge_graph_with_heatmap(
+            "GradCAM", [round(s.rand.random(), 2) for _ in range(SIGNAL_LENGTH)]
+        )
+    ),
+    'extend_knowledge_graph_with_parallel_rec_signal_set': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: g.extend_knowledge_graph_with_parallel_rec_signal_set()
+    ),
+    'extend_knowledge_graph_with_overlays_relation': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: g.extend_knowledge_graph_with_overlays_relation(
+            s.instance("Heatmap"), s.instance("SensorSignal")
+        )
+    ),
+    'extend_knowledge_graph_with_fault_path': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: g.extend_knowledge_graph_with_fault_path("C1 -> C2", s.instance("FaultCondition"))
+    ),
+    'extend_knowledge_graph_with_signal_classification': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: g.extend_knowledge_graph_with_signal_classification(
+            True, s.instance("DiagnosticAssociation"), s.literal("SuspectComponent", "component_name"),
+            round(s.rand.random(), 2), s.literal("Model", "model_id"), s.instance("SensorSignal"),
+            s.instance("Heatmap")
+        )
+    ),
+    'extend_knowledge_graph_with_manual_inspection': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: g.extend_knowledge_graph_with_manual_inspection(
+            False, s.instance("SignalClassification"), s.literal("SuspectComponent", "component_name")
+        )
+    ),
+    'extend_knowledge_graph_with_diag_log': (
+        lambda e, g, s, i: None,
+        lambda e, g, s, i: g.extend_knowledge_graph_with_diag_log(
+            "01.02.2024", [s.literal("ErrorCode", "code")], [s.instance("FaultPath")],
+            [s.instance("SignalClassification"), s.instance("ManualInspection")], s.instance("DiagEntity")
+        )
+    )
+}
+
+
+def write_operations() -> List[str]:
+    """
+    Returns the names of all `add_*_to_knowledge_graph` / `extend_knowledge_graph_with_*` methods, i.e., the write
+    operations to be benchmarked.
+
+    :return: names of the write operations
+    """
+    names = [name for name, _ in inspect.getmembers(ExpertKnowledgeEnhancer, inspect.isfunction)
+             if name.startswith("add_") and name.endswith("_to_knowledge_graph")]
+    names += [name for name, _ in inspect.getmembers(OntologyInstanceGenerator, inspect.isfunction)
+              if name.startswith("extend_knowledge_graph_with_")]
+    return names
+
+
+def benchmark_writes(kg_url: str, samples: BenchmarkSamples, repeat: int, max_seconds: float) -> Dict[str, Dict]:
+    """
+    Measures the throughput of all write operations (sequential calls, one warm-up call each). The KG is extended,
+    i.e., the writes should be benchmarked after the queries.
+
+    :param kg_url: URL of the knowledge graph server
+    :param samples: samples of the KG (parameters)
+    :param repeat: number of measured calls per operation
+    :param max_seconds: time budget per operation - no further calls once exceeded (at least one measured call)
+    :return: throughput and latency percentiles per operation
+    """
+    enhancer = ExpertKnowledgeEnhancer(kg_url=kg_url, verbose=False)
+    instance_gen = OntologyInstanceGenerator(kg_url=kg_url, verbose=False)
+    results = {}
+    for name in write_operations():
+        prepare, operation = WRITE_OPERATIONS[name]
+        for i in range(repeat + 1):
+            prepare(enhancer, instance_gen, samples, i)
+        operation(enhancer, instance_gen, samples, 0)
+        latencies = []
+        for i in range(1, repeat + 1):
+            if sum(latencies) >= max_seconds:
+                break
+            start = time.perf_counter()
+            operation(enhancer, instance_gen, samples, i)
+            latencies.append(time.perf_counter() - start)
+        ops_per_s = round(len(latencies) / sum(latencies), 2) if sum(latencies) > 0 else None
+        results[name] = {"ops_per_s": ops_per_s, **latency_stats(latencies)}
+    return results
+
+
+def run_benchmark(
+        scales: List[str], repeat: int, max_seconds: float = MAX_SECONDS, seed: int = 42, kg_url: str = ""
+) -> Dict[str, Dict]:
+    """
+    Runs the benchmark suite - for each scale, the synthetic KG is generated and loaded into an in-process stand-in
+    server (or the specified server), then the queries and write operations are measured.
+
+    :param scales: scales of the synthetic KGs (cf. `SCALES`)
+    :param repeat: number of measured calls per operation
+    :param max_seconds: time budget per operation (measured calls)
+    :param seed: seed of the synthetic KGs and the parameter selection
+    :param kg_url: URL of an empty knowledge graph server (only a single scale), empty: in-process stand-in
+    :return: results per scale
+    """
+    assert kg_url == "" or len(scales) == 1
+    missing = [name for name in write_operations() if name not in WRITE_OPERATIONS]
+    if len(missing) > 0:
+        raise ValueError("no benchmark for the write operations: " + ", ".join(missing))
+    results = {}
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            kg_file = os.path.join(tmp_dir, scale + ".nt")
+            num_triples = SyntheticKnowledgeGraph(
+                **SCALES[scale], signal_length=SIGNAL_LENGTH, seed=seed
+            ).write(kg_file)
+            samples = BenchmarkSamples.from_file(kg_file, seed)
+            print("scale", scale + ":", num_triples, "triples", file=sys.stderr)
+            if kg_url != "":
+                restore_knowledge_graph(kg_file, kg_url, DATA_ENDPOINT)
+                results[scale] = run_scale(kg_url, samples, repeat, max_seconds, num_triples)
+            else:
+                with StandInServer() as server:
+                    server.load(kg_file)
+                    results[scale] = run_scale(server.url, samples, repeat, max_seconds, num_triples)
+    return results
+
+
+def run_scale(kg_url: str, samples: BenchmarkSamples, repeat: int, max_seconds: float, num_triples: int) -> Dict:
+    return {
+        "triples": num_triples,
+        "queries": benchmark_queries(kg_url, samples, repeat, max_seconds),
+        "writes": benchmark_writes(kg_url, samples, repeat, max_seconds)
+    }
+
+
+def compare_to_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[Dict]:
+    """
+    Compares the results to the baseline - the p50 latency of queries / the throughput of write operations must not
+    be worse than the baseline by more than the tolerance.
+
+    :param results: results of the current run (per scale)
+    :param baseline: results of the baseline run (per scale)
+    :param tolerance: tolerated relative slowdown, e.g., 0.25
+    :return: comparison per scale and operation (ratio > 1: slower than baseline)
+    """
+    comparison = []
+    for scale, scale_results in results.items():
+        if scale not in baseline:
+            continue
+        for kind, metric, slower in [("queries", "p50_ms", lambda cur, base: cur / base),
+                                     ("writes", "ops_per_s", lambda cur, base: base / cur)]:
+            for name, stats in scale_results[kind].items():
+                base_stats = baseline[scale][kind].get(name)
+                if base_stats is None or stats[metric] is None or base_stats[metric] is None:
+                    # not measured in one of the runs
+                    continue
+                ratio = slower(stats[metric], base_stats[metric])
+                comparison.append({
+                    "scale": scale, "operation": name, "metric": metric, "baseline": base_stats[metric],
+                    "current": stats[metric], "ratio": round(ratio, 3), "ok": ratio <= 1 + tolerance
+                })
+    return comparison
+
+
+def print_results(results: Dict[str, Dict]) -> None:
+    for scale, scale_results in results.items():
+        print(scale, "(" + str(scale_results["triples"]) + " triples)")
+        print("\tp50 ms\t\tp95 ms\t\tp99 ms\t\tquery")
+        for name, stats in scale_results["queries"].items():
+            print("\t" + "\t\t".join(str(stats[key]) for key in ["p50_ms", "p95_ms", "p99_ms"]) + "\t\t" + name)
+        print("\tops/s\t\tp50 ms\t\tp95 ms\t\twrite operation")
+        for name, stats in scale_results["writes"].items():
+            print("\t" + "\t\t".join(str(stats[key]) for key in ["ops_per_s", "p50_ms", "p95_ms"]) + "\t\t" + name)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark suite - query latencies and write throughput on synthetic KGs (no Fuseki needed)'
+    )
+    parser.add_argument(
+        '--scale', type=str, action='append', choices=list(SCALES), help='scale(s) of the synthetic KG (default: all)'
+    )
+    parser.add_argument('--repeat', type=int, default=10, help='number of measured calls per operation')
+    parser.add_argument('--max-seconds', type=float, default=MAX_SECONDS, help='time budget per operation')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the synthetic KGs and the parameters')
+    parser.add_argument(
+        '--kg-url', type=str, default="", help='use the specified (empty) KG server instead of the in-process stand-in'
+    )
+    parser.add_argument('--output', type=str, default="", help='write the results to the specified JSON file')
+    parser.add_argument('--baseline', type=str, default="", help='compare the results to the specified JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='tolerated relative slowdown w.r.t. baseline')
+    args = parser.parse_args()
+
+    # slow queries are what is measured here, not to be reported individually
+    QUERY_LOG.threshold_s = float("inf")
+    benchmark_results = run_benchmark(args.scale or list(SCALES), args.repeat, args.max_seconds, args.seed, args.kg_url)
+    print_results(benchmark_results)
+    if args.output != "":
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump({"python": sys.version.split()[0], "results": benchmark_results}, out, indent=4)
+    if args.baseline != "":
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline_results = json.load(f)["results"]
+        baseline_comparison = compare_to_baseline(benchmark_results, baseline_results, args.tolerance)
+        for entry in baseline_comparison:
+            if not entry["ok"]:
+                print(
+                    "SLOWER\t" + entry["scale"] + " - " + entry["operation"] + ":", entry["metric"], entry["current"],
+                    "(baseline: " + str(entry["baseline"]) + ", x" + str(entry["ratio"]) + ")"
+                )
+        print(
+            sum(entry["ok"] for entry in baseline_comparison), "of", len(baseline_comparison),
+            "operations within tolerance of the baseline"
+        )
+        if not all(entry["ok"] for entry in baseline_comparison):
+            sys.exit(1)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+from typing import Dict, List, BinaryIO
+
+import numpy as np
+
+from nesy_diag_ontology.columnar_triple_store import ColumnarTripleStore
+from nesy_diag_ontology.config import FUSEKI_URL, DATA_ENDPOINT, ONTOLOGY_PREFIX
+from nesy_diag_ontology.knowledge_graph_index import KnowledgeGraphIndex
+from nesy_diag_ontology.ntriples import iter_triples
+
+BINARY_SNAPSHOT_MAGIC = b"NESYKGB1"
+BINARY_SNAPSHOT_VERSION = 1
+# sections are aligned to cache lines
+SECTION_ALIGNMENT = 64
+# concepts of the expert knowledge layer
+EXPERT_CLASSES = ['ErrorCode', 'FaultCondition', 'DiagnosticAssociation', 'SuspectComponent', 'ComponentSet']
+
+
+def write_section(f: BinaryIO, data: bytes) -> int:
+    """
+    Writes the specified section at the next aligned offset.
+
+    :param f: binary snapshot file
+    :param data: content of the section
+    :return: offset of the section
+    """
+    offset = -f.tell() % SECTION_ALIGNMENT + f.tell()
+    f.write(b"\0" * (offset - f.tell()))
+    f.write(data)
+    return offset
+
+
+def write_binary_snapshot(store: ColumnarTripleStore, path: str) -> Dict:
+    """
+    Writes the specified store as binary KG snapshot that can be memory-mapped and used in place (`MappedTripleStore`).
+
+    Layout: magic | header length (uint64) | JSON header (predicates, sections) | aligned sections - the SPO / POS / OSP
+    columns, the term offsets (in ID order), the term IDs in bytewise order of the terms (lookups) and the UTF-8
+    encoded terms, i.e., large literals are only read when they are accessed.
+
+    :param store: columnar triple store (e.g., of a backup)
+    :param path: path of the binary snapshot
+    :return: header of the binary snapshot
+    """
+    store.freeze()
+    encoded = [term.encode("utf-8") for term in store.terms]
+    term_offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(term) for term in encoded], out=term_offsets[1:])
+    sorted_terms = np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=store.spo[0].dtype)
+    sections = {
+        **{"spo_" + name: col for name, col in zip("spo", store.spo)},
+        **{"pos_" + name: col for name, col in zip("pos", store.pos)},
+        **{"osp_" + name: col for name, col in zip("osp", store.get_osp())},
+        "term_offsets": term_offsets,
+        "sorted_terms": sorted_terms
+    }
+    header = {
+        "version": BINARY_SNAPSHOT_VERSION,
+        "ontology_prefix": store.ontology_prefix,
+        "predicates": store.preds,
+        "triples": len(store.spo[0]),
+        "terms": len(encoded),
+        "sections": {}
+    }
+    # the header is written last (section offsets), a fixed-size slot is reserved for it
+    header_slot = len(json.dumps(header)) + 64 * (len(sections) + 1) + 1024
+    with open(path + ".tmp", "wb") as f:
+        f.write(b"\0" * (len(BINARY_SNAPSHOT_MAGIC) + 8 + header_slot))
+        for name, col in sections.items():
+            header["sections"][name] = [write_section(f, col.tobytes()), col.dtype.str, len(col)]
+        term_data_offset = write_section(f, b"")
+        for term in encoded:
+            f.write(term)
+        header["sections"]["term_data"] = [term_data_offset, "|u1", int(term_offsets[-1])]
+        encoded_header = json.dumps(header).encode("utf-8")
+        f.seek(0)
+        f.write(BINARY_SNAPSHOT_MAGIC + len(encoded_header).to_bytes(8, "little") + encoded_header)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+    return header
+
+
+class MappedTripleStore(ColumnarTripleStore):
+    """
+    Read-only columnar triple store that uses a memory-mapped binary KG snapshot in place.
+
+    Nothing is parsed or sorted on startup and the pages are shared via the page cache, i.e., any number of worker
+    processes can open the same snapshot at (almost) no cost. The file stays mapped as long as the store exists.
+    """
+
+    def __init__(self, path: str, literal_limits: Dict[str, int] = None) -> None:
+        """
+        Opens (maps) the specified binary KG snapshot.
+
+        :param path: path of the binary snapshot
+        :param literal_limits: optional maximum number of characters returned per literal of the given predicates
+                               (local names) - the literals are stored in full
+        """
+        super().__init__(literal_limits)
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic_len = len(BINARY_SNAPSHOT_MAGIC)
+        if self.buffer[:magic_len] != BINARY_SNAPSHOT_MAGIC:
+            raise ValueError(path + " is not a binary KG snapshot")
+        header_len = int.from_bytes(self.buffer[magic_len:magic_len + 8], "little")
+        header = json.loads(self.buffer[magic_len + 8:magic_len + 8 + header_len].decode("utf-8"))
+        if header["version"] != BINARY_SNAPSHOT_VERSION:
+            raise ValueError(path + " has an unsupported version: " + str(header["version"]))
+        self.ontology_prefix = header["ontology_prefix"]
+        self.preds = header["predicates"]
+        self.pred_ids = {pred: pred_id for pred_id, pred in enumerate(self.preds)}
+        self.num_terms = header["terms"]
+        sections = {
+            name: np.frombuffer(self.buffer, dtype=np.dtype(dtype), count=count, offset=offset)
+            for name, (offset, dtype, count) in header["sections"].items() if name != "term_data"
+        }
+        self.spo = tuple(sections["spo_" + name] for name in "spo")
+        self.pos = tuple(sections["pos_" + name] for name in "pos")
+        self.osp = tuple(sections["osp_" + name] for name in "osp")
+        self.term_offsets = sections["term_offsets"]
+        self.sorted_terms = sections["sorted_terms"]
+        self.term_data_offset = header["sections"]["term_data"][0]
+
+    def add(self, subj: str, pred: str, obj: str, is_literal: bool = False) -> None:
+        raise RuntimeError("binary KG snapshots are read-only - create a new one from a backup / dump")
+
+    def term_bytes(self, term_id: int) -> bytes:
+        """
+        Returns the UTF-8 encoded term of the specified ID (read from the mapped file).
+
+        :param term_id: term ID
+        :return: encoded term
+        """
+        start = self.term_data_offset + int(self.term_offsets[term_id])
+        return self.buffer[start:self.term_data_offset + int(self.term_offsets[term_id + 1])]
+
+    def lookup(self, term: str) -> int:
+        # binary search over the term IDs in bytewise order of the terms
+        encoded = term.encode("utf-8")
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term_bytes(int(self.sorted_terms[mid])) < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_terms and self.term_bytes(int(self.sorted_terms[lo])) == encoded:
+            return int(self.sorted_terms[lo])
+        return -1
+
+    def term(self, term_id: int) -> str:
+        return self.term_bytes(term_id).decode("utf-8")
+
+    def objects(self, subj: str, pred: str) -> List[str]:
+        limit = self.literal_limits.get(self.ontology_prefix + pred)
+        objects = super().objects(subj, pred)
+        return objects if limit is None else [obj[:limit] for obj in objects]
+
+
+def store_from_dump(kg_url: str, data_endpoint: str, literal_limits: Dict[str, int] = None) -> ColumnarTripleStore:
+    """
+    Builds a columnar triple store of the entire KG from a streamed N-Triples dump of the server.
+
+    :param kg_url: URL of the knowledge graph server
+    :param data_endpoint: data endpoint of the dataset, e.g., /nesy_diag/data
+    :param literal_limits: optional maximum number of characters retained per literal of the given predicates
+    :return: columnar triple store
+    """
+    # not needed by processes that only open binary snapshots
+    import requests
+    url = kg_url + data_endpoint + "?graph=default"
+    store = ColumnarTripleStore(literal_limits)
+    with requests.get(url, headers={'Accept': 'application/n-triples'}, stream=True) as res:
+        if res.status_code != 200:
+            raise RuntimeError("dump of " + url + " failed - HTTP status code: " + str(res.status_code))
+        store.add_triples(iter_triples(line.decode("utf-8") for line in res.iter_lines()))
+    return store
+
+
+def load_kg_file(
+        path: str, literal_limits: Dict[str, int] = None, classes: List[str] = None
+) -> KnowledgeGraphIndex:
+    """
+    Opens the specified KG file - binary KG snapshots are mapped, backups (N-Triples) are parsed.
+
+    :param path: path of the binary snapshot or backup (`.nt` / `.nt.gz` / `.nt.zst`)
+    :param literal_limits: optional maximum number of characters retained per literal of the given predicates
+    :param classes: optional ontology classes (local names) a parsed backup is restricted to (cf.
+                    `KnowledgeGraphIndex.from_n_triples`) - binary snapshots are mapped entirely
+    :return: index of the KG
+    """
+    with open(path, "rb") as f:
+        is_binary = f.read(len(BINARY_SNAPSHOT_MAGIC)) == BINARY_SNAPSHOT_MAGIC
+    if is_binary:
+        return MappedTripleStore(path, literal_limits)
+    return KnowledgeGraphIndex.from_n_triples(path, literal_limits, classes)
+
+
+if __name__ == '__main__':
+    import requests
+    from nesy_diag_ontology.connection_controller import ConnectionController
+
+    parser = argparse.ArgumentParser(description='Memory-mapped binary KG snapshots for instant startup')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='create a binary snapshot from a backup or a live dump')
+    build_parser.add_argument('output', type=str, help='binary snapshot (.kgb)')
+    build_parser.add_argument('--from-file', type=str, default="", help='backup (.nt / .nt.gz / .nt.zst)')
+    build_parser.add_argument('--kg-url', type=str, default=FUSEKI_URL, help='URL of the knowledge graph server')
+    build_parser.add_argument(
+        '--dataset', type=str, default=DATA_ENDPOINT.split("/")[1], help='name of the dataset, e.g., nesy_diag'
+    )
+    build_parser.add_argument(
+        '--layer', type=str, choices=['all', 'expert'], default='all', help='entire KG or expert knowledge (live dump)'
+    )
+    build_parser.add_argument('--signal-limit', type=int, default=0, help='retained characters of signals (0: all)')
+    info_parser = subparsers.add_parser('info', help='open a binary snapshot and show its statistics')
+    info_parser.add_argument('snapshot', type=str, help='binary snapshot (.kgb)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        limits = {"signal": args.signal_limit} if args.signal_limit > 0 else None
+        start = time.perf_counter()
+        try:
+            if args.from_file != "":
+                kg_store = ColumnarTripleStore.from_n_triples(args.from_file, limits)
+            elif args.layer == 'expert':
+                kg_connection = ConnectionController(namespace=ONTOLOGY_PREFIX, fuseki_url=args.kg_url, verbose=False)
+                kg_store = ColumnarTripleStore.from_export(kg_connection, EXPERT_CLASSES, limits)
+            else:
+                kg_store = store_from_dump(args.kg_url, "/" + args.dataset + "/data", limits)
+        except (RuntimeError, requests.exceptions.RequestException) as e:
+            print(e)
+            sys.exit(1)
+        snapshot_header = write_binary_snapshot(kg_store, args.output)
+        print(
+            "binary snapshot with", snapshot_header["triples"], "triples and", snapshot_header["terms"], "terms:",
+            args.output, "(" + str(round(time.perf_counter() - start, 2)) + " s)"
+        )
+    else:
+        start = time.perf_counter()
+        try:
+            kg_store = MappedTripleStore(args.snapshot)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print("opened", args.snapshot, "in", round((time.perf_counter() - start) * 1000, 3), "ms")
+        print("\ttriples:", len(kg_store.spo[0]))
+        print("\tterms:", kg_store.num_terms)
+        print("\tsize:", round(os.path.getsize(args.snapshot) / (1024 * 1024), 2), "MB")
+        for class_iri, count in sorted(kg_store.class_counts().items(), key=lambda item: -item[1]):
+            print("\t\t" + class_iri.split("#")[-1] + ":", count)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import hashlib
+import os
+import uuid
+from typing import List, Union
+
+import numpy as np
+
+
+class BlobStore:
+    """
+    Local content-addressed store for large array payloads (sensor signals, heatmaps).
+
+    Each array is stored as `.npy` file named by the SHA-256 digest of its dtype, shape and content, sharded into
+    two levels of subdirectories. Identical payloads are therefore only stored once, and the arrays can be
+    memory-mapped instead of being parsed from the knowledge graph.
+    """
+
+    def __init__(self, root_dir: str) -> None:
+        """
+        Initializes the blob store.
+
+        :param root_dir: root directory of the blob store (created if not present)
+        """
+        self.root_dir = root_dir
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    @staticmethod
+    def compute_digest(arr: np.ndarray) -> str:
+        """
+        Computes the content address of the specified array.
+
+        :param arr: array to compute digest for
+        :return: SHA-256 hex digest
+        """
+        sha = hashlib.sha256()
+        sha.update(arr.dtype.str.encode())
+        sha.update(str(arr.shape).encode())
+        sha.update(np.ascontiguousarray(arr).tobytes())
+        return sha.hexdigest()
+
+    def get_path(self, digest: str) -> str:
+        """
+        Returns the path of the blob with the specified digest.
+
+        :param digest: content address of the blob
+        :return: path of the `.npy` file
+        """
+        return os.path.join(self.root_dir, digest[:2], digest[2:4], digest + ".npy")
+
+    def contains(self, digest: str) -> bool:
+        """
+        Checks whether the blob with the specified digest is part of the store.
+
+        :param digest: content address of the blob
+        :return: whether the blob is stored
+        """
+        return os.path.isfile(self.get_path(digest))
+
+    def put(self, values: Union[List[float], np.ndarray], dtype: str = "<f8") -> str:
+        """
+        Stores the specified values (if not already present) and returns their content address.
+
+        :param values: values to be stored
+        :param dtype: dtype the values are stored with
+        :return: SHA-256 hex digest of the stored array
+        """
+        arr = np.asarray(values, dtype=dtype)
+        digest = self.compute_digest(arr)
+        path = self.get_path(digest)
+        if not os.path.isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write to temporary file first so that concurrent readers never see partial blobs
+            tmp_path = path + "." + uuid.uuid4().hex + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest: str, mmap: bool = True) -> np.ndarray:
+        """
+        Returns the array with the specified digest.
+
+        :param digest: content address of the blob
+        :param mmap: if true, a read-only memory-mapped view is returned instead of loading the array
+        :return: stored array
+        """
+        return np.load(self.get_path(digest), mmap_mode="r" if mmap else None)
+
+
+if __name__ == '__main__':
+    blob_store = BlobStore("blob_store_demo")
+    signal = [13.3, 13.6, 14.6, 16.7, 8.5, 9.7, 5.5, 3.6, 12.5, 12.7]
+    signal_digest = blob_store.put(signal, "<f4")
+    print("stored signal:", signal_digest, blob_store.get_path(signal_digest))
+    # identical payloads are only stored once
+    assert blob_store.put(signal, "<f4") == signal_digest
+    print("memory-mapped view:", blob_store.get(signal_digest))
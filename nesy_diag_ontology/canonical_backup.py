@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import gzip
+import heapq
+import os
+import sys
+import tempfile
+from contextlib import ExitStack
+from typing import Iterator, List, Tuple, Union
+
+from nesy_diag_ontology.ntriples import open_n_triples
+
+
+class ExternalSorter:
+    """
+    Memory-bounded external merge sort of N-Triples lines - sorted runs are spilled to temporary files and merged.
+
+    The lines are sorted bytewise (UTF-8), i.e., by code points, and duplicates are removed, which yields a canonical
+    serialization of the knowledge graph (independent of the order in which the server returns the triples).
+    """
+
+    def __init__(self, max_run_bytes: int = 256 * 1024 * 1024, tmp_dir: Union[str, None] = None) -> None:
+        """
+        Initializes the sorter.
+
+        :param max_run_bytes: (approximate) memory used for the lines of a run before it is spilled to disk
+        :param tmp_dir: directory of the temporary run files (default: system temp directory)
+        """
+        self.max_run_bytes = max_run_bytes
+        self.tmp_dir = tmp_dir
+        self.buffer: List[bytes] = []
+        self.buffer_bytes = 0
+        self.runs: List[str] = []
+        # incomplete last line of the previous chunk
+        self.remainder = b""
+
+    def add(self, line: bytes) -> None:
+        """
+        Adds the specified line (including line break) to be sorted.
+
+        :param line: N-Triples line
+        """
+        if len(line.strip()) == 0 or line.startswith(b"#"):
+            return
+        self.buffer.append(line if line.endswith(b"\n") else line + b"\n")
+        # line + object overhead
+        self.buffer_bytes += len(line) + 64
+        if self.buffer_bytes >= self.max_run_bytes:
+            self.spill()
+
+    def add_chunk(self, chunk: bytes) -> None:
+        """
+        Adds the lines of the specified chunk of an N-Triples stream (lines may span several chunks).
+
+        :param chunk: chunk of the stream
+        """
+        lines = (self.remainder + chunk).split(b"\n")
+        self.remainder = lines.pop()
+        for line in lines:
+            self.add(line + b"\n")
+
+    def spill(self) -> None:
+        """
+        Sorts the buffered lines and writes them to a temporary run file.
+        """
+        self.buffer.sort()
+        fd, path = tempfile.mkstemp(prefix="nt_run_", suffix=".nt", dir=self.tmp_dir)
+        with os.fdopen(fd, "wb", buffering=1024 * 1024) as f:
+            f.writelines(self.buffer)
+        self.runs.append(path)
+        self.buffer, self.buffer_bytes = [], 0
+
+    def merge(self) -> Iterator[bytes]:
+        """
+        Merges the sorted runs (and the remaining buffered lines) - the temporary run files are removed afterwards.
+
+        :return: sorted, distinct lines
+        """
+        if len(self.remainder) > 0:
+            self.add(self.remainder)
+            self.remainder = b""
+        self.buffer.sort()
+        try:
+            with ExitStack() as stack:
+                runs = [stack.enter_context(open(path, "rb", buffering=1024 * 1024)) for path in self.runs]
+                previous = None
+                for line in heapq.merge(self.buffer, *runs):
+                    if line != previous:
+                        yield line
+                    previous = line
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Removes the temporary run files and discards the buffered lines (e.g., after a failed download).
+        """
+        for path in self.runs:
+            if os.path.exists(path):
+                os.remove(path)
+        self.runs, self.buffer, self.buffer_bytes, self.remainder = [], [], 0, b""
+
+    def __enter__(self) -> "ExternalSorter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def canonicalize(path: str, out_path: str, max_run_bytes: int = 256 * 1024 * 1024) -> int:
+    """
+    Converts the specified N-Triples backup into a canonical (sorted, distinct, gzip compressed) backup.
+
+    :param path: path of the backup (`.nt` / `.nt.gz` / `.nt.zst`)
+    :param out_path: path of the canonical backup (`.nt.gz`)
+    :param max_run_bytes: memory used for the lines of a run before it is spilled to disk
+    :return: number of triples
+    """
+    num_triples = 0
+    with ExternalSorter(max_run_bytes, os.path.dirname(os.path.abspath(out_path))) as sorter:
+        with open_n_triples(path, binary=True) as f:
+            for line in f:
+                sorter.add(line)
+        with gzip.open(out_path + ".tmp", "wb", compresslevel=6) as out:
+            for line in sorter.merge():
+                out.write(line)
+                num_triples += 1
+    os.replace(out_path + ".tmp", out_path)
+    return num_triples
+
+
+def read_sorted_lines(path: str) -> Iterator[bytes]:
+    """
+    Reads the lines of a canonical backup and checks that they are sorted.
+
+    :param path: path of the canonical backup
+    :return: lines
+    """
+    with open_n_triples(path, binary=True) as f:
+        previous = None
+        for line_number, line in enumerate(f, 1):
+            if len(line.strip()) == 0 or line.startswith(b"#"):
+                continue
+            line = line if line.endswith(b"\n") else line + b"\n"
+            if previous is not None and line < previous:
+                raise ValueError(path + " is not canonical (line " + str(line_number) + ") - use `canonicalize` first")
+            previous = line
+            yield line
+
+
+def diff_sorted(old: Iterator[bytes], new: Iterator[bytes]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Compares two sorted N-Triples streams via merge join, i.e., in linear time and constant memory.
+
+    :param old: lines of the old backup (sorted)
+    :param new: lines of the new backup (sorted)
+    :return: (change type [+ | -], triple) tuples
+    """
+    old_line, new_line = next(old, None), next(new, None)
+    while old_line is not None or new_line is not None:
+        if new_line is None or (old_line is not None and old_line < new_line):
+            yield "-", old_line
+            old_line = next(old, None)
+        elif old_line is None or new_line < old_line:
+            yield "+", new_line
+            new_line = next(new, None)
+        else:
+            old_line, new_line = next(old, None), next(new, None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Canonical (sorted) N-Triples backups and their streaming diff')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    canonicalize_parser = subparsers.add_parser('canonicalize', help='sort an existing backup')
+    canonicalize_parser.add_argument('backup', type=str, help='backup (.nt / .nt.gz / .nt.zst)')
+    canonicalize_parser.add_argument('output', type=str, help='canonical backup (.nt.gz)')
+    canonicalize_parser.add_argument('--max-run-mb', type=int, default=256, help='memory per sorted run in MB')
+    diff_parser = subparsers.add_parser('diff', help='compare two canonical backups')
+    diff_parser.add_argument('old', type=str, help='old canonical backup')
+    diff_parser.add_argument('new', type=str, help='new canonical backup')
+    diff_parser.add_argument('--summary', action='store_true', help='only print the number of changes')
+    args = parser.parse_args()
+
+    if args.command == 'canonicalize':
+        print("canonical backup with", canonicalize(args.backup, args.output, args.max_run_mb * 1024 * 1024), "triples")
+    else:
+        added, removed = 0, 0
+        try:
+            for change, triple in diff_sorted(read_sorted_lines(args.old), read_sorted_lines(args.new)):
+                if change == "+":
+                    added += 1
+                else:
+                    removed += 1
+                if not args.summary:
+                    sys.stdout.write(change + " " + triple.decode("utf-8"))
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print("added:", added, "removed:", removed)
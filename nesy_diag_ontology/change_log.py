@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Tuple, Dict
+
+import requests
+
+from nesy_diag_ontology.backup import backup_knowledge_graph
+from nesy_diag_ontology.config import FUSEKI_URL, DATA_ENDPOINT
+from nesy_diag_ontology.ntriples import open_n_triples, parse_triple
+from nesy_diag_ontology.restore import restore_knowledge_graph, upload_chunk
+
+INSERT = "insert"
+DELETE = "delete"
+BASE_FILE = "base.json"
+
+
+def get_segments(log_dir: str) -> List[Tuple[int, str]]:
+    """
+    Returns the change log segments ordered by the sequence number of their first batch.
+
+    :param log_dir: directory of the change log
+    :return: list of (first sequence number, path) tuples
+    """
+    segments = []
+    for name in os.listdir(log_dir):
+        if name.startswith("changes_") and name.endswith(".jsonl.gz"):
+            segments.append((int(name[len("changes_"):-len(".jsonl.gz")]), os.path.join(log_dir, name)))
+    return sorted(segments)
+
+
+def read_segment(path: str) -> Iterator[Dict]:
+    """
+    Iterates over the batches of the specified segment.
+
+    The segment that is currently written is readable up to its last flush, i.e., a missing end-of-stream marker
+    (or a torn write of a crashed process) ends the iteration.
+
+    :param path: path of the segment
+    :return: change records (seq, op, data)
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    return
+    except (EOFError, OSError):
+        return
+
+
+def read_changes(log_dir: str, after_seq: int = 0) -> Iterator[Dict]:
+    """
+    Iterates over the logged batches with a sequence number greater than the specified one.
+
+    :param log_dir: directory of the change log
+    :param after_seq: sequence number after which the batches are returned
+    :return: change records (seq, op, data) in log order
+    """
+    segments = get_segments(log_dir)
+    for i, (_, path) in enumerate(segments):
+        if i + 1 < len(segments) and segments[i + 1][0] - 1 <= after_seq:
+            # all batches of the segment are older
+            continue
+        for record in read_segment(path):
+            if record["seq"] > after_seq:
+                yield record
+
+
+def read_last_seq(log_dir: str) -> int:
+    """
+    Determines the sequence number of the latest batch of the change log.
+
+    :param log_dir: directory of the change log
+    :return: latest sequence number (0 if the log is empty)
+    """
+    for first_seq, path in reversed(get_segments(log_dir)):
+        last_seq = 0
+        for record in read_segment(path):
+            last_seq = record["seq"]
+        if last_seq > 0:
+            return last_seq
+    return 0
+
+
+class ChangeLog:
+    """
+    Rotating, gzip compressed local log of all fact batches inserted into / deleted from the knowledge graph.
+
+    Together with a periodic full backup (base), the logged batches (deltas) allow restoring the knowledge graph
+    without dumping the complete dataset for each backup, i.e., backup storage and time grow with the change volume.
+    """
+
+    def __init__(self, log_dir: str, max_segment_bytes: int = 64 * 1024 * 1024) -> None:
+        """
+        Initializes the change log - continues the sequence of an existing log in the specified directory.
+
+        :param log_dir: directory containing the log segments and the base manifest
+        :param max_segment_bytes: (uncompressed) size after which a new segment is started
+        """
+        self.log_dir = log_dir
+        self.max_segment_bytes = max_segment_bytes
+        self.lock = threading.Lock()
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.last_seq = read_last_seq(self.log_dir)
+        # always start a new segment, i.e., never append to a gzip stream that was not terminated
+        self.segment = None
+        self.start_segment()
+
+    def start_segment(self) -> None:
+        """
+        Closes the current segment (if any) and starts a new one.
+        """
+        if self.segment is not None:
+            self.segment.close()
+        path = os.path.join(self.log_dir, "changes_" + str(self.last_seq + 1).zfill(12) + ".jsonl.gz")
+        self.segment = gzip.open(path, "wt", encoding="utf-8")
+        self.segment_bytes = 0
+
+    def append(self, op: str, data: str) -> int:
+        """
+        Appends the specified batch to the log.
+
+        :param op: operation [insert | delete]
+        :param data: N-Triples of the inserted / deleted facts
+        :return: sequence number of the batch
+        """
+        with self.lock:
+            self.last_seq += 1
+            record = json.dumps({"seq": self.last_seq, "op": op, "data": data}) + "\n"
+            self.segment.write(record)
+            self.segment_bytes += len(record)
+            # sync flush - the batch is readable (e.g., by a backup) without terminating the gzip stream
+            self.segment.flush()
+            if self.segment_bytes >= self.max_segment_bytes:
+                self.start_segment()
+            return self.last_seq
+
+    def close(self) -> None:
+        """
+        Closes the current segment.
+        """
+        with self.lock:
+            self.segment.close()
+
+
+def read_base(log_dir: str) -> Dict:
+    """
+    Reads the manifest of the current base backup.
+
+    :param log_dir: directory of the change log
+    :return: manifest (backup path, sequence number of the latest batch contained in the backup)
+    """
+    path = os.path.join(log_dir, BASE_FILE)
+    if not os.path.isfile(path):
+        raise ValueError("no base backup in " + log_dir + " - create one via `base` first")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_base(log_dir: str, backup: str, seq: int) -> None:
+    """
+    Atomically writes the manifest of a new base backup and removes the segments that are covered by it.
+
+    :param log_dir: directory of the change log
+    :param backup: path of the base backup
+    :param seq: sequence number of the latest batch contained in the backup
+    """
+    path = os.path.join(log_dir, BASE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"backup": backup, "seq": seq, "date": datetime.now().isoformat(timespec="seconds")}, f, indent=4)
+    os.replace(path + ".tmp", path)
+    segments = get_segments(log_dir)
+    # the latest segment is never removed, since it may be written by a running process
+    for (_, seg_path), (next_first_seq, _) in zip(segments, segments[1:]):
+        if next_first_seq - 1 <= seq:
+            os.remove(seg_path)
+
+
+def create_base(log_dir: str, kg_url: str, data_endpoint: str, path: str, compression: str = "gzip") -> Dict:
+    """
+    Creates a full backup of the knowledge graph as new base of the change log.
+
+    The sequence number is determined before the dump, i.e., later batches may already be contained in the backup -
+    replaying them again is harmless, since inserting / deleting the same triples in log order yields the same state.
+
+    :param log_dir: directory of the change log
+    :param kg_url: URL of the knowledge graph server
+    :param data_endpoint: data endpoint of the dataset, e.g., /nesy_diag/data
+    :param path: path of the backup file
+    :param compression: compression [gzip | zstd | none]
+    :return: metadata of the backup
+    """
+    seq = read_last_seq(log_dir)
+    metadata = backup_knowledge_graph(kg_url, data_endpoint, path, compression)
+    write_base(log_dir, path, seq)
+    return metadata
+
+
+def iter_change_batches(log_dir: str, after_seq: int, max_batch_bytes: int) -> Iterator[Tuple[str, str, int]]:
+    """
+    Concatenates consecutive logged batches of the same operation into batches of bounded size.
+
+    :param log_dir: directory of the change log
+    :param after_seq: sequence number after which the batches are considered
+    :param max_batch_bytes: maximum size of a concatenated batch
+    :return: (operation, N-Triples, number of logged batches) tuples in log order
+    """
+    op, chunk, chunk_size = "", [], 0
+    for record in read_changes(log_dir, after_seq):
+        if len(chunk) > 0 and (record["op"] != op or chunk_size + len(record["data"]) > max_batch_bytes):
+            yield op, "".join(chunk), len(chunk)
+            chunk, chunk_size = [], 0
+        op = record["op"]
+        chunk.append(record["data"] if record["data"].endswith("\n") else record["data"] + "\n")
+        chunk_size += len(record["data"])
+    if len(chunk) > 0:
+        yield op, "".join(chunk), len(chunk)
+
+
+def replay_changes(
+        log_dir: str, after_seq: int, kg_url: str, dataset: str, max_batch_bytes: int = 16 * 1024 * 1024,
+        retries: int = 5
+) -> int:
+    """
+    Replays the logged batches in bulk - consecutive insertions as one upload (graph store protocol), consecutive
+    deletions as one `DELETE DATA` update.
+
+    :param log_dir: directory of the change log
+    :param after_seq: sequence number after which the batches are replayed
+    :param kg_url: URL of the knowledge graph server
+    :param dataset: name of the dataset, e.g., nesy_diag
+    :param max_batch_bytes: maximum size of a single request
+    :param retries: maximum number of retries per request
+    :return: number of replayed batches
+    """
+    session = requests.Session()
+    replayed = 0
+    for op, data, num_batches in iter_change_batches(log_dir, after_seq, max_batch_bytes):
+        if op == INSERT:
+            upload_chunk(session, kg_url + "/" + dataset + "/data", data.encode("utf-8"), retries)
+        else:
+            update = "DELETE DATA { " + data + " }"
+            upload_chunk(
+                session, kg_url + "/" + dataset + "/update", update.encode("utf-8"), retries,
+                content_type='application/sparql-update'
+            )
+        replayed += num_batches
+    return replayed
+
+
+def restore_with_changes(log_dir: str, kg_url: str, dataset: str, jobs: int = 4) -> Dict:
+    """
+    Restores the knowledge graph from the base backup (parallel chunked upload) and replays the subsequent changes.
+
+    :param log_dir: directory of the change log
+    :param kg_url: URL of the knowledge graph server
+    :param dataset: name of the dataset, e.g., nesy_diag
+    :param jobs: number of parallel uploads (base backup)
+    :return: statistics of the restore
+    """
+    base = read_base(log_dir)
+    stats = restore_knowledge_graph(base["backup"], kg_url, "/" + dataset + "/data", jobs=jobs)
+    start = time.perf_counter()
+    stats["replayed_batches"] = replay_changes(log_dir, base["seq"], kg_url, dataset)
+    stats["replay_duration_s"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def compact_changes(log_dir: str, path: str) -> int:
+    """
+    Folds the changes since the base backup into a new base backup without any server (offline).
+
+    Only the net effect of the changes is held in memory (latest operation per triple), the base is streamed.
+
+    :param log_dir: directory of the change log
+    :param path: path of the new base backup (`.nt.gz`)
+    :return: number of folded batches
+    """
+    base = read_base(log_dir)
+    net_changes = {}
+    seq, folded = base["seq"], 0
+    for record in read_changes(log_dir, base["seq"]):
+        for line in record["data"].splitlines():
+            triple = parse_triple(line)
+            if triple is not None:
+                net_changes.pop(triple, None)
+                net_changes[triple] = (record["op"], line.strip())
+        seq, folded = record["seq"], folded + 1
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as out:
+        with open_n_triples(base["backup"]) as f:
+            for line in f:
+                triple = parse_triple(line)
+                if triple is not None and triple not in net_changes:
+                    out.write(line if line.endswith("\n") else line + "\n")
+        for op, line in net_changes.values():
+            if op == INSERT:
+                out.write(line + "\n")
+    os.replace(path + ".tmp", path)
+    write_base(log_dir, path, seq)
+    return folded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incremental KG backups - full base backup + change log (deltas)')
+    parser.add_argument('command', type=str, choices=['base', 'restore', 'compact'], help='operation')
+    parser.add_argument('--log-dir', type=str, required=True, help='directory of the change log')
+    parser.add_argument('--kg-url', type=str, default=FUSEKI_URL, help='URL of the knowledge graph server')
+    parser.add_argument(
+        '--dataset', type=str, default=DATA_ENDPOINT.split("/")[1], help='name of the dataset, e.g., nesy_diag'
+    )
+    parser.add_argument(
+        '--backup-dir', type=str, default="knowledge_base/live_kg_backups", help='directory of the base backups'
+    )
+    parser.add_argument('--jobs', type=int, default=4, help='number of parallel uploads (restore)')
+    args = parser.parse_args()
+
+    base_path = os.path.join(args.backup_dir, "base_" + datetime.now().strftime("%Y_%m_%d-%H_%M_%S") + ".nt.gz")
+    try:
+        if args.command == 'base':
+            create_base(args.log_dir, args.kg_url, "/" + args.dataset + "/data", base_path)
+            print("created base backup:", base_path)
+        elif args.command == 'restore':
+            for key, val in restore_with_changes(args.log_dir, args.kg_url, args.dataset, args.jobs).items():
+                print("\t" + key + ":", val)
+        else:
+            print("folded", compact_changes(args.log_dir, base_path), "batches into new base backup:", base_path)
+    except (RuntimeError, ValueError, requests.exceptions.RequestException) as e:
+        print(e)
+        sys.exit(1)
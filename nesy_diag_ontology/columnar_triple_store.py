@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import time
+from array import array
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from nesy_diag_ontology.knowledge_graph_index import KnowledgeGraphIndex, RDF_TYPE
+
+Columns = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class ColumnarTripleStore(KnowledgeGraphIndex):
+    """
+    Dictionary-encoded, columnar in-memory triple store for offline analytics of (large) exported knowledge graphs.
+
+    Terms are encoded as integers (predicates in a separate, small dictionary) and the triples are stored in NumPy
+    columns sorted in SPO and POS order (OSP on demand), i.e., about 10 bytes per triple and order (plus the
+    dictionary) instead of hundreds of bytes per triple for an rdflib graph. Pattern lookups are binary searches and
+    joins are vectorized. Offers the lookup surface of the `KnowledgeGraphIndex` / `KnowledgeGraphQueryTool` - results
+    are ordered by the first appearance of the terms instead of the order of the triples.
+    """
+
+    def __init__(self, literal_limits: Dict[str, int] = None) -> None:
+        """
+        Initializes the (empty) store.
+
+        :param literal_limits: optional maximum number of characters retained per literal of the given predicates
+                               (local names), e.g., {"signal": 50} - keeps the dictionary small for large payloads
+        """
+        super().__init__(literal_limits)
+        self.term_ids: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.pred_ids: Dict[str, int] = {}
+        self.preds: List[str] = []
+        # triples added since the columns were sorted (s, p, o)
+        self.pending = (array('q'), array('q'), array('q'))
+        self.spo: Union[Columns, None] = None
+        self.pos: Union[Columns, None] = None
+        self.osp: Union[Columns, None] = None
+
+    def encode(self, term: str) -> int:
+        """
+        Returns the ID of the specified term (a new one if it's not part of the dictionary yet).
+
+        :param term: IRI or literal value
+        :return: term ID
+        """
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def lookup(self, term: str) -> int:
+        """
+        Returns the ID of the specified term.
+
+        :param term: IRI or literal value
+        :return: term ID (-1 if it's not part of the dictionary)
+        """
+        return self.term_ids.get(term, -1)
+
+    def term(self, term_id: int) -> str:
+        """
+        Returns the term of the specified ID.
+
+        :param term_id: term ID
+        :return: IRI or literal value
+        """
+        return self.terms[term_id]
+
+    def add(self, subj: str, pred: str, obj: str, is_literal: bool = False) -> None:
+        """
+        Adds the specified triple to the store.
+
+        :param subj: subject IRI
+        :param pred: predicate IRI
+        :param obj: object IRI or literal value
+        :param is_literal: whether the object is a literal
+        """
+        if is_literal and pred in self.literal_limits:
+            obj = obj[:self.literal_limits[pred]]
+        pred_id = self.pred_ids.get(pred)
+        if pred_id is None:
+            pred_id = self.pred_ids[pred] = len(self.preds)
+            self.preds.append(pred)
+        self.pending[0].append(self.encode(subj))
+        self.pending[1].append(pred_id)
+        self.pending[2].append(self.encode(obj))
+
+    def freeze(self) -> None:
+        """
+        Sorts (and deduplicates) the triples added so far into the SPO / POS columns.
+        """
+        if len(self.pending[0]) == 0 and self.spo is not None:
+            return
+        term_dtype = np.int32 if len(self.terms) < 2 ** 31 else np.int64
+        pred_dtype = np.uint16 if len(self.preds) < 2 ** 16 else np.int32
+        new = [np.frombuffer(col, dtype=np.int64) for col in self.pending]
+        s, p, o = [
+            np.concatenate([old, col]).astype(dtype) if self.spo is not None else col.astype(dtype)
+            for old, col, dtype in zip(self.spo or (None,) * 3, new, [term_dtype, pred_dtype, term_dtype])
+        ]
+        self.pending = (array('q'), array('q'), array('q'))
+        order = np.lexsort((o, p, s))
+        s, p, o = s[order], p[order], o[order]
+        distinct = np.ones(len(s), dtype=bool)
+        distinct[1:] = (s[1:] != s[:-1]) | (p[1:] != p[:-1]) | (o[1:] != o[:-1])
+        self.spo = (s[distinct], p[distinct], o[distinct])
+        order = np.lexsort((self.spo[0], self.spo[2], self.spo[1]))
+        self.pos = (self.spo[1][order], self.spo[2][order], self.spo[0][order])
+        self.osp = None
+
+    def get_osp(self) -> Columns:
+        """
+        Returns the columns in OSP order (sorted on first use).
+
+        :return: (o, s, p) columns
+        """
+        self.freeze()
+        if self.osp is None:
+            order = np.lexsort((self.spo[1], self.spo[0], self.spo[2]))
+            self.osp = (self.spo[2][order], self.spo[0][order], self.spo[1][order])
+        return self.osp
+
+    @staticmethod
+    def equal_range(columns: Columns, values: List[int]) -> Tuple[int, int]:
+        """
+        Determines the range of rows matching the specified values of the leading columns via binary search.
+
+        :param columns: sorted columns
+        :param values: values of the leading columns
+        :return: (first row, last row + 1)
+        """
+        lo, hi = 0, len(columns[0])
+        for col, val in zip(columns, values):
+            # same dtype as the column, otherwise the column would be converted (copied) for the search
+            sub, val = col[lo:hi], col.dtype.type(val)
+            lo, hi = lo + int(np.searchsorted(sub, val, 'left')), lo + int(np.searchsorted(sub, val, 'right'))
+        return lo, hi
+
+    def match(self, subj: str = None, pred: str = None, obj: str = None) -> Columns:
+        """
+        Returns the triples matching the specified pattern (None: wildcard).
+
+        :param subj: subject IRI
+        :param pred: predicate IRI
+        :param obj: object IRI or literal value
+        :return: (s, p, o) ID columns of the matching triples
+        """
+        self.freeze()
+        s_id = self.lookup(subj) if subj is not None else None
+        p_id = self.pred_ids.get(pred, -1) if pred is not None else None
+        o_id = self.lookup(obj) if obj is not None else None
+        if -1 in (s_id, p_id, o_id):
+            return tuple(col[:0] for col in self.spo)
+        if s_id is not None:
+            prefix = [s_id] + ([p_id] + ([o_id] if o_id is not None else []) if p_id is not None else [])
+            lo, hi = self.equal_range(self.spo, prefix)
+            s, p, o = (col[lo:hi] for col in self.spo)
+            if p_id is None and o_id is not None:
+                mask = o == o_id
+                s, p, o = s[mask], p[mask], o[mask]
+            return s, p, o
+        if p_id is not None:
+            lo, hi = self.equal_range(self.pos, [p_id] + ([o_id] if o_id is not None else []))
+            p, o, s = (col[lo:hi] for col in self.pos)
+            return s, p, o
+        if o_id is not None:
+            osp = self.get_osp()
+            lo, hi = self.equal_range(osp, [o_id])
+            o, s, p = (col[lo:hi] for col in osp)
+            return s, p, o
+        return self.spo
+
+    def follow(self, ids: np.ndarray, pred: str, incoming: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized join - follows the specified predicate from all specified terms at once.
+
+        :param ids: term IDs to start from
+        :param pred: predicate IRI
+        :param incoming: if true, the predicate is followed backwards (from objects to subjects)
+        :return: (start IDs, reached IDs) pairs as two columns
+        """
+        self.freeze()
+        if incoming:
+            lead, other, preds = self.get_osp()
+        else:
+            lead, preds, other = self.spo
+        pred_id = self.pred_ids.get(pred, -1)
+        ids = np.asarray(ids).astype(lead.dtype, copy=False)
+        lo, hi = np.searchsorted(lead, ids, 'left'), np.searchsorted(lead, ids, 'right')
+        lengths = hi - lo
+        # row indices of all ranges: start of the range + offset within the range
+        rows = np.repeat(lo - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        rows = rows[preds[rows] == pred_id]
+        return lead[rows], other[rows]
+
+    def decode(self, ids: np.ndarray) -> List[str]:
+        """
+        Returns the terms of the specified IDs.
+
+        :param ids: term IDs
+        :return: terms
+        """
+        return [self.term(term_id) for term_id in ids.tolist()]
+
+    def objects(self, subj: str, pred: str) -> List[str]:
+        return self.decode(self.match(subj, self.ontology_prefix + pred)[2])
+
+    def subjects(self, pred: str, obj: str) -> List[str]:
+        return self.decode(self.match(None, self.ontology_prefix + pred, obj)[0])
+
+    def instances(self, cls: str) -> List[str]:
+        return self.decode(self.match(None, RDF_TYPE, self.ontology_prefix + cls)[0])
+
+    def has_type(self, instance: str, cls: str) -> bool:
+        return len(self.match(instance, RDF_TYPE, self.ontology_prefix + cls)[0]) > 0
+
+    def class_counts(self) -> Dict[str, int]:
+        """
+        Counts the instances per class (vectorized).
+
+        :return: class IRI -> number of instances
+        """
+        classes, counts = np.unique(self.match(None, RDF_TYPE)[2], return_counts=True)
+        return dict(zip(self.decode(classes), counts.tolist()))
+
+    def nbytes(self) -> int:
+        """
+        Returns the memory occupied by the columns (without dictionary).
+
+        :return: number of bytes
+        """
+        self.freeze()
+        return sum(col.nbytes for columns in [self.spo, self.pos, self.osp] if columns is not None for col in columns)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Columnar triple store - offline analytics of exported KGs')
+    parser.add_argument('file', type=str, help='exported KG / backup (.nt / .nt.gz / .nt.zst)')
+    parser.add_argument('--signal-limit', type=int, default=50, help='retained characters of signal / heatmap literals')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = ColumnarTripleStore.from_n_triples(
+        args.file, {"signal": args.signal_limit, "generated_heatmap": args.signal_limit}
+    )
+    store.freeze()
+    duration = time.perf_counter() - start
+    print("loaded", len(store.spo[0]), "triples (", len(store.terms), "terms ) in", round(duration, 2), "s")
+    print("columns:", round(store.nbytes() / (1024 * 1024), 1), "MB")
+    for class_iri, count in sorted(store.class_counts().items(), key=lambda item: -item[1]):
+        print("\t" + class_iri.split("#")[-1] + ":", count)
+    start = time.perf_counter()
+    error_codes = store.match(None, RDF_TYPE, store.entry("ErrorCode"))[0]
+    _, diag_logs = store.follow(error_codes, store.ontology_prefix + "appearsIn")
+    print("error code occurrences in diag logs:", len(diag_logs), "(", round(time.perf_counter() - start, 4), "s )")
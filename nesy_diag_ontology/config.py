@@ -7,3 +7,33 @@ FUSEKI_URL = "http://127.0.0.1:3030"
 SPARQL_ENDPOINT = "/nesy_diag/sparql"
 DATA_ENDPOINT = "/nesy_diag/data"
 UPDATE_ENDPOINT = "/nesy_diag/update"
+
+# logging: maximum number of characters of a logged literal / query, console output rate limit per message
+LOG_LITERAL_LIMIT = 200
+LOG_QUERY_LIMIT = 5000
+LOG_RATE_LIMIT = 20
+LOG_RATE_PERIOD_S = 1.0
+
+# metrics: per-operation instrumentation of the public API (calls, latency, round trips, bytes, rows)
+METRICS_ENABLED = True
+METRICS_LATENCY_BUCKETS_S = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# tracing: trace file (OTLP JSON Lines) - empty: disabled (can be enabled at runtime via `tracing.enable_tracing`)
+TRACE_FILE = ""
+
+# slow-query log: minimum duration of slow queries, log file (JSON Lines, empty: warnings only),
+# number of latency samples per query fingerprint (percentiles)
+SLOW_QUERY_THRESHOLD_S = 1.0
+SLOW_QUERY_LOG = ""
+QUERY_STATS_SAMPLES = 1000
+
+# write-ahead log: initial / maximum backoff between replay attempts while the KG server is unreachable
+WAL_RETRY_BACKOFF_S = 0.5
+WAL_MAX_BACKOFF_S = 30.0
+
+# ingestion queue: number of retries of a failed upload, backoff before the first retry (doubled for each further one)
+INGESTION_RETRIES = 3
+INGESTION_RETRY_BACKOFF_S = 0.5
+
+# representations of sensor signals and heatmaps in the KG (list string, base64-encoded typed literals)
+SIGNAL_ENCODINGS = ["legacy", "float32", "float16"]
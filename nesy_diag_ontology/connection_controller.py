@@ -3,35 +3,91 @@
 # @author Tim Bohne
 
 import re
-from typing import List, Dict, Union
+import time
+from typing import List, Dict, Tuple, Union, Iterator, TYPE_CHECKING
 
 import requests
-from rdflib import Namespace, RDF, Literal, Graph, URIRef
-from termcolor import colored
 
-from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL, SPARQL_ENDPOINT, DATA_ENDPOINT, UPDATE_ENDPOINT
+from nesy_diag_ontology.change_log import ChangeLog, INSERT, DELETE
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL, SPARQL_ENDPOINT, DATA_ENDPOINT, UPDATE_ENDPOINT, \
+    LOG_QUERY_LIMIT
 from nesy_diag_ontology.fact import Fact
+from nesy_diag_ontology.kg_logging import get_logger, enable_console_logging, Abbreviated, HEADING
+from nesy_diag_ontology.metrics import METRICS, instrumented
+from nesy_diag_ontology.slow_query_log import SlowQueryLog, QUERY_LOG, query_source
+from nesy_diag_ontology.tracing import span, SPAN_KIND_CLIENT
+from nesy_diag_ontology.write_ahead_log import WriteAheadLog
 
+if TYPE_CHECKING:
+    from rdflib import URIRef, Graph, Literal
 
+logger = get_logger(__name__)
+
+
+@instrumented("get_uri", "post")
 class ConnectionController:
     """
     Establishes the connection to the knowledge graph hosted by the 'Apache Jena Fuseki' server.
     Performs queries as well as knowledge graph extensions via HTTP requests.
     """
 
-    def __init__(self, namespace: str, fuseki_url: str = FUSEKI_URL, verbose: bool = True) -> None:
+    def __init__(
+            self, namespace: str, fuseki_url: str = FUSEKI_URL, verbose: bool = True,
+            write_ahead_log: WriteAheadLog = None, change_log: ChangeLog = None, query_log: SlowQueryLog = None
+    ) -> None:
         """
         Initializes the connection controller.
 
         :param namespace: ontology namespace (prefix URI)
         :param fuseki_url: URL of the 'Fuseki' server hosting the knowledge graph
         :param verbose: whether the connection controller should log its actions
+        :param write_ahead_log: optional local log in which each fact batch is recorded before its upload is attempted,
+                                i.e., batches that could not be uploaded are not lost and can be replayed later
+        :param change_log: optional local log of all inserted / deleted fact batches (deltas for incremental backups)
+        :param query_log: per-fingerprint query statistics / slow-query log (default: the process-wide one)
         """
-        self.namespace = Namespace(namespace)
+        self.namespace = namespace
         self.fuseki_url = fuseki_url
-        self.graph = Graph()
-        self.graph.bind("", self.namespace)
         self.verbose = verbose
+        if verbose:
+            enable_console_logging()
+        self.write_ahead_log = write_ahead_log
+        self.change_log = change_log
+        self.query_log = query_log if query_log is not None else QUERY_LOG
+
+    def post(self, endpoint: str, data: bytes, headers: Dict[str, str], stream: bool = False) -> "requests.Response":
+        """
+        Sends an HTTP POST request to the specified endpoint of the knowledge graph server (traced as client span).
+
+        :param endpoint: endpoint of the dataset, e.g., /nesy_diag/sparql
+        :param data: request body
+        :param headers: request headers
+        :param stream: whether the response body should be streamed (not read right away)
+        :return: response
+        """
+        attributes = {
+            "http.request.method": "POST", "url.full": self.fuseki_url + endpoint, "http.request.body.size": len(data)
+        }
+        with span("POST " + endpoint, SPAN_KIND_CLIENT, attributes) as request_span:
+            res = requests.post(self.fuseki_url + endpoint, data=data, headers=headers, stream=stream)
+            request_span.set_attribute("http.response.status_code", res.status_code)
+            if not stream:
+                request_span.set_attribute("http.response.body.size", len(res.content))
+        return res
+
+    @staticmethod
+    def serialize(graph: "Graph", rdf_format: str) -> str:
+        """
+        Serializes the specified graph (traced as span).
+
+        :param graph: rdflib graph of the facts
+        :param rdf_format: RDF serialization format, e.g., nt
+        :return: serialized graph
+        """
+        with span("rdflib serialize", attributes={"rdf.format": rdf_format, "rdf.triples": len(graph)}) as rdf_span:
+            data = graph.serialize(format=rdf_format)
+            rdf_span.set_attribute("payload.bytes", len(data))
+        return data
 
     def query_knowledge_graph(self, query: str, verbose: bool) -> List[Dict]:
         """
@@ -42,42 +98,140 @@ class ConnectionController:
         :return: query results (JSON list)
         """
         if verbose and self.verbose:
-            print("query knowledge graph..")
-            print(query)
-        res = requests.post(
-            self.fuseki_url + SPARQL_ENDPOINT,
-            query.encode(),
-            headers={'Content-Type': 'application/sparql-query', 'Accept': 'application/json'}
+            logger.debug("query knowledge graph..\n%s", Abbreviated(query, LOG_QUERY_LIMIT))
+        data = query.encode()
+        headers = {'Content-Type': 'application/sparql-query', 'Accept': 'application/json'}
+        start = time.perf_counter()
+        res = self.post(SPARQL_ENDPOINT, data, headers)
+        if res.status_code != 200:
+            logger.error("query failed - HTTP status code: %d", res.status_code)
+        bindings = res.json()["results"]["bindings"]
+        self.query_log.record(query, time.perf_counter() - start, len(bindings))
+        METRICS.record_request(len(data), len(res.content), len(bindings))
+        return bindings
+
+    def stream_query_results(self, query: str, verbose: bool) -> Iterator[str]:
+        """
+        Sends an HTTP request containing the specified SELECT query to the knowledge graph server.
+
+        The results are streamed as tab-separated rows of RDF terms in the server's solution order, i.e., large result
+        sets do not have to be held in memory as a whole.
+
+        :param query: query to be sent to knowledge graph server
+        :param verbose: if true, queries are logged
+        :return: result rows (without header), RuntimeError if the server does not answer the query
+        """
+        if verbose and self.verbose:
+            logger.debug("query knowledge graph (streamed)..\n%s", Abbreviated(query, LOG_QUERY_LIMIT))
+        data = query.encode()
+        start = time.perf_counter()
+        res = self.post(
+            SPARQL_ENDPOINT, data,
+            {'Content-Type': 'application/sparql-query', 'Accept': 'text/tab-separated-values'}, stream=True
         )
         if res.status_code != 200:
-            print("HTTP status code:", res.status_code)
-        return res.json()["results"]["bindings"]
+            # the error body is not a result set - exporters must not build anything from it
+            logger.error("streamed query failed - HTTP status code: %d", res.status_code)
+            res.close()
+            raise RuntimeError("streamed query failed - HTTP status code: " + str(res.status_code))
+        # the rows are consumed later, i.e., possibly outside of the operations active at request time
+        operations, source = list(METRICS.active_operations()), query_source()
+        METRICS.record_request(len(data), 0, 0, operations)
+        with res:
+            lines = res.iter_lines()
+            # skip the header (variable names)
+            received, rows = len(next(lines, b"")) + 1, 0
+            # only the time spent receiving is part of the query duration, not the time spent by the consumer
+            duration = time.perf_counter() - start
+            try:
+                while True:
+                    start = time.perf_counter()
+                    line = next(lines, None)
+                    duration += time.perf_counter() - start
+                    if line is None:
+                        break
+                    received, rows = received + len(line) + 1, rows + 1
+                    yield line.decode("utf-8")
+            finally:
+                METRICS.record_transfer(received, rows, operations)
+                self.query_log.record(query, duration, rows, source)
 
-    def extend_knowledge_graph(self, facts: List[Fact]) -> None:
+    def extend_knowledge_graph(self, facts: List[Fact]) -> bool:
         """
         Sends an HTTP request containing the facts to be entered into the knowledge graph to the knowledge graph server.
 
         :param facts: semantic facts to be entered into the knowledge graph
+        :return: whether the facts were entered (with write-ahead log: otherwise, they remain pending for replay)
         """
         if self.verbose:
-            print(colored("\nextending knowledge graph..", "green", "on_grey", ["bold"]))
+            logger.info("extending knowledge graph..", extra=HEADING)
+        # rdflib is only imported when facts are entered / removed (heavy import, not needed by query-only processes)
+        from rdflib import Graph
         graph = Graph()
         for fact in facts:
-            # for very long facts, only print the first segment (e.g., heatmaps)
+            # for very long facts, only the first segment of the literal is logged (e.g., heatmaps)
             if self.verbose:
-                print("fact:", str(fact)[:200] + "..." if len(str(fact)) > 0 else fact)
-            if fact.property_fact:
-                graph.add((self.get_uri(fact.triple[0]), self.get_uri(fact.triple[1]), Literal(fact.triple[2])))
+                logger.debug("fact: %s", Abbreviated(fact))
+            graph.add(self.get_rdf_triple(fact))
+
+        if self.write_ahead_log is not None:
+            data = self.serialize(graph, "nt")
+            seq = self.write_ahead_log.append(data)
+            # the batch is going to be entered (possibly via replay), i.e., it's part of the changes in any case
+            if self.change_log is not None:
+                self.change_log.append(INSERT, data)
+            # the batch is acknowledged (durable) before its upload is attempted
+            self.write_ahead_log.sync_until(seq)
+            if self.write_ahead_log.has_pending(before_seq=seq):
+                # earlier batches are still pending (server was unreachable) - replay everything in log order, but
+                # only once the backoff expired (otherwise, the batch just stays pending)
+                if self.write_ahead_log.replay_due():
+                    self.replay_write_ahead_log()
+            elif self.upload_n_triples(data):
+                self.write_ahead_log.mark_uploaded(seq)
             else:
-                graph.add((self.get_uri(fact.triple[0]), self.get_uri(fact.triple[1]), self.get_uri(fact.triple[2])))
+                self.write_ahead_log.upload_failed()
+            return self.write_ahead_log.is_uploaded(seq)
+        data = self.serialize(graph, "ttl").encode()
+        res = self.post(DATA_ENDPOINT, data, {'Content-Type': 'text/turtle'})
+        METRICS.record_request(len(data), len(res.content), 0)
+        if res.status_code != 200:
+            logger.error("extension failed - HTTP status code: %d", res.status_code)
+            return False
+        if self.change_log is not None:
+            self.change_log.append(INSERT, self.serialize(graph, "nt"))
+        return True
 
-        res = requests.post(
-            self.fuseki_url + DATA_ENDPOINT,
-            data=graph.serialize(format="ttl").encode(),
-            headers={'Content-Type': 'text/turtle'}
-        )
+    def upload_n_triples(self, data: str) -> bool:
+        """
+        Sends an HTTP request containing the specified N-Triples to be entered into the knowledge graph.
+
+        :param data: N-Triples to be entered into the knowledge graph
+        :return: whether the upload was successful
+        """
+        encoded = data.encode()
+        try:
+            res = self.post(DATA_ENDPOINT, encoded, {'Content-Type': 'application/n-triples'})
+        except requests.exceptions.RequestException as e:
+            logger.error("upload failed: %s", e)
+            return False
+        METRICS.record_request(len(encoded), len(res.content), 0)
         if res.status_code != 200:
-            print("HTTP status code:", res.status_code)
+            logger.error("upload failed - HTTP status code: %d", res.status_code)
+        return res.status_code == 200
+
+    def replay_write_ahead_log(self) -> int:
+        """
+        Uploads the pending fact batches of the write-ahead log in bulk.
+
+        :return: number of replayed batches
+        """
+        if self.write_ahead_log is None:
+            return 0
+        replayed = self.write_ahead_log.replay(self.upload_n_triples)
+        if self.verbose:
+            logger.info("replayed %d pending fact batches from write-ahead log", replayed)
+        return replayed
 
     def remove_outdated_facts_from_knowledge_graph(self, facts: List[Fact]) -> None:
         """
@@ -86,46 +240,70 @@ class ConnectionController:
         :param facts: semantic facts to be removed from the knowledge graph
         """
         if self.verbose:
-            print(colored("\nremoving facts from knowledge graph..", "green", "on_grey", ["bold"]))
+            logger.info("removing facts from knowledge graph..", extra=HEADING)
+        from rdflib import Graph
+        if self.write_ahead_log is not None and self.write_ahead_log.has_pending():
+            # pending extensions have to be applied first, otherwise they would revive the removed facts on replay
+            self.replay_write_ahead_log()
+        deleted = []
         for fact in facts:
             if self.verbose:
-                print("fact:", fact)
-            if fact.property_fact:
-                f = (self.get_uri(fact.triple[0]), self.get_uri(fact.triple[1]), Literal(fact.triple[2]))
-                # TODO: check for better ways to handle these special cases
-                if "<http://www.w3.org/2001/XMLSchema#boolean>" in f[2]:
-                    query = f"DELETE DATA {{ <{f[0]}> <{f[1]}> {f[2]} . }}"
-                else:
-                    query = f"DELETE DATA {{ <{f[0]}> <{f[1]}> \"{f[2]}\" . }}"
-            else:
-                f = (self.get_uri(fact.triple[0]), self.get_uri(fact.triple[1]), self.get_uri(fact.triple[2]))
-                query = f"DELETE DATA {{ <{f[0]}> <{f[1]}> <{f[2]}> . }}"
+                logger.debug("fact: %s", Abbreviated(fact))
+            # serialized like entered facts (escaping, datatypes), i.e., the deletion matches the entered triple
+            graph = Graph()
+            graph.add(self.get_rdf_triple(fact))
+            triple = self.serialize(graph, "nt").strip()
+            query = f"DELETE DATA {{ {triple} }}"
             if self.verbose:
-                print("*** DELETION QUERY:", query)
-            res = requests.post(
-                self.fuseki_url + UPDATE_ENDPOINT,
-                data=query.encode(),
-                headers={'Content-Type': 'application/sparql-update'}
-            )
+                logger.debug("*** DELETION QUERY: %s", Abbreviated(query))
+            data = query.encode()
+            res = self.post(UPDATE_ENDPOINT, data, {'Content-Type': 'application/sparql-update'})
+            METRICS.record_request(len(data), len(res.content), 0)
             if res.status_code != 200 and res.status_code != 204:
-                print("HTTP status code:", res.status_code)
+                logger.error("deletion failed - HTTP status code: %d", res.status_code)
+            else:
+                deleted.append(triple + "\n")
+        if self.change_log is not None and len(deleted) > 0:
+            self.change_log.append(DELETE, "".join(deleted))
+
+    def get_rdf_triple(self, fact: Fact) -> Tuple["URIRef", "URIRef", Union["URIRef", "Literal"]]:
+        """
+        Returns the RDF terms of the specified fact.
 
-    def get_uri(self, triple_ele: str) -> Union[URIRef, str]:
+        :param fact: semantic fact
+        :return: (subject, predicate, object) triple of rdflib terms
+        """
+        from rdflib import Literal, URIRef
+        if fact.property_fact:
+            obj = fact.triple[2]
+            match = re.fullmatch(r'"(.*)"\^\^<(http://www\.w3\.org/2001/XMLSchema#boolean)>', str(obj))
+            if match is not None:
+                # legacy: boolean literal in N-Triples notation
+                obj = Literal(match.group(1), datatype=URIRef(match.group(2)))
+            else:
+                obj = Literal(obj, datatype=URIRef(fact.datatype) if fact.datatype else None)
+            return URIRef(self.get_uri(fact.triple[0])), URIRef(self.get_uri(fact.triple[1])), obj
+        return tuple(URIRef(self.get_uri(ele)) for ele in fact.triple)
+
+    def get_uri(self, triple_ele: str) -> Union["URIRef", str]:
         """
         Returns the specified triple element as feasible URI reference.
 
         :param triple_ele: triple element to get URI reference for
         :return: URI reference for triple element
         """
+        from rdflib import URIRef
         if re.match("(http|https)://([\w_-]+(?:\.[\w_-]+)+)([\w.,@?^=%&:/~+]*[\w@?^=%&/~+])", triple_ele):
             return URIRef(triple_ele)
         elif triple_ele == "http://www.w3.org/1999/02/22-rdf-syntax-ns#type":
             return triple_ele
         else:
-            return URIRef(self.namespace[triple_ele])
+            return URIRef(self.namespace + triple_ele)
 
 
 if __name__ == '__main__':
+    from rdflib import Namespace, RDF
+
     connection = ConnectionController(ONTOLOGY_PREFIX)
     # general query example
     q = "SELECT ?s ?p ?o WHERE { ?s ?p ?o } LIMIT 25"
@@ -13,11 +13,16 @@ from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL
 from nesy_diag_ontology.connection_controller import ConnectionController
 from nesy_diag_ontology.error_code_knowledge import ErrorCodeKnowledge
 from nesy_diag_ontology.fact import Fact
+from nesy_diag_ontology.kg_logging import get_logger
 from nesy_diag_ontology.knowledge_graph_query_tool import KnowledgeGraphQueryTool
+from nesy_diag_ontology.metrics import instrumented
 from nesy_diag_ontology.model_knowledge import ModelKnowledge
 from nesy_diag_ontology.sub_component_knowledge import SubComponentKnowledge
 
+logger = get_logger(__name__)
 
+
+@instrumented()
 class ExpertKnowledgeEnhancer:
     """
     Extends the knowledge graph hosted by the 'Fuseki' server with diag-entity-agnostic expert knowledge.
@@ -29,17 +34,27 @@ class ExpertKnowledgeEnhancer:
     This class deals with semantic fact generation for the diag-entity-agnostic expert knowledge.
     """
 
-    def __init__(self, kg_url: str = FUSEKI_URL, verbose: bool = True) -> None:
+    def __init__(
+            self, kg_url: str = FUSEKI_URL, verbose: bool = True, fuseki_connection: ConnectionController = None,
+            knowledge_graph_query_tool: KnowledgeGraphQueryTool = None
+    ) -> None:
         """
         Initializes the expert knowledge enhancer.
 
         :param kg_url: URL of the knowledge graph server
         :param verbose: whether the expert knowledge enhancer should log its actions
+        :param fuseki_connection: connection to be used (e.g., shared with an instance generator), a new one is
+                                  established if not specified
+        :param knowledge_graph_query_tool: query tool to be used, a new one is created if not specified
         """
         # establish connection to 'Apache Jena Fuseki' server
-        self.fuseki_connection = ConnectionController(namespace=ONTOLOGY_PREFIX, fuseki_url=kg_url, verbose=verbose)
+        if fuseki_connection is None:
+            fuseki_connection = ConnectionController(namespace=ONTOLOGY_PREFIX, fuseki_url=kg_url, verbose=verbose)
+        self.fuseki_connection = fuseki_connection
         self.onto_namespace = Namespace(ONTOLOGY_PREFIX)
-        self.knowledge_graph_query_tool = KnowledgeGraphQueryTool(verbose=verbose)
+        if knowledge_graph_query_tool is None:
+            knowledge_graph_query_tool = KnowledgeGraphQueryTool(kg_url=kg_url, verbose=verbose)
+        self.knowledge_graph_query_tool = knowledge_graph_query_tool
         self.verbose = verbose
 
     def generate_condition_description_fact(self, fc_uuid: str, fault_cond: str, prop: bool) -> Fact:
@@ -217,7 +232,7 @@ class ExpertKnowledgeEnhancer:
         )
         if len(error_code_instance) > 0:
             if self.verbose:
-                print("Specified error code (" + error_code_knowledge.error_code + ") already present in KG")
+                logger.info("Specified error code (%s) already present in KG", error_code_knowledge.error_code)
             error_code_uuid = error_code_instance[0].split("#")[1]
         else:
             fact_list = [
@@ -243,7 +258,7 @@ class ExpertKnowledgeEnhancer:
         fault_cond_instance = self.knowledge_graph_query_tool.query_fault_condition_by_description(fault_cond)
         if len(fault_cond_instance) > 0:
             if self.verbose:
-                print("Specified fault condition (" + fault_cond + ") already present in KG, updating description")
+                logger.info("Specified fault condition (%s) already present in KG, updating description", fault_cond)
             fault_cond_uuid = fault_cond_instance[0].split("#")[1]
             fact_list.append(
                 Fact((fault_cond_uuid, self.onto_namespace.condition_desc, fault_cond), property_fact=True)
@@ -280,10 +295,11 @@ class ExpertKnowledgeEnhancer:
                 error_code_knowledge.error_code, comp
             )
             if len(diag_association) > 0:
-                print(
-                    "Diagnostic association between", error_code_knowledge.error_code,
-                    "and", comp, "already defined in KG"
-                )
+                if self.verbose:
+                    logger.info(
+                        "Diagnostic association between %s and %s already defined in KG",
+                        error_code_knowledge.error_code, comp
+                    )
             else:
                 # TODO: shouldn't the diagnostic association be deletable, too?
                 # creating diagnostic association between `ErrorCode` and `SuspectComponent`
@@ -313,7 +329,7 @@ class ExpertKnowledgeEnhancer:
             comp_instance = self.knowledge_graph_query_tool.query_suspect_component_by_name(comp_name)
             if len(comp_instance) > 0:
                 if self.verbose:
-                    print("Specified component (" + comp_name + ") already present in KG")
+                    logger.info("Specified component (%s) already present in KG", comp_name)
                 comp_uuid = comp_instance[0].split("#")[1]
             else:
                 fact_list.append(Fact((comp_uuid, RDF.type, self.onto_namespace["SuspectComponent"].toPython())))
@@ -349,7 +365,8 @@ class ExpertKnowledgeEnhancer:
             # check whether subcomponent to be added is already part of the KG
             sub_comp_instance = self.knowledge_graph_query_tool.query_sub_component_by_name(sub_comp_name)
             if len(sub_comp_instance) > 0:
-                print("Specified subcomponent (" + sub_comp_name + ") already present in KG")
+                if self.verbose:
+                    logger.info("Specified subcomponent (%s) already present in KG", sub_comp_name)
                 sub_comp_uuid = sub_comp_instance[0].split("#")[1]
             else:
                 fact_list.append(Fact((sub_comp_uuid, RDF.type, self.onto_namespace["SubComponent"].toPython())))
@@ -390,7 +407,7 @@ class ExpertKnowledgeEnhancer:
         comp_set_instance = self.knowledge_graph_query_tool.query_component_set_by_name(comp_set_name)
         if len(comp_set_instance) > 0:
             if self.verbose:
-                print("Specified component set (" + comp_set_name + ") already present in KG")
+                logger.info("Specified component set (%s) already present in KG", comp_set_name)
             comp_set_uuid = comp_set_instance[0].split("#")[1]
         else:
             fact_list = [
@@ -419,6 +436,8 @@ class ExpertKnowledgeEnhancer:
         """
         Generates classification model facts to be entered into the knowledge graph.
 
+        The first fact is always the type assertion of the model instance.
+
         :param model_knowledge: model knowledge
         :return: generated fact list
         """
@@ -579,7 +598,7 @@ class ExpertKnowledgeEnhancer:
     def add_model_to_knowledge_graph(
             self, input_len: int, exp_norm_method: str, measuring_instruction: str, model_id: str, classified_comp: str,
             input_chan_req: List[Tuple[int, str]], architecture: str
-    ) -> None:
+    ) -> str:
         """
         Adds a model instance to the knowledge graph.
 
@@ -590,6 +609,7 @@ class ExpertKnowledgeEnhancer:
         :param classified_comp: component the model is suited to classify
         :param input_chan_req: input channel requirements
         :param architecture: architecture type of the model
+        :return: UUID of the model instance
         """
         assert isinstance(input_len, int)
         assert isinstance(exp_norm_method, str)
@@ -603,6 +623,7 @@ class ExpertKnowledgeEnhancer:
         )
         fact_list = self.generate_model_facts(new_model_knowledge)
         self.fuseki_connection.extend_knowledge_graph(fact_list)
+        return fact_list[0].triple[0]
 
     def add_channel_to_knowledge_graph(self, channel_name: str) -> None:
         """
@@ -10,15 +10,17 @@ class Fact:
     Representation of a semantic fact to be entered into a triple store (knowledge graph).
     """
 
-    def __init__(self, triple: Tuple, property_fact: bool = False) -> None:
+    def __init__(self, triple: Tuple, property_fact: bool = False, datatype: str = "") -> None:
         """
         Initializes the semantic fact.
 
         :param triple: triple comprising the semantic fact <subject, predicate, object>
         :param property_fact: whether it's a property fact
+        :param datatype: optional datatype IRI of the object literal (only relevant for property facts)
         """
         self.triple = triple
         self.property_fact = property_fact
+        self.datatype = datatype
 
     def __str__(self) -> str:
         """
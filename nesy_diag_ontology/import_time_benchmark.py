@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# entry point -> (import time budget in ms, heavy / optional dependencies it must not import)
+IMPORT_TIME_BUDGETS: Dict[str, Tuple[float, List[str]]] = {
+    'nesy_diag_ontology.knowledge_graph_index': (25, ['rdflib', 'requests', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.snapshot_diff': (25, ['rdflib', 'requests', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.metrics': (25, ['rdflib', 'requests', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.tracing': (25, ['rdflib', 'requests', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.slow_query_log': (25, ['rdflib', 'requests', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.standin_server': (50, ['rdflib', 'requests', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.columnar_triple_store': (150, ['rdflib', 'requests', 'owlready2']),
+    'nesy_diag_ontology.binary_snapshot': (150, ['rdflib', 'requests', 'owlready2']),
+    'nesy_diag_ontology.connection_controller': (150, ['rdflib', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.knowledge_graph_query_tool': (150, ['rdflib', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.knowledge_snapshot': (150, ['rdflib', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.structured_snapshot': (150, ['rdflib', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.incremental_snapshot': (150, ['rdflib', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.backup': (150, ['rdflib', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.restore': (150, ['rdflib', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.synthetic_kg': (250, ['rdflib', 'owlready2']),
+    'nesy_diag_ontology.expert_knowledge_enhancer': (250, ['numpy', 'owlready2']),
+    'nesy_diag_ontology.ontology_instance_generator': (150, ['rdflib', 'numpy', 'owlready2']),
+    'nesy_diag_ontology.benchmark_suite': (350, ['owlready2']),
+    'nesy_diag_ontology.load_generator': (350, ['owlready2'])
+}
+
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """
+    Imports the specified module in a fresh interpreter (`-X importtime`).
+
+    :param module: module to be imported
+    :return: (cumulative import time in ms, top-level packages imported on the way)
+    """
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], capture_output=True, text=True)
+    if res.returncode != 0:
+        raise RuntimeError("import of " + module + " failed:\n" + res.stderr[-1000:])
+    import_time, packages = None, set()
+    for line in res.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, package = line.split("|")
+        packages.add(package.strip().split(".")[0])
+        if package.strip() == module:
+            import_time = int(cumulative) / 1000
+    return import_time, sorted(packages)
+
+
+def run_benchmark(modules: List[str], repeat: int) -> List[Dict]:
+    """
+    Measures the import times of the specified entry points and checks them against their budgets.
+
+    The first import of each module is not measured (byte code compilation), the median of the remaining ones is
+    compared to the budget.
+
+    :param modules: entry points (modules)
+    :param repeat: number of measured imports per module
+    :return: results per module
+    """
+    results = []
+    for module in modules:
+        budget, forbidden = IMPORT_TIME_BUDGETS[module]
+        measure_import(module)
+        measurements = [measure_import(module) for _ in range(repeat)]
+        import_time = statistics.median(time_ms for time_ms, _ in measurements)
+        heavy_imports = [pkg for pkg in forbidden if pkg in measurements[0][1]]
+        results.append({
+            "module": module,
+            "import_time_ms": round(import_time, 2),
+            "budget_ms": budget,
+            "forbidden_imports": heavy_imports,
+            "ok": import_time <= budget and len(heavy_imports) == 0
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import time benchmark (-X importtime) of the package entry points')
+    parser.add_argument('--module', type=str, action='append', help='only measure the specified entry point(s)')
+    parser.add_argument('--repeat', type=int, default=5, help='number of measured imports per entry point')
+    parser.add_argument('--output', type=str, default="", help='write the results to the specified JSON file')
+    args = parser.parse_args()
+
+    benchmark_results = run_benchmark(args.module or list(IMPORT_TIME_BUDGETS), args.repeat)
+    for result in benchmark_results:
+        print(
+            ("OK  " if result["ok"] else "FAIL") + "\t" + result["module"] + ":", result["import_time_ms"], "ms",
+            "(budget: " + str(result["budget_ms"]) + " ms)",
+            "- imports " + ", ".join(result["forbidden_imports"]) if len(result["forbidden_imports"]) > 0 else ""
+        )
+    if args.output != "":
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": benchmark_results}, f, indent=4)
+    if not all(result["ok"] for result in benchmark_results):
+        sys.exit(1)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import gzip
+import heapq
+import json
+import os
+from contextlib import ExitStack
+from datetime import datetime, date
+from typing import Dict, List, Union, Iterator, Tuple, Set, Iterable
+
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL
+from nesy_diag_ontology.connection_controller import ConnectionController
+from nesy_diag_ontology.knowledge_graph_index import KnowledgeGraphIndex
+from nesy_diag_ontology.knowledge_snapshot import SNAPSHOT_LITERAL_LIMITS
+from nesy_diag_ontology.ntriples import iter_triples, parse_result_row
+from nesy_diag_ontology.snapshot_diff import read_records, open_snapshot
+from nesy_diag_ontology.structured_snapshot import generate_snapshot_records, write_snapshot_records, snapshot_record, \
+    error_code_records, local_name
+
+STATE_FILE = "incremental_snapshot_state.json"
+DIAG_DATE_FORMATS = ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y"]
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+
+# instances whose diag snapshot records depend on the new diag logs (`?log`) - the diag logs themselves, their diag
+# entities (and the other diag logs of these entities), fault paths, classifications / inspections, signals and heatmaps
+DIAG_INSTANCES = f"""
+    {{ VALUES ?inst {{ {{values}} }} BIND(?inst AS ?log) }}
+    UNION {{ ?log <{ONTOLOGY_PREFIX}createdFor> ?inst }}
+    UNION {{ ?log <{ONTOLOGY_PREFIX}createdFor> ?entity . ?inst <{ONTOLOGY_PREFIX}createdFor> ?entity }}
+    UNION {{ ?log <{ONTOLOGY_PREFIX}entails> ?inst }}
+    UNION {{ ?inst <{ONTOLOGY_PREFIX}diagStep> ?log }}
+    UNION {{ ?step <{ONTOLOGY_PREFIX}diagStep> ?log . ?step <{ONTOLOGY_PREFIX}classifies> ?inst }}
+    UNION {{ ?step <{ONTOLOGY_PREFIX}diagStep> ?log . ?step <{ONTOLOGY_PREFIX}produces> ?inst }}
+"""
+# error codes appearing in the new diag logs (their records list the affected diag entities)
+ERROR_CODE_INSTANCES = f"?inst <{ONTOLOGY_PREFIX}appearsIn> ?log . ?inst a <{ONTOLOGY_PREFIX}ErrorCode> ."
+# triples of the instances (outgoing and incoming) + types and literals of their neighbors
+DIAG_EXPORT_PATTERNS = [
+    "{ ?inst ?p ?o . BIND(?inst AS ?s) } UNION { ?s ?p ?inst . BIND(?inst AS ?o) }",
+    "{ ?inst ?rel ?s . } UNION { ?s ?rel ?inst . } ?s ?p ?o . FILTER(isLiteral(?o) || ?p = <" + RDF_TYPE + ">)"
+]
+# outgoing triples of the error codes and their neighbors + types and literals of the neighbors' neighbors (e.g.,
+# suspect component names, diag entity IDs)
+ERROR_CODE_EXPORT_PATTERNS = [
+    "{ ?inst ?p ?o . BIND(?inst AS ?s) } UNION { ?inst ?rel ?s . ?s ?p ?o . }",
+    "?inst ?rel ?n . ?n ?rel2 ?s . ?s ?p ?o . FILTER(isLiteral(?o) || ?p = <" + RDF_TYPE + ">)"
+]
+
+
+def parse_diag_date(diag_date: str) -> Union[date, None]:
+    """
+    Parses the date of a diag log.
+
+    :param diag_date: date of the diagnosis, e.g., 01.02.2024
+    :return: parsed date (None if the format is unknown)
+    """
+    for date_format in DIAG_DATE_FORMATS:
+        try:
+            return datetime.strptime(diag_date, date_format).date()
+        except ValueError:
+            pass
+    return None
+
+
+def query_diag_log_dates(connection: ConnectionController) -> Dict[str, str]:
+    """
+    Queries the dates of all diag logs with a single query.
+
+    :param connection: connection to the knowledge graph
+    :return: diag log IRI -> date (empty string if there is none)
+    """
+    query = f"""
+        SELECT ?log ?date WHERE {{
+            ?log a <{ONTOLOGY_PREFIX}DiagLog> .
+            OPTIONAL {{ ?log <{ONTOLOGY_PREFIX}date> ?date . }}
+        }}
+        """
+    return {
+        res['log']['value']: res['date']['value'] if 'date' in res else ""
+        for res in connection.query_knowledge_graph(query, False)
+    }
+
+
+def load_state(snapshot_dir: str) -> Dict:
+    """
+    Loads the state of the incremental snapshots (high-water mark, base snapshot and increments).
+
+    :param snapshot_dir: directory of the snapshots
+    :return: state (empty if there was no previous run)
+    """
+    path = os.path.join(snapshot_dir, STATE_FILE)
+    if not os.path.isfile(path):
+        return {"high_water_mark": "", "covered": [], "base": "", "increments": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: Dict, snapshot_dir: str) -> None:
+    """
+    Saves the state of the incremental snapshots (atomically, i.e., an interrupted run leaves the previous state).
+
+    :param state: state to be saved
+    :param snapshot_dir: directory of the snapshots
+    """
+    path = os.path.join(snapshot_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def select_new_diag_logs(diag_log_dates: Dict[str, str], state: Dict) -> List[str]:
+    """
+    Selects the diag logs that are not yet covered by the snapshots.
+
+    The dates only have day granularity, i.e., the diag logs of the high-water mark's day (and those without a valid
+    date) are tracked explicitly - everything dated after the high-water mark is new.
+
+    :param diag_log_dates: diag log IRI -> date
+    :param state: state of the incremental snapshots
+    :return: IRIs of the new diag logs
+    """
+    mark = date.fromisoformat(state["high_water_mark"]) if state["high_water_mark"] != "" else None
+    covered = set(state["covered"])
+    new_diag_logs = []
+    for diag_log, diag_date in diag_log_dates.items():
+        parsed_date = parse_diag_date(diag_date)
+        if mark is None or parsed_date is None or parsed_date >= mark:
+            if diag_log not in covered:
+                new_diag_logs.append(diag_log)
+    return sorted(new_diag_logs)
+
+
+def advance_high_water_mark(state: Dict, diag_log_dates: Dict[str, str]) -> None:
+    """
+    Advances the high-water mark to the latest diag log date (all specified diag logs are covered afterwards).
+
+    :param state: state of the incremental snapshots (updated in place)
+    :param diag_log_dates: diag log IRI -> date
+    """
+    dates = {diag_log: parse_diag_date(diag_date) for diag_log, diag_date in diag_log_dates.items()}
+    valid_dates = [d for d in dates.values() if d is not None]
+    mark = max(valid_dates) if len(valid_dates) > 0 else None
+    if state["high_water_mark"] != "" and (mark is None or date.fromisoformat(state["high_water_mark"]) > mark):
+        mark = date.fromisoformat(state["high_water_mark"])
+    state["high_water_mark"] = mark.isoformat() if mark is not None else ""
+    state["covered"] = sorted(diag_log for diag_log, d in dates.items() if d is None or d == mark)
+
+
+def build_increment_query(diag_logs: List[str], instances: str, pattern: str) -> str:
+    """
+    Builds a query for triples needed to create the snapshot records affected by the specified diag logs.
+
+    :param diag_logs: IRIs of the diag logs
+    :param instances: graph pattern binding the affected instances (`?inst`) of a diag log (`?log`)
+    :param pattern: graph pattern binding the triples (`?s ?p ?o`) to be exported for the instances
+    :return: SELECT query
+    """
+    values = " ".join("<" + diag_log + ">" for diag_log in diag_logs)
+    return f"""
+        SELECT DISTINCT ?s ?p ?o WHERE {{
+            VALUES ?log {{ {values} }}
+            {instances.replace("{values}", values)}
+            {pattern}
+        }}
+        """
+
+
+def export_increment(
+        connection: ConnectionController, diag_logs: List[str], instances: str, patterns: List[str]
+) -> Tuple[KnowledgeGraphIndex, Set[str]]:
+    """
+    Builds an index of the triples needed to create the snapshot records affected by the specified diag logs.
+
+    :param connection: connection to the knowledge graph
+    :param diag_logs: IRIs of the diag logs
+    :param instances: graph pattern binding the affected instances (`?inst`) of a diag log (`?log`)
+    :param patterns: graph patterns binding the triples to be exported (one query each) - the first one has to contain
+                     the types of the affected instances
+    :return: (index, local names of the affected instances)
+    """
+    index = KnowledgeGraphIndex(SNAPSHOT_LITERAL_LIMITS)
+    affected = set()
+    for i, pattern in enumerate(patterns):
+        rows = connection.stream_query_results(build_increment_query(diag_logs, instances, pattern), False)
+        index.add_triples(iter_triples(rows, parse_result_row))
+        if i == 0:
+            # instances typed by the subsequent queries (neighbors) are only partially exported
+            affected = {local_name(instance) for instance in index.types}
+    return index, affected
+
+
+def create_increment_records(connection: ConnectionController, diag_logs: List[str]) -> List[Dict]:
+    """
+    Creates the snapshot records affected by the specified (new) diag logs, i.e., the records of the diag logs, their
+    classifications, signals, fault paths, diag entities and error codes.
+
+    :param connection: connection to the knowledge graph
+    :param diag_logs: IRIs of the diag logs
+    :return: sorted snapshot records
+    """
+    diag_index, affected = export_increment(connection, diag_logs, DIAG_INSTANCES, DIAG_EXPORT_PATTERNS)
+    records = [
+        record for record in generate_snapshot_records(None, ['diag'], diag_index) if record["key"] in affected
+    ]
+    error_code_index, _ = export_increment(connection, diag_logs, ERROR_CODE_INSTANCES, ERROR_CODE_EXPORT_PATTERNS)
+    records.extend(error_code_records(error_code_index))
+    records.sort(key=lambda record: (record["concept"], record["key"]))
+    return records
+
+
+def write_snapshot_file(records: Iterable[Dict], path: str) -> None:
+    """
+    Writes the specified snapshot records to a gzip compressed JSON Lines file.
+
+    :param records: sorted snapshot records
+    :param path: path of the `.jsonl.gz` file
+    """
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+        write_snapshot_records(records, f)
+    os.replace(path + ".tmp", path)
+
+
+def update_snapshot(connection: ConnectionController, snapshot_dir: str, jobs: int = 4) -> str:
+    """
+    Creates a snapshot increment covering the diag logs added since the last run (and their classifications, signals,
+    fault paths, etc.). The first run creates a full snapshot (both themes) as base.
+
+    :param connection: connection to the knowledge graph
+    :param snapshot_dir: directory of the snapshots
+    :param jobs: maximum number of concurrent exports (full snapshot)
+    :return: path of the created snapshot file (empty string if there was nothing new)
+    """
+    state = load_state(snapshot_dir)
+    diag_log_dates = query_diag_log_dates(connection)
+    timestamp = datetime.now().strftime("%Y_%m_%d-%H_%M_%S")
+    if state["base"] == "":
+        path = os.path.join(snapshot_dir, "kg_snapshot_" + timestamp + ".jsonl.gz")
+        write_snapshot_file(generate_snapshot_records(connection, ['expert', 'diag'], jobs=jobs), path)
+        state["base"] = path
+        print("created full snapshot covering", len(diag_log_dates), "diag logs:", path)
+    else:
+        new_diag_logs = select_new_diag_logs(diag_log_dates, state)
+        if len(new_diag_logs) == 0:
+            print("no new diag logs since", state["high_water_mark"])
+            return ""
+        path = os.path.join(snapshot_dir, "kg_increment_" + timestamp + ".jsonl.gz")
+        write_snapshot_file(create_increment_records(connection, new_diag_logs), path)
+        state["increments"].append(path)
+        print("created snapshot increment covering", len(new_diag_logs), "new diag logs:", path)
+    advance_high_water_mark(state, diag_log_dates)
+    save_state(state, snapshot_dir)
+    return path
+
+
+def merge_snapshots(paths: List[str]) -> Iterator[Dict]:
+    """
+    Merges the specified sorted snapshots (base and increments) in bounded memory - for entities contained in several
+    snapshots, the record of the latest one is retained.
+
+    :param paths: paths of the snapshots (oldest first)
+    :return: merged records (sorted by concept and key)
+    """
+    def tagged(records: Iterator[Tuple[Tuple[str, str], Dict]], age: int) -> Iterator[Tuple]:
+        for record_key, properties in records:
+            yield record_key, age, properties
+
+    with ExitStack() as stack:
+        streams = [
+            tagged(read_records(stack.enter_context(open_snapshot(path)), path), age) for age, path in enumerate(paths)
+        ]
+        current = None
+        for record_key, _, properties in heapq.merge(*streams, key=lambda record: (record[0], record[1])):
+            if current is not None and current[0] != record_key:
+                yield snapshot_record(current[0][0], current[0][1], current[1])
+            current = (record_key, properties)
+        if current is not None:
+            yield snapshot_record(current[0][0], current[0][1], current[1])
+
+
+def compact_snapshots(snapshot_dir: str) -> str:
+    """
+    Merges the base snapshot and its increments into a new full snapshot, which becomes the base of further increments.
+
+    :param snapshot_dir: directory of the snapshots
+    :return: path of the full snapshot
+    """
+    state = load_state(snapshot_dir)
+    if state["base"] == "":
+        raise ValueError("no snapshot to compact in " + snapshot_dir + " - create one via `update` first")
+    if len(state["increments"]) == 0:
+        print("no increments to compact")
+        return state["base"]
+    path = os.path.join(snapshot_dir, "kg_snapshot_" + datetime.now().strftime("%Y_%m_%d-%H_%M_%S") + ".jsonl.gz")
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+        write_snapshot_records(merge_snapshots([state["base"]] + state["increments"]), f)
+    os.replace(path + ".tmp", path)
+    print("compacted", len(state["increments"]), "increments into full snapshot:", path)
+    state["base"], state["increments"] = path, []
+    save_state(state, snapshot_dir)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incremental structured knowledge snapshots')
+    parser.add_argument('command', type=str, choices=['update', 'compact'], help='create increment / merge increments')
+    parser.add_argument(
+        '--snapshot-dir', type=str, default="knowledge_base/live_kg_backups",
+        help='directory of the snapshots and their state'
+    )
+    parser.add_argument('--kg-url', type=str, help='URL of the knowledge graph server', default=FUSEKI_URL)
+    parser.add_argument('--jobs', type=int, help='maximum number of concurrent queries', required=False, default=4)
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        kg_connection = ConnectionController(namespace=ONTOLOGY_PREFIX, fuseki_url=args.kg_url, verbose=False)
+        update_snapshot(kg_connection, args.snapshot_dir, args.jobs)
+    else:
+        compact_snapshots(args.snapshot_dir)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import queue
+import threading
+import time
+import zlib
+from typing import List, Dict, Union
+
+from nesy_diag_ontology.config import INGESTION_RETRIES, INGESTION_RETRY_BACKOFF_S
+from nesy_diag_ontology.connection_controller import ConnectionController
+from nesy_diag_ontology.fact import Fact
+from nesy_diag_ontology.kg_logging import get_logger
+
+logger = get_logger(__name__)
+
+# outcomes of uploading a batch
+COMMITTED = "committed"
+PENDING = "pending"
+FAILED = "failed"
+
+
+class IngestionQueue:
+    """
+    Non-blocking ingestion of semantic facts into the knowledge graph.
+
+    Fact lists are put onto bounded queues and uploaded in batches by background workers. Each session is assigned to
+    exactly one worker, i.e., the facts of a session are delivered in submission order. Full queues block the
+    submitting thread (backpressure), and `flush()` serves as barrier that waits until everything submitted before
+    has been processed. Failed uploads are retried with exponential backoff - fact lists that still could not be
+    entered are handed back by `flush()`. With a write-ahead log, rejected batches remain pending for its replay instead.
+    """
+
+    def __init__(
+            self, connection: ConnectionController, num_workers: int = 1, max_queue_size: int = 1000,
+            max_batch_size: int = 50, retries: int = INGESTION_RETRIES,
+            retry_backoff_s: float = INGESTION_RETRY_BACKOFF_S
+    ) -> None:
+        """
+        Initializes the ingestion queue and starts the background workers.
+
+        :param connection: connection to the knowledge graph used by the workers for uploading facts
+        :param num_workers: number of background workers (each with its own queue)
+        :param max_queue_size: maximum number of pending fact lists per worker before submissions block
+        :param max_batch_size: maximum number of fact lists merged into a single upload
+        :param retries: maximum number of retries of a failed upload
+        :param retry_backoff_s: waiting time before the first retry in seconds (doubled for each further retry)
+        """
+        assert num_workers > 0 and max_queue_size > 0 and max_batch_size > 0 and retries >= 0
+        self.connection = connection
+        self.max_batch_size = max_batch_size
+        self.retries = retries
+        self.retry_backoff_s = retry_backoff_s
+        self.queues = [queue.Queue(maxsize=max_queue_size) for _ in range(num_workers)]
+        self.metrics_lock = threading.Lock()
+        self.submitted = 0
+        self.committed = 0
+        self.committed_facts = 0
+        self.batches = 0
+        self.errors = 0
+        self.retried = 0
+        self.pending = 0
+        self.pending_batches = 0
+        # session ID -> fact lists that could not be entered (handed back by `flush()`)
+        self.failed: Dict[str, List[List[Fact]]] = {}
+        self.total_commit_latency = 0.0
+        self.max_commit_latency = 0.0
+        self.total_ingestion_latency = 0.0
+        self.max_ingestion_latency = 0.0
+        self.workers = [
+            threading.Thread(target=self.work, args=(q,), name="kg-ingestion-" + str(i), daemon=True)
+            for i, q in enumerate(self.queues)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, facts: List[Fact], session_id: str = "", timeout: Union[float, None] = None) -> None:
+        """
+        Puts the specified facts onto the queue of the worker responsible for the session.
+
+        Blocks while the queue is full; raises `queue.Full` if the timeout elapses before there is space.
+
+        :param facts: semantic facts to be entered into the knowledge graph
+        :param session_id: ID of the (diagnosis) session the facts belong to - determines the worker
+        :param timeout: maximum number of seconds to block (None: wait indefinitely)
+        """
+        q = self.queues[zlib.crc32(session_id.encode()) % len(self.queues)]
+        q.put((time.perf_counter(), session_id, facts), timeout=timeout)
+        with self.metrics_lock:
+            self.submitted += 1
+
+    def work(self, q: queue.Queue) -> None:
+        """
+        Worker loop - takes pending fact lists from the queue and uploads them in batches.
+
+        :param q: queue the worker is responsible for
+        """
+        while True:
+            item = q.get()
+            if item is None:
+                q.task_done()
+                return
+            batch = [item]
+            stop = False
+            # merge what's already waiting into the same upload
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self.commit(batch)
+            for _ in batch:
+                q.task_done()
+            if stop:
+                q.task_done()
+                return
+
+    def upload(self, facts: List[Fact]) -> str:
+        """
+        Enters the specified facts into the knowledge graph - failed uploads are retried with exponential backoff.
+
+        :param facts: semantic facts to be entered into the knowledge graph
+        :return: outcome - committed, pending (in the write-ahead log of the connection) or failed
+        """
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.retry_backoff_s * 2 ** (attempt - 1))
+                with self.metrics_lock:
+                    self.retried += 1
+            try:
+                # rejected extensions (e.g., HTTP errors) are reported by the return value, not raised
+                if self.connection.extend_knowledge_graph(facts):
+                    return COMMITTED
+                if self.connection.write_ahead_log is not None:
+                    # logged durably - entered with the next replay, retrying would only log it again
+                    return PENDING
+                logger.warning("ingestion of %d facts failed (attempt %d)", len(facts), attempt + 1)
+            except Exception as e:
+                logger.warning("ingestion of %d facts failed (attempt %d): %s", len(facts), attempt + 1, e)
+        return FAILED
+
+    def commit(self, batch: List) -> None:
+        """
+        Uploads the specified batch of fact lists as one extension of the knowledge graph.
+
+        :param batch: list of (submission time, session ID, fact list) tuples
+        """
+        facts = [fact for _, _, fact_list in batch for fact in fact_list]
+        start = time.perf_counter()
+        outcome = self.upload(facts)
+        end = time.perf_counter()
+        with self.metrics_lock:
+            self.batches += 1
+            if outcome == FAILED:
+                logger.error("ingestion of %d facts failed - handed back by flush()", len(facts))
+                self.errors += 1
+                for _, session_id, fact_list in batch:
+                    self.failed.setdefault(session_id, []).append(fact_list)
+                return
+            if outcome == PENDING:
+                self.pending += len(batch)
+                self.pending_batches += 1
+                return
+            self.committed += len(batch)
+            self.committed_facts += len(facts)
+            self.total_commit_latency += end - start
+            self.max_commit_latency = max(self.max_commit_latency, end - start)
+            for submission_time, _, _ in batch:
+                self.total_ingestion_latency += end - submission_time
+                self.max_ingestion_latency = max(self.max_ingestion_latency, end - submission_time)
+
+    def flush(self, session_id: Union[str, None] = None) -> List[List[Fact]]:
+        """
+        Blocks until all fact lists submitted so far have been processed by the workers.
+
+        :param session_id: session whose failed fact lists are handed back (None: all sessions)
+        :return: fact lists that could not be entered into the knowledge graph despite the retries (in submission
+                 order per session, e.g., to be resubmitted) - empty if everything was committed (or is pending in the
+                 write-ahead log)
+        """
+        for q in self.queues:
+            q.join()
+        with self.metrics_lock:
+            if session_id is not None:
+                return self.failed.pop(session_id, [])
+            failed = [fact_list for fact_lists in self.failed.values() for fact_list in fact_lists]
+            self.failed.clear()
+            return failed
+
+    def close(self) -> None:
+        """
+        Processes the remaining fact lists and stops the background workers.
+        """
+        for q in self.queues:
+            q.put(None)
+        for worker in self.workers:
+            worker.join()
+
+    def get_metrics(self) -> Dict[str, float]:
+        """
+        Returns the current ingestion metrics (latencies in seconds).
+
+        :return: queue depth, counters and commit / end-to-end ingestion latencies
+        """
+        with self.metrics_lock:
+            successful_batches = self.batches - self.errors - self.pending_batches
+            return {
+                "queue_depth": sum(q.qsize() for q in self.queues),
+                "submitted": self.submitted,
+                "committed": self.committed,
+                "committed_facts": self.committed_facts,
+                "batches": self.batches,
+                "errors": self.errors,
+                "retries": self.retried,
+                "pending": self.pending,
+                "avg_commit_latency": self.total_commit_latency / successful_batches if successful_batches else 0.0,
+                "max_commit_latency": self.max_commit_latency,
+                "avg_ingestion_latency": self.total_ingestion_latency / self.committed if self.committed else 0.0,
+                "max_ingestion_latency": self.max_ingestion_latency
+            }
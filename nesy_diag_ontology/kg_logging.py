@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import logging
+import sys
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+from nesy_diag_ontology.config import LOG_LITERAL_LIMIT, LOG_RATE_LIMIT, LOG_RATE_PERIOD_S
+
+LOGGER_NAME = "nesy_diag_ontology"
+# `extra` of records presented as (colored) banner / heading on the console
+BANNER = {"style": "banner"}
+HEADING = {"style": "heading"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns the logger of the specified module (child of the package logger).
+
+    :param name: module name (`__name__`)
+    :return: logger
+    """
+    return logging.getLogger(name if name.startswith(LOGGER_NAME) else LOGGER_NAME + "." + name)
+
+
+def truncate(text: str, limit: int) -> str:
+    """
+    Truncates the specified text to the specified number of characters.
+
+    :param text: text to be truncated
+    :param limit: maximum number of characters
+    :return: (truncated) text
+    """
+    return text if len(text) <= limit else text[:limit] + "... (" + str(len(text)) + " chars)"
+
+
+class Abbreviated:
+    """
+    Lazily formatted log argument - large literals (e.g., signals) are truncated before the message is built, and
+    nothing is formatted at all if the record is not emitted.
+    """
+
+    def __init__(self, value: Any, limit: int = LOG_LITERAL_LIMIT) -> None:
+        """
+        Initializes the log argument.
+
+        :param value: value to be logged, e.g., a fact or a query
+        :param limit: maximum number of characters per literal
+        """
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        if hasattr(self.value, "triple"):
+            # facts - only the elements are converted to strings, never the entire (possibly huge) triple
+            return "triple: (" + ", ".join(repr(truncate(str(ele), self.limit)) for ele in self.value.triple) + ")"
+        return truncate(str(self.value), self.limit)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limits the number of debug records per message (template) and period, e.g., the facts of large extensions - the
+    number of suppressed records is attached to the next emitted one.
+    """
+
+    def __init__(self, max_records: int = LOG_RATE_LIMIT, period_s: float = LOG_RATE_PERIOD_S) -> None:
+        """
+        Initializes the filter.
+
+        :param max_records: maximum number of debug records per message and period
+        :param period_s: length of the period in seconds
+        """
+        super().__init__()
+        self.max_records = max_records
+        self.period_s = period_s
+        # (logger, message) -> (start of the period, emitted records, suppressed records)
+        self.periods: Dict[Tuple[str, str], Tuple[float, int, int]] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        key, now = (record.name, str(record.msg)), time.monotonic()
+        with self.lock:
+            start, emitted, suppressed = self.periods.get(key, (now, 0, 0))
+            if now - start >= self.period_s:
+                start, emitted = now, 0
+            if emitted >= self.max_records:
+                self.periods[key] = (start, emitted, suppressed + 1)
+                return False
+            self.periods[key] = (start, emitted + 1, 0)
+        record.suppressed = suppressed
+        return True
+
+
+class ConsoleFormatter(logging.Formatter):
+    """
+    Presents the records like the (former) console output - banners and headings are colored.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        msg = super().format(record)
+        if getattr(record, "suppressed", 0) > 0:
+            msg += " [" + str(record.suppressed) + " similar messages suppressed]"
+        style = getattr(record, "style", "")
+        if style in ("banner", "heading"):
+            # only needed for console output
+            from termcolor import colored
+        if style == "banner":
+            line = "########################################################################"
+            return line + "\n" + colored(msg, "green", "on_grey", ["bold"]) + "\n" + line
+        if style == "heading":
+            return "\n" + colored(msg, "green", "on_grey", ["bold"])
+        return msg
+
+
+def enable_console_logging(level: int = logging.DEBUG) -> None:
+    """
+    Presents the log records of the package on stdout (verbose mode) - unless the application configured logging.
+
+    :param level: minimum level of the presented records
+    """
+    package_logger = logging.getLogger(LOGGER_NAME)
+    if len(package_logger.handlers) > 0 or len(logging.getLogger().handlers) > 0:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(ConsoleFormatter("%(message)s"))
+    handler.addFilter(RateLimitFilter())
+    package_logger.addHandler(handler)
+    package_logger.setLevel(level)
+    package_logger.propagate = False
@@ -0,0 +1,687 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+from typing import Dict, Iterator, List, Set, Tuple, TYPE_CHECKING
+
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX
+from nesy_diag_ontology.ntriples import iter_triples, parse_result_row, open_n_triples
+
+if TYPE_CHECKING:
+    from nesy_diag_ontology.connection_controller import ConnectionController
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+
+
+class KnowledgeGraphIndex:
+    """
+    In-memory index of (a part of) the knowledge graph, built from a bulk export of its triples.
+
+    Offers the lookup surface of the `KnowledgeGraphQueryTool` used for knowledge snapshots (same method names,
+    parameters and results), but answers the lookups via dictionary joins instead of one query per lookup.
+    """
+
+    def __init__(self, literal_limits: Dict[str, int] = None) -> None:
+        """
+        Initializes the (empty) index.
+
+        :param literal_limits: optional maximum number of characters retained per literal of the given predicates
+                               (local names), e.g., {"signal": 50} - keeps the memory bounded for large payloads
+        """
+        self.ontology_prefix = ONTOLOGY_PREFIX
+        self.literal_limits = {ONTOLOGY_PREFIX + pred: limit for pred, limit in (literal_limits or {}).items()}
+        # subject -> predicate -> objects (dicts as insertion-ordered sets, exports may contain triples twice)
+        self.outgoing: Dict[str, Dict[str, Dict[str, None]]] = {}
+        # object -> predicate -> subjects
+        self.incoming: Dict[str, Dict[str, Dict[str, None]]] = {}
+        self.types: Dict[str, Set[str]] = {}
+        # class -> instances (in order of appearance)
+        self.instances_by_class: Dict[str, List[str]] = {}
+
+    def add(self, subj: str, pred: str, obj: str, is_literal: bool = False) -> None:
+        """
+        Adds the specified triple to the index.
+
+        :param subj: subject IRI
+        :param pred: predicate IRI
+        :param obj: object IRI or literal value
+        :param is_literal: whether the object is a literal
+        """
+        if pred == RDF_TYPE and not is_literal:
+            if obj not in self.types.setdefault(subj, set()):
+                self.types[subj].add(obj)
+                self.instances_by_class.setdefault(obj, []).append(subj)
+            return
+        if is_literal and pred in self.literal_limits:
+            obj = obj[:self.literal_limits[pred]]
+        self.outgoing.setdefault(subj, {}).setdefault(pred, {})[obj] = None
+        self.incoming.setdefault(obj, {}).setdefault(pred, {})[subj] = None
+
+    def add_triples(self, triples: Iterator[Tuple[str, str, str, bool, str]]) -> None:
+        """
+        Adds the specified (parsed) triples to the index.
+
+        :param triples: (subject, predicate, object, whether the object is a literal, datatype) tuples
+        """
+        for subj, pred, obj, is_literal, _ in triples:
+            self.add(subj, pred, obj, is_literal)
+
+    @staticmethod
+    def build_class_export_query(classes: List[str], incoming: bool = False) -> str:
+        """
+        Builds a query for all triples whose subjects (or objects) are instances of the specified classes.
+
+        :param classes: ontology classes (local names)
+        :param incoming: if true, the triples pointing to the instances are queried instead
+        :return: SELECT query
+        """
+        values = " ".join("<" + ONTOLOGY_PREFIX + cls + ">" for cls in classes)
+        instance = "?o" if incoming else "?s"
+        return f"""
+            SELECT ?s ?p ?o WHERE {{
+                VALUES ?cls {{ {values} }}
+                {instance} a ?cls .
+                ?s ?p ?o .
+            }}
+            """
+
+    @classmethod
+    def from_export(
+            cls, connection: "ConnectionController", classes: List[str], literal_limits: Dict[str, int] = None
+    ) -> "KnowledgeGraphIndex":
+        """
+        Builds an index of all triples whose subjects or objects are instances of the specified classes.
+
+        The triples are streamed in the server's solution order (a CONSTRUCT result would be a set), i.e., the index
+        enumerates instances in the same order as the corresponding queries of the `KnowledgeGraphQueryTool`.
+        Incoming relations are exported separately (after the outgoing ones, which determine the order), since the
+        lookups do not require their subjects to be typed, e.g., the sources of `reasonFor` relations.
+
+        :param connection: connection to the knowledge graph
+        :param classes: ontology classes (local names)
+        :param literal_limits: optional maximum number of characters retained per literal of the given predicates
+        :return: index
+        """
+        index = cls(literal_limits)
+        for incoming in [False, True]:
+            rows = connection.stream_query_results(cls.build_class_export_query(classes, incoming), False)
+            index.add_triples(iter_triples(rows, parse_result_row))
+        return index
+
+    @classmethod
+    def from_n_triples(
+            cls, path: str, literal_limits: Dict[str, int] = None, classes: List[str] = None
+    ) -> "KnowledgeGraphIndex":
+        """
+        Builds an index of the triples of the specified N-Triples file (e.g., a KG backup) without any server.
+
+        The file is parsed line by line. If classes are specified, only the triples whose subjects or objects are
+        instances of these classes are indexed (as for `from_export`) - the file is read twice for that, since type
+        triples may appear anywhere: the first pass only collects the IRIs of the instances. The memory is bounded by
+        the indexed triples (with limited literals), i.e., it grows with the part of the KG relevant for the classes
+        (the entire KG if no classes are specified).
+
+        :param path: path of the `.nt` / `.nt.gz` / `.nt.zst` file
+        :param literal_limits: optional maximum number of characters retained per literal of the given predicates
+        :param classes: optional ontology classes (local names) the indexed triples are restricted to
+        :return: index
+        """
+        index = cls(literal_limits)
+        if classes is None:
+            with open_n_triples(path) as f:
+                index.add_triples(iter_triples(f))
+            return index
+        class_iris = {ONTOLOGY_PREFIX + c for c in classes}
+        instances = set()
+        with open_n_triples(path) as f:
+            for subj, pred, obj, is_literal, _ in iter_triples(line for line in f if RDF_TYPE in line):
+                if pred == RDF_TYPE and not is_literal and obj in class_iris:
+                    instances.add(subj)
+        with open_n_triples(path) as f:
+            index.add_triples(
+                triple for triple in iter_triples(f)
+                if triple[0] in instances or (not triple[3] and triple[2] in instances)
+            )
+        return index
+
+    def entry(self, name: str) -> str:
+        """
+        Completes the ontology IRI for the specified concept / relation.
+
+        :param name: local name of the concept / relation
+        :return: IRI
+        """
+        return self.ontology_prefix + name
+
+    def objects(self, subj: str, pred: str) -> List[str]:
+        """
+        Returns the objects of the specified subject and predicate.
+
+        :param subj: subject IRI
+        :param pred: predicate (local name)
+        :return: objects
+        """
+        return list(self.outgoing.get(subj, {}).get(self.ontology_prefix + pred, ()))
+
+    def subjects(self, pred: str, obj: str) -> List[str]:
+        """
+        Returns the subjects of the specified predicate and object.
+
+        :param pred: predicate (local name)
+        :param obj: object IRI or literal value
+        :return: subjects
+        """
+        return list(self.incoming.get(obj, {}).get(self.ontology_prefix + pred, ()))
+
+    def instances(self, cls: str) -> List[str]:
+        """
+        Returns the instances of the specified class.
+
+        :param cls: class (local name)
+        :return: instance IRIs
+        """
+        return self.instances_by_class.get(self.ontology_prefix + cls, [])
+
+    def has_type(self, instance: str, cls: str) -> bool:
+        """
+        Checks whether the specified instance is of the specified class.
+
+        :param instance: instance IRI
+        :param cls: class (local name)
+        :return: whether the instance is of the class
+        """
+        return self.ontology_prefix + cls in self.types.get(instance, ())
+
+    def named_instances(self, cls: str, name_pred: str, name: str) -> List[str]:
+        """
+        Returns the instances of the specified class that have the specified name.
+
+        :param cls: class (local name)
+        :param name_pred: name property (local name), e.g., `component_name`
+        :param name: name value
+        :return: instance IRIs
+        """
+        return [inst for inst in self.subjects(name_pred, name) if self.has_type(inst, cls)]
+
+    def typed_instance(self, instance_id: str, *classes: str) -> List[str]:
+        """
+        Returns the instance with the specified ID if it's of one of the specified classes.
+
+        :param instance_id: local name of the instance
+        :param classes: accepted classes (local names)
+        :return: instance IRI (empty list if not present)
+        """
+        instance = self.ontology_prefix + instance_id
+        return [instance] if any(self.has_type(instance, cls) for cls in classes) else []
+
+    # --- expert knowledge ---
+
+    def query_all_error_code_instances(self, verbose: bool = True) -> List[str]:
+        """
+        Queries all error code instances stored in the knowledge graph.
+
+        :param verbose: unused (signature of the query tool)
+        :return: all error codes stored in the knowledge graph
+        """
+        return [code for ec in self.instances('ErrorCode') for code in self.objects(ec, 'code')]
+
+    def query_fault_condition_by_error_code(self, error_code: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the fault condition for the specified error code.
+
+        :param error_code: error code to query fault condition for
+        :param verbose: unused (signature of the query tool)
+        :return: fault condition
+        """
+        return [
+            desc for ec in self.named_instances('ErrorCode', 'code', error_code)
+            for cond in self.objects(ec, 'represents') for desc in self.objects(cond, 'condition_desc')
+        ]
+
+    def query_diag_entity_by_error_code(self, error_code: str, verbose: bool = True) -> List[str]:
+        """
+        Queries diag entities in which the specified error code occurred in the past.
+
+        :param error_code: error code to query diag entities for
+        :param verbose: unused (signature of the query tool)
+        :return: diag entities
+        """
+        res = []
+        for ec in self.named_instances('ErrorCode', 'code', error_code):
+            fault_conditions = [fc for fc in self.objects(ec, 'represents') if self.has_type(fc, 'FaultCondition')]
+            for diag_log in self.objects(ec, 'appearsIn'):
+                if not self.has_type(diag_log, 'DiagLog'):
+                    continue
+                for diag_entity in self.objects(diag_log, 'createdFor'):
+                    if self.has_type(diag_entity, 'DiagEntity'):
+                        res += self.objects(diag_entity, 'entity_id') * len(fault_conditions)
+        return res
+
+    def query_suspect_components_by_error_code(self, error_code: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the suspect components associated with the specified error code.
+
+        :param error_code: error code to query suspect components for
+        :param verbose: unused (signature of the query tool)
+        :return: suspect components
+        """
+        return [comp_name for _, comp_name, _ in self.diag_associations(error_code)]
+
+    def query_priority_id_by_error_code_and_sus_comp(
+            self, error_code: str, comp: str, verbose: bool = True
+    ) -> List[str]:
+        """
+        Queries the priority ID of the diagnostic association for the specified code and suspect component.
+
+        :param error_code: error code to query priority ID for
+        :param comp: suspect component to query priority ID for
+        :param verbose: unused (signature of the query tool)
+        :return: priority ID
+        """
+        return [
+            prio for da, comp_name, _ in self.diag_associations(error_code) if comp_name == comp
+            for prio in self.objects(da, 'priority_id')
+        ]
+
+    def diag_associations(self, error_code: str) -> Iterator[Tuple[str, str, str]]:
+        """
+        Iterates over the diagnostic associations of the specified error code.
+
+        :param error_code: error code to iterate diagnostic associations for
+        :return: (diagnostic association, suspect component name, suspect component) tuples
+        """
+        for ec in self.named_instances('ErrorCode', 'code', error_code):
+            for da in self.objects(ec, 'hasAssociation'):
+                if not self.has_type(da, 'DiagnosticAssociation'):
+                    continue
+                for comp in self.objects(da, 'pointsTo'):
+                    if self.has_type(comp, 'SuspectComponent'):
+                        for comp_name in self.objects(comp, 'component_name'):
+                            yield da, comp_name, comp
+
+    def query_affected_by_relations_by_suspect_component(
+            self, component_name: str, verbose: bool = True
+    ) -> List[str]:
+        """
+        Queries the affecting components for the specified suspect component.
+
+        :param component_name: suspect component to query affected_by relations for
+        :param verbose: unused (signature of the query tool)
+        :return: affecting components
+        """
+        return [
+            affecting for comp in self.named_instances('SuspectComponent', 'component_name', component_name)
+            for affecting in self.objects(comp, 'affected_by')
+        ]
+
+    def query_verifies_relation_by_suspect_component(self, component_name: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the component set that can be verified by the specified suspect component.
+
+        :param component_name: suspect component to query verified component set for
+        :param verbose: unused (signature of the query tool)
+        :return: component set name
+        """
+        return [
+            set_name for comp in self.named_instances('SuspectComponent', 'component_name', component_name)
+            for comp_set in self.objects(comp, 'verifies') if self.has_type(comp_set, 'ComponentSet')
+            for set_name in self.objects(comp_set, 'set_name')
+        ]
+
+    def query_verifies_relations_by_component_set(self, set_name: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the suspect components that can verify the specified component set.
+
+        :param set_name: component set to query verifying suspect components for
+        :param verbose: unused (signature of the query tool)
+        :return: suspect component names
+        """
+        return [
+            comp_name for comp_set in self.named_instances('ComponentSet', 'set_name', set_name)
+            for comp in self.subjects('verifies', comp_set) if self.has_type(comp, 'SuspectComponent')
+            for comp_name in self.objects(comp, 'component_name')
+        ]
+
+    def query_includes_relation_by_component_set(self, comp_set_name: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the suspect components that are included in the specified component set.
+
+        :param comp_set_name: component set to query included suspect components for
+        :param verbose: unused (signature of the query tool)
+        :return: component names
+        """
+        return [
+            comp_name for comp_set in self.named_instances('ComponentSet', 'set_name', comp_set_name)
+            for comp in self.objects(comp_set, 'includes') if self.has_type(comp, 'SuspectComponent')
+            for comp_name in self.objects(comp, 'component_name')
+        ]
+
+    def query_all_component_instances(self, verbose: bool = True) -> List[str]:
+        """
+        Queries all component instances stored in the knowledge graph.
+
+        :param verbose: unused (signature of the query tool)
+        :return: all components stored in the knowledge graph
+        """
+        return [name for comp in self.instances('SuspectComponent') for name in self.objects(comp, 'component_name')]
+
+    def query_all_component_set_instances(self, verbose: bool = True) -> List[str]:
+        """
+        Queries all component set instances stored in the knowledge graph.
+
+        :param verbose: unused (signature of the query tool)
+        :return: all component sets stored in the knowledge graph
+        """
+        return [name for comp_set in self.instances('ComponentSet') for name in self.objects(comp_set, 'set_name')]
+
+    # --- diagnosis knowledge ---
+
+    def query_all_recorded_sensor_signals(self, verbose: bool = True) -> List[str]:
+        """
+        Queries all recorded sensor signals stored in the knowledge graph.
+
+        :param verbose: unused (signature of the query tool)
+        :return: all rec sensor signals stored in the knowledge graph
+        """
+        return list(self.instances('SensorSignal'))
+
+    def query_signal_by_sensor_signal_instance(self, sensor_signal_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the signal for the specified `SensorSignal` instance.
+
+        :param sensor_signal_id: ID of the `SensorSignal` instance to query signal for
+        :param verbose: unused (signature of the query tool)
+        :return: signal for `SensorSignal` instance
+        """
+        return [sig for inst in self.typed_instance(sensor_signal_id, 'SensorSignal') for sig in
+                self.objects(inst, 'signal')]
+
+    def query_all_signal_classifications(self, verbose: bool = True) -> List[str]:
+        """
+        Queries all signal classification instances stored in the knowledge graph.
+
+        :param verbose: unused (signature of the query tool)
+        :return: all signal classifications stored in the knowledge graph
+        """
+        return list(self.instances('SignalClassification'))
+
+    def query_model_id_by_signal_classification_id(
+            self, signal_classification_id: str, verbose: bool = True
+    ) -> List[str]:
+        """
+        Queries the model ID for the specified signal classification instance.
+
+        :param signal_classification_id: ID of the signal classification instance to query model ID for
+        :param verbose: unused (signature of the query tool)
+        :return: model ID for signal classification instance
+        """
+        return [
+            model_id for inst in self.typed_instance(signal_classification_id, 'SignalClassification')
+            for model in self.subjects('performs', inst) if self.has_type(model, 'Model')
+            for model_id in self.objects(model, 'model_id')
+        ]
+
+    def query_uncertainty_by_signal_classification_id(
+            self, signal_classification_id: str, verbose: bool = True
+    ) -> List[str]:
+        """
+        Queries the uncertainty for the specified signal classification instance.
+
+        :param signal_classification_id: ID of the signal classification instance to query uncertainty for
+        :param verbose: unused (signature of the query tool)
+        :return: uncertainty for signal classification instance
+        """
+        return self.related(signal_classification_id, ('SignalClassification',), 'uncertainty')
+
+    def query_sensor_signal_by_classification_instance(
+            self, signal_classification_id: str, verbose: bool = True
+    ) -> List[str]:
+        """
+        Queries the sensor signal instance for the specified classification.
+
+        :param signal_classification_id: ID of signal classification instance
+        :param verbose: unused (signature of the query tool)
+        :return: sensor signal instance
+        """
+        return self.related(signal_classification_id, ('SignalClassification',), 'classifies')
+
+    def query_heatmap_by_classification_instance(
+            self, signal_classification_id: str, verbose: bool = True
+    ) -> List[str]:
+        """
+        Queries the heatmap instance for the specified classification.
+
+        :param signal_classification_id: ID of signal classification instance
+        :param verbose: unused (signature of the query tool)
+        :return: generated heatmap
+        """
+        return self.related(signal_classification_id, ('SignalClassification',), 'produces')
+
+    def query_generation_method_by_heatmap(self, heatmap_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the heatmap generation method for the specified heatmap instance.
+
+        :param heatmap_id: ID of heatmap instance
+        :param verbose: unused (signature of the query tool)
+        :return: heatmap generation method
+        """
+        return self.related(heatmap_id, ('Heatmap',), 'generation_method')
+
+    def query_heatmap_string_by_heatmap(self, heatmap_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the heatmap values for the specified heatmap instance.
+
+        :param heatmap_id: ID of heatmap instance
+        :param verbose: unused (signature of the query tool)
+        :return: heatmap values (string)
+        """
+        return self.related(heatmap_id, ('Heatmap',), 'generated_heatmap')
+
+    def query_suspect_component_by_classification(self, classification_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the suspect component for the specified classification.
+
+        :param classification_id: ID of classification instance
+        :param verbose: unused (signature of the query tool)
+        :return: suspect component
+        """
+        return self.related(classification_id, ('SignalClassification', 'ManualInspection'), 'checks')
+
+    def query_reason_for_classification(self, signal_classification_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the reason (other classification) for the specified classification.
+
+        :param signal_classification_id: ID of signal classification instance
+        :param verbose: unused (signature of the query tool)
+        :return: classification reason
+        """
+        return self.related(signal_classification_id, ('SignalClassification',), 'reasonFor', incoming=True)
+
+    def query_led_to_for_classification(self, signal_classification_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the reason (diag association) for the specified classification.
+
+        :param signal_classification_id: ID of signal classification instance
+        :param verbose: unused (signature of the query tool)
+        :return: classification reason
+        """
+        return self.related(signal_classification_id, ('SignalClassification',), 'ledTo', incoming=True)
+
+    def query_prediction_by_classification(self, classification_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the prediction for the specified classification.
+
+        :param classification_id: ID of classification instance
+        :param verbose: unused (signature of the query tool)
+        :return: prediction
+        """
+        return self.related(classification_id, ('SignalClassification', 'ManualInspection'), 'prediction')
+
+    def query_all_manual_inspection_instances(self, verbose: bool = True) -> List[str]:
+        """
+        Queries all manual inspection instances stored in the knowledge graph.
+
+        :param verbose: unused (signature of the query tool)
+        :return: all manual inspections stored in the knowledge graph
+        """
+        return list(self.instances('ManualInspection'))
+
+    def query_reason_for_inspection(self, manual_inspection_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the reason (other classification) for the specified inspection.
+
+        :param manual_inspection_id: ID of manual inspection instance
+        :param verbose: unused (signature of the query tool)
+        :return: classification reason
+        """
+        return self.related(manual_inspection_id, ('ManualInspection',), 'reasonFor', incoming=True)
+
+    def query_led_to_for_inspection(self, manual_inspection_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the reason (diag association) for the specified inspection.
+
+        :param manual_inspection_id: ID of manual inspection instance
+        :param verbose: unused (signature of the query tool)
+        :return: classification reason
+        """
+        return self.related(manual_inspection_id, ('ManualInspection',), 'ledTo', incoming=True)
+
+    def query_all_diag_log_instances(self, verbose: bool = True) -> List[str]:
+        """
+        Queries all diag log instances stored in the knowledge graph.
+
+        :param verbose: unused (signature of the query tool)
+        :return: all diag logs stored in the knowledge graph
+        """
+        return list(self.instances('DiagLog'))
+
+    def query_date_by_diag_log(self, diag_log_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the date for the specified diag log instance.
+
+        :param diag_log_id: ID of the diag log instance to query date for
+        :param verbose: unused (signature of the query tool)
+        :return: date for diag log instance
+        """
+        return self.related(diag_log_id, ('DiagLog',), 'date')
+
+    def query_error_codes_by_diag_log(self, diag_log_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the error codes for the specified diag log instance.
+
+        :param diag_log_id: ID of the diag log instance to query error codes for
+        :param verbose: unused (signature of the query tool)
+        :return: error codes for diag log instance
+        """
+        return self.related(diag_log_id, ('DiagLog',), 'appearsIn', incoming=True)
+
+    def query_fault_path_by_diag_log(self, diag_log_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the fault path for the specified diag log instance.
+
+        :param diag_log_id: ID of the diag log instance to query fault path for
+        :param verbose: unused (signature of the query tool)
+        :return: fault path for diag log instance
+        """
+        return self.related(diag_log_id, ('DiagLog',), 'entails')
+
+    def query_diag_entity_by_diag_log(self, diag_log_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the diag entity for the specified diag log instance.
+
+        :param diag_log_id: ID of the diag log instance to query diag entity for
+        :param verbose: unused (signature of the query tool)
+        :return: diag entity for diag log instance
+        """
+        return self.related(diag_log_id, ('DiagLog',), 'createdFor')
+
+    def query_diag_steps_by_diag_log(self, diag_log_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the diagnostic steps for the specified diag log instance.
+
+        :param diag_log_id: ID of the diag log instance to query diag steps for
+        :param verbose: unused (signature of the query tool)
+        :return: diag steps for diag log instance
+        """
+        return self.related(diag_log_id, ('DiagLog',), 'diagStep', incoming=True)
+
+    def query_all_fault_path_instances(self, verbose: bool = True) -> List[str]:
+        """
+        Queries all fault path instances stored in the knowledge graph.
+
+        :param verbose: unused (signature of the query tool)
+        :return: all fault paths stored in the knowledge graph
+        """
+        return list(self.instances('FaultPath'))
+
+    def query_fault_path_description_by_id(self, fault_path_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the fault path description for the specified fault path ID.
+
+        :param fault_path_id: ID of the fault path instance to query description for
+        :param verbose: unused (signature of the query tool)
+        :return: fault path description for the specified ID
+        """
+        return self.related(fault_path_id, ('FaultPath',), 'fault_path_desc')
+
+    def query_resulted_in_by_fault_path(self, fault_path_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the fault conditions resulting in the specified fault path instance.
+
+        :param fault_path_id: ID of the fault path instance to query fault conditions for
+        :param verbose: unused (signature of the query tool)
+        :return: fault conditions for fault path instance
+        """
+        return self.related(fault_path_id, ('FaultPath',), 'resultedIn', incoming=True)
+
+    def query_fault_condition_description_by_id(self, fault_condition_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the fault condition description for the specified fault condition ID.
+
+        :param fault_condition_id: ID of the fault condition instance to query description for
+        :param verbose: unused (signature of the query tool)
+        :return: fault condition description for the specified ID
+        """
+        return self.related(fault_condition_id, ('FaultCondition',), 'condition_desc')
+
+    def query_all_diag_entity_instances(self, verbose: bool = True) -> List[Tuple[str, str]]:
+        """
+        Queries all diag entity instances stored in the knowledge graph.
+
+        :param verbose: unused (signature of the query tool)
+        :return: all diag entities stored in the knowledge graph
+        """
+        return [
+            (diag_entity, entity_id) for diag_entity in self.instances('DiagEntity')
+            for entity_id in self.objects(diag_entity, 'entity_id')
+        ]
+
+    def query_error_codes_recorded_in_diag_entity(self, diag_entity_id: str, verbose: bool = True) -> List[str]:
+        """
+        Queries the error codes recorded in the specified diag entity.
+
+        :param diag_entity_id: ID of the diag entity to retrieve error codes for
+        :param verbose: unused (signature of the query tool)
+        :return: error codes for the diag entity instance
+        """
+        return [
+            code for diag_entity in self.typed_instance(diag_entity_id, 'DiagEntity')
+            for diag_log in self.subjects('createdFor', diag_entity) if self.has_type(diag_log, 'DiagLog')
+            for error_code in self.subjects('appearsIn', diag_log) if self.has_type(error_code, 'ErrorCode')
+            for code in self.objects(error_code, 'code')
+        ]
+
+    def related(self, instance_id: str, classes: Tuple[str, ...], pred: str, incoming: bool = False) -> List[str]:
+        """
+        Returns the values related to the specified instance via the specified predicate.
+
+        :param instance_id: local name of the instance
+        :param classes: accepted classes of the instance (local names)
+        :param pred: predicate (local name)
+        :param incoming: if true, the subjects pointing to the instance are returned instead of the objects
+        :return: related values
+        """
+        return [
+            val for inst in self.typed_instance(instance_id, *classes)
+            for val in (self.subjects(pred, inst) if incoming else self.objects(inst, pred))
+        ]
@@ -2,30 +2,44 @@
 # -*- coding: utf-8 -*-
 # @author Tim Bohne
 
-from typing import List, Tuple
-
-from termcolor import colored
+from typing import List, Tuple, TYPE_CHECKING
 
 from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL
 from nesy_diag_ontology.connection_controller import ConnectionController
+from nesy_diag_ontology.kg_logging import get_logger, enable_console_logging, BANNER
+from nesy_diag_ontology.metrics import instrumented
+
+if TYPE_CHECKING:
+    import numpy as np
 
+logger = get_logger(__name__)
 
+
+@instrumented("complete_ontology_entry")
 class KnowledgeGraphQueryTool:
     """
     Library of numerous predefined SPARQL queries and response processing for accessing useful information stored in
     the knowledge graph hosted on a 'Fuseki' server.
     """
 
-    def __init__(self, kg_url: str = FUSEKI_URL, verbose: bool = True) -> None:
+    def __init__(self, kg_url: str = FUSEKI_URL, verbose: bool = True, blob_store_dir: str = "") -> None:
         """
         Initializes the KG query tool.
 
         :param kg_url: URL of the server hosting the knowledge graph
         :param verbose: whether the KG query tool should log its actions
+        :param blob_store_dir: optional directory of the local blob store used to resolve signal / heatmap references
         """
         self.ontology_prefix = ONTOLOGY_PREFIX
         self.fuseki_connection = ConnectionController(namespace=ONTOLOGY_PREFIX, fuseki_url=kg_url, verbose=verbose)
         self.verbose = verbose
+        if verbose:
+            enable_console_logging()
+        self.blob_store = None
+        if blob_store_dir != "":
+            # NumPy is only imported when signals / heatmaps are decoded
+            from nesy_diag_ontology.blob_store import BlobStore
+            self.blob_store = BlobStore(blob_store_dir)
 
     def complete_ontology_entry(self, entry: str) -> str:
         """
@@ -45,9 +59,7 @@ class KnowledgeGraphQueryTool:
         :return: fault condition
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: fault condition description for " + error_code, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+            logger.info("QUERY: fault condition description for %s", error_code, extra=BANNER)
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         represents_entry = self.complete_ontology_entry('represents')
         condition_desc_entry = self.complete_ontology_entry('condition_desc')
@@ -63,17 +75,16 @@ class KnowledgeGraphQueryTool:
             """
         return [row['condition_desc']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
-    def query_fault_condition_by_description(self, desc: str) -> List[str]:
+    def query_fault_condition_by_description(self, desc: str, verbose: bool = True) -> List[str]:
         """
         Queries the fault condition instance for the specified description.
 
         :param desc: description to query fault condition instance for
+        :param verbose: if true, logging is activated
         :return: fault condition instance
         """
-        if self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: fault condition for " + desc, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+        if verbose and self.verbose:
+            logger.info("QUERY: fault condition for %s", desc, extra=BANNER)
         fault_condition_entry = self.complete_ontology_entry('FaultCondition')
         condition_desc_entry = self.complete_ontology_entry('condition_desc')
         s = f"""
@@ -83,7 +94,7 @@ class KnowledgeGraphQueryTool:
                 FILTER(STR(?desc) = "{desc}")
             }}
             """
-        return [row['fc']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, True)]
+        return [row['fc']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
     def query_suspect_components_by_error_code(self, error_code: str, verbose: bool = True) -> List[str]:
         """
@@ -94,9 +105,7 @@ class KnowledgeGraphQueryTool:
         :return: suspect components
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: suspect components for " + error_code, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+            logger.info("QUERY: suspect components for %s", error_code, extra=BANNER)
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         suspect_comp_entry = self.complete_ontology_entry('SuspectComponent')
         diag_association_entry = self.complete_ontology_entry('DiagnosticAssociation')
@@ -117,17 +126,16 @@ class KnowledgeGraphQueryTool:
             """
         return [row['comp_name']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
-    def query_suspect_component_by_name(self, component_name: str) -> List[str]:
+    def query_suspect_component_by_name(self, component_name: str, verbose: bool = True) -> List[str]:
         """
         Queries a suspect component by its component name.
 
         :param component_name: name to query suspect component for
+        :param verbose: if true, logging is activated
         :return: suspect component
         """
-        if self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: suspect components by name - " + component_name, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+        if verbose and self.verbose:
+            logger.info("QUERY: suspect components by name - %s", component_name, extra=BANNER)
         suspect_comp_entry = self.complete_ontology_entry('SuspectComponent')
         component_name_entry = self.complete_ontology_entry('component_name')
         s = f"""
@@ -137,19 +145,18 @@ class KnowledgeGraphQueryTool:
                 FILTER(STR(?comp_name) = "{component_name}")
             }}
             """
-        return [row['comp']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, True)]
+        return [row['comp']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
-    def query_component_set_by_name(self, set_name: str) -> List[str]:
+    def query_component_set_by_name(self, set_name: str, verbose: bool = True) -> List[str]:
         """
         Queries a component set by its name.
 
         :param set_name: name to query component set for
+        :param verbose: if true, logging is activated
         :return: component set
         """
-        if self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: component set by name - " + set_name, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+        if verbose and self.verbose:
+            logger.info("QUERY: component set by name - %s", set_name, extra=BANNER)
         component_set_entry = self.complete_ontology_entry('ComponentSet')
         set_name_entry = self.complete_ontology_entry('set_name')
         s = f"""
@@ -159,19 +166,18 @@ class KnowledgeGraphQueryTool:
                 FILTER(STR(?set_name) = "{set_name}")
             }}
             """
-        return [row['comp_set']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, True)]
+        return [row['comp_set']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
-    def query_diag_entity_instance_by_id(self, entity_id: str) -> List[str]:
+    def query_diag_entity_instance_by_id(self, entity_id: str, verbose: bool = True) -> List[str]:
         """
         Queries a diagnosis entity instance by its ID.
 
         :param entity_id: ID to query diagnosis entity instance for
+        :param verbose: if true, logging is activated
         :return: diag entity instance
         """
-        if self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: diag entity instance by ID " + entity_id, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+        if verbose and self.verbose:
+            logger.info("QUERY: diag entity instance by ID %s", entity_id, extra=BANNER)
         diag_entity_entry = self.complete_ontology_entry('DiagEntity')
         id_entry = self.complete_ontology_entry('entity_id')
         s = f"""
@@ -180,7 +186,7 @@ class KnowledgeGraphQueryTool:
                 ?diag_entity {id_entry} "{entity_id}" .
             }}
             """
-        return [row['diag_entity']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, True)]
+        return [row['diag_entity']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
     def query_diag_entity_by_error_code(
             self, error_code: str, verbose: bool = True
@@ -193,11 +199,7 @@ class KnowledgeGraphQueryTool:
         :return: diag entities
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(
-                colored("QUERY: diag entities associated with error code " + error_code, "green", "on_grey", ["bold"])
-            )
-            print("########################################################################")
+            logger.info("QUERY: diag entities associated with error code %s", error_code, extra=BANNER)
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         diag_log_entry = self.complete_ontology_entry('DiagLog')
         appears_in_entry = self.complete_ontology_entry('appearsIn')
@@ -231,9 +233,7 @@ class KnowledgeGraphQueryTool:
         :return: all error codes stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: all error code instances:", "green", "on_grey", ["bold"]))
-            print("########################################################################")
+            logger.info("QUERY: all error code instances:", extra=BANNER)
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         code_entry = self.complete_ontology_entry('code')
         s = f"""
@@ -252,9 +252,7 @@ class KnowledgeGraphQueryTool:
         :return: all fault conditions stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: all fault condition instances:", "green", "on_grey", ["bold"]))
-            print("########################################################################")
+            logger.info("QUERY: all fault condition instances:", extra=BANNER)
         fault_condition_entry = self.complete_ontology_entry('FaultCondition')
         condition_desc_entry = self.complete_ontology_entry('condition_desc')
         s = f"""
@@ -265,17 +263,16 @@ class KnowledgeGraphQueryTool:
             """
         return [row['desc']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
-    def query_fault_condition_instance_by_code(self, error_code: str) -> List[str]:
+    def query_fault_condition_instance_by_code(self, error_code: str, verbose: bool = True) -> List[str]:
         """
         Queries the fault condition instance represented by the specified error code.
 
         :param error_code: error code to query fault condition instance for
+        :param verbose: if true, logging is activated
         :return: fault condition instance
         """
-        if self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: fault condition instance by code " + error_code, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+        if verbose and self.verbose:
+            logger.info("QUERY: fault condition instance by code %s", error_code, extra=BANNER)
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         code_entry = self.complete_ontology_entry('code')
         represents_entry = self.complete_ontology_entry('represents')
@@ -286,19 +283,18 @@ class KnowledgeGraphQueryTool:
                 ?error_code {represents_entry} ?fault_cond .
             }}
             """
-        return [row['fault_cond']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, True)]
+        return [row['fault_cond']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
-    def query_error_code_instance_by_code(self, code: str) -> List[str]:
+    def query_error_code_instance_by_code(self, code: str, verbose: bool = True) -> List[str]:
         """
         Queries the error code instance for the specified code.
 
         :param code: code to query `ErrorCode` instance for
+        :param verbose: if true, logging is activated
         :return: error code instance
         """
-        if self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: error code instance by code " + code, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+        if verbose and self.verbose:
+            logger.info("QUERY: error code instance by code %s", code, extra=BANNER)
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         code_entry = self.complete_ontology_entry('code')
         s = f"""
@@ -307,7 +303,7 @@ class KnowledgeGraphQueryTool:
                 ?error_code {code_entry} "{code}" .
             }}
             """
-        return [row['error_code']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, True)]
+        return [row['error_code']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
     def query_diag_association_instance_by_error_code_and_sus_comp(
             self, error_code: str, comp: str, verbose: bool = True
@@ -321,14 +317,10 @@ class KnowledgeGraphQueryTool:
         :return: diagnostic association instance
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(
-                colored(
-                    "QUERY: diagnostic association by error code + suspect component: " + error_code + ", " + comp,
-                    "green", "on_grey", ["bold"]
-                )
+            logger.info(
+                "QUERY: diagnostic association by error code + suspect component: %s, %s",
+                error_code, comp, extra=BANNER
             )
-            print("########################################################################")
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         diag_association_entry = self.complete_ontology_entry('DiagnosticAssociation')
         suspect_component_entry = self.complete_ontology_entry('SuspectComponent')
@@ -361,14 +353,10 @@ class KnowledgeGraphQueryTool:
         :return: priority ID
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(
-                colored(
-                    "QUERY: diagnostic association priority by error code + component: " + error_code + ", " + comp,
-                    "green", "on_grey", ["bold"]
-                )
+            logger.info(
+                "QUERY: diagnostic association priority by error code + component: %s, %s",
+                error_code, comp, extra=BANNER
             )
-            print("########################################################################")
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         diag_association_entry = self.complete_ontology_entry('DiagnosticAssociation')
         suspect_component_entry = self.complete_ontology_entry('SuspectComponent')
@@ -403,12 +391,9 @@ class KnowledgeGraphQueryTool:
         :return: generated heatmaps
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(colored(
-                "QUERY: generated heatmaps by error code + suspect component: " + error_code + ", " + comp,
-                "green", "on_grey", ["bold"]
-            ))
-            print("########################################################################")
+            logger.info(
+                "QUERY: generated heatmaps by error code + suspect component: %s, %s", error_code, comp, extra=BANNER
+            )
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         diag_association_entry = self.complete_ontology_entry('DiagnosticAssociation')
         suspect_component_entry = self.complete_ontology_entry('SuspectComponent')
@@ -439,17 +424,16 @@ class KnowledgeGraphQueryTool:
             """
         return [row['heatmap_entry']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
-    def query_error_codes_by_entity_id(self, entity_id: str) -> List[str]:
+    def query_error_codes_by_entity_id(self, entity_id: str, verbose: bool = True) -> List[str]:
         """
         Queries the error codes for the specified entity ID.
 
         :param entity_id: entity ID to query error codes for
+        :param verbose: if true, logging is activated
         :return: error codes
         """
-        if self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: error codes by entity ID " + entity_id, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+        if verbose and self.verbose:
+            logger.info("QUERY: error codes by entity ID %s", entity_id, extra=BANNER)
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         diag_entity_entry = self.complete_ontology_entry('DiagEntity')
         code_entry = self.complete_ontology_entry('code')
@@ -462,7 +446,7 @@ class KnowledgeGraphQueryTool:
                 ?diag_entity {entity_id_entry} "{entity_id}" .
             }}
             """
-        return [row['code']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, True)]
+        return [row['code']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
     def query_affected_by_relations_by_suspect_component(self, component_name: str, verbose: bool = True) -> List[str]:
         """
@@ -473,11 +457,7 @@ class KnowledgeGraphQueryTool:
         :return: affecting components
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(
-                colored("QUERY: affecting components by component name " + component_name, "green", "on_grey", ["bold"])
-            )
-            print("########################################################################")
+            logger.info("QUERY: affecting components by component name %s", component_name, extra=BANNER)
         comp_entry = self.complete_ontology_entry('SuspectComponent')
         name_entry = self.complete_ontology_entry('component_name')
         affected_by_entry = self.complete_ontology_entry('affected_by')
@@ -499,11 +479,7 @@ class KnowledgeGraphQueryTool:
         :return: component set name
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(colored(
-                "QUERY: verified component set by component name " + component_name, "green", "on_grey", ["bold"]
-            ))
-            print("########################################################################")
+            logger.info("QUERY: verified component set by component name %s", component_name, extra=BANNER)
         comp_entry = self.complete_ontology_entry('SuspectComponent')
         name_entry = self.complete_ontology_entry('component_name')
         set_entry = self.complete_ontology_entry('ComponentSet')
@@ -529,11 +505,7 @@ class KnowledgeGraphQueryTool:
         :return: suspect component names
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(
-                colored("QUERY: verifying components by component set name " + set_name, "green", "on_grey", ["bold"])
-            )
-            print("########################################################################")
+            logger.info("QUERY: verifying components by component set name %s", set_name, extra=BANNER)
         comp_entry = self.complete_ontology_entry('SuspectComponent')
         name_entry = self.complete_ontology_entry('component_name')
         component_set_entry = self.complete_ontology_entry('ComponentSet')
@@ -559,9 +531,7 @@ class KnowledgeGraphQueryTool:
         :return: component names
         """
         if verbose and self.verbose:
-            print("########################################################################")
-            print(colored("QUERY: components by component set name " + comp_set_name, "green", "on_grey", ["bold"]))
-            print("########################################################################")
+            logger.info("QUERY: components by component set name %s", comp_set_name, extra=BANNER)
         comp_entry = self.complete_ontology_entry('SuspectComponent')
         name_entry = self.complete_ontology_entry('component_name')
         comp_set_entry = self.complete_ontology_entry('ComponentSet')
@@ -586,9 +556,7 @@ class KnowledgeGraphQueryTool:
         :return: all components stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: all component instances")
-            print("####################################")
+            logger.info("QUERY: all component instances", extra=BANNER)
         comp_entry = self.complete_ontology_entry('SuspectComponent')
         name_entry = self.complete_ontology_entry('component_name')
         s = f"""
@@ -599,6 +567,28 @@ class KnowledgeGraphQueryTool:
             """
         return [row['name']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
+    def query_all_suspect_component_instances(self, verbose: bool = True) -> List[Tuple[str, str]]:
+        """
+        Queries all suspect component instances stored in the knowledge graph together with their names.
+
+        :param verbose: if true, logging is activated
+        :return: all suspect component instances and names stored in the knowledge graph
+        """
+        if verbose and self.verbose:
+            logger.info("QUERY: all suspect component instances with names", extra=BANNER)
+        comp_entry = self.complete_ontology_entry('SuspectComponent')
+        name_entry = self.complete_ontology_entry('component_name')
+        s = f"""
+            SELECT ?comp ?name WHERE {{
+                ?comp a {comp_entry} .
+                ?comp {name_entry} ?name .
+            }}
+            """
+        return [
+            (row['comp']['value'], row['name']['value'])
+            for row in self.fuseki_connection.query_knowledge_graph(s, verbose)
+        ]
+
     def query_all_diag_entity_instances(self, verbose: bool = True) -> List[Tuple[str, str]]:
         """
         Queries all diag entity instances stored in the knowledge graph.
@@ -607,9 +597,7 @@ class KnowledgeGraphQueryTool:
         :return: all diag entities stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: all diag entity instances")
-            print("####################################")
+            logger.info("QUERY: all diag entity instances", extra=BANNER)
         diag_entity_entry = self.complete_ontology_entry('DiagEntity')
         entity_id_entry = self.complete_ontology_entry('entity_id')
         s = f"""
@@ -631,9 +619,7 @@ class KnowledgeGraphQueryTool:
         :return: all rec sensor signals stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: all rec sensor signal instances")
-            print("####################################")
+            logger.info("QUERY: all rec sensor signal instances", extra=BANNER)
         signal_entry = self.complete_ontology_entry('SensorSignal')
         s = f"""
             SELECT ?signal WHERE {{
@@ -650,9 +636,7 @@ class KnowledgeGraphQueryTool:
         :return: all signal classifications stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: all signal classification instances")
-            print("####################################")
+            logger.info("QUERY: all signal classification instances", extra=BANNER)
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         s = f"""
             SELECT ?signal_classification WHERE {{
@@ -672,9 +656,9 @@ class KnowledgeGraphQueryTool:
         :return: signal classification for the specified heatmap
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: signal classification instances for the specified heatmap:", heatmap_id)
-            print("####################################")
+            logger.info(
+                "QUERY: signal classification instances for the specified heatmap: %s", heatmap_id, extra=BANNER
+            )
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         heatmap_entry = self.complete_ontology_entry('Heatmap')
         produces_entry = self.complete_ontology_entry('produces')
@@ -700,9 +684,7 @@ class KnowledgeGraphQueryTool:
         :return: all manual inspections stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: all manual inspection instances")
-            print("####################################")
+            logger.info("QUERY: all manual inspection instances", extra=BANNER)
         manual_inspection_entry = self.complete_ontology_entry('ManualInspection')
         s = f"""
             SELECT ?manual_inspection WHERE {{
@@ -719,9 +701,7 @@ class KnowledgeGraphQueryTool:
         :return: all diag logs stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: all diag log instances")
-            print("####################################")
+            logger.info("QUERY: all diag log instances", extra=BANNER)
         diag_log_entry = self.complete_ontology_entry('DiagLog')
         s = f"""
             SELECT ?diag_log WHERE {{
@@ -738,9 +718,7 @@ class KnowledgeGraphQueryTool:
         :return: all fault paths stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: all fault path instances")
-            print("####################################")
+            logger.info("QUERY: all fault path instances", extra=BANNER)
         fault_path_entry = self.complete_ontology_entry('FaultPath')
         s = f"""
             SELECT ?fault_path WHERE {{
@@ -760,9 +738,9 @@ class KnowledgeGraphQueryTool:
         :return: model ID for signal classification instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: model ID for the specified signal classification:", signal_classification_id)
-            print("####################################")
+            logger.info(
+                "QUERY: model ID for the specified signal classification: %s", signal_classification_id, extra=BANNER
+            )
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         model_entry = self.complete_ontology_entry('Model')
         id_entry = self.complete_ontology_entry(signal_classification_id)
@@ -789,9 +767,7 @@ class KnowledgeGraphQueryTool:
         :return: model instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: model instance for the specified ID:", model_id)
-            print("####################################")
+            logger.info("QUERY: model instance for the specified ID: %s", model_id, extra=BANNER)
         model_entry = self.complete_ontology_entry('Model')
         model_id_entry = self.complete_ontology_entry('model_id')
         s = f"""
@@ -803,6 +779,28 @@ class KnowledgeGraphQueryTool:
             """
         return [row['model']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
+    def query_all_model_instances(self, verbose: bool = True) -> List[Tuple[str, str]]:
+        """
+        Queries all model instances stored in the knowledge graph together with their model IDs.
+
+        :param verbose: if true, logging is activated
+        :return: all model instances and model IDs stored in the knowledge graph
+        """
+        if verbose and self.verbose:
+            logger.info("QUERY: all model instances with model IDs", extra=BANNER)
+        model_entry = self.complete_ontology_entry('Model')
+        model_id_entry = self.complete_ontology_entry('model_id')
+        s = f"""
+            SELECT ?model ?model_id WHERE {{
+                ?model a {model_entry} .
+                ?model {model_id_entry} ?model_id .
+            }}
+            """
+        return [
+            (row['model']['value'], row['model_id']['value'])
+            for row in self.fuseki_connection.query_knowledge_graph(s, verbose)
+        ]
+
     def query_suspect_component_name_by_id(self, component_id: str, verbose: bool = True) -> List[str]:
         """
         Queries the suspect component name for the specified component ID.
@@ -812,9 +810,7 @@ class KnowledgeGraphQueryTool:
         :return: component name for component instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: suspect component name for the specified instance:", component_id)
-            print("####################################")
+            logger.info("QUERY: suspect component name for the specified instance: %s", component_id, extra=BANNER)
         suspect_comp_entry = self.complete_ontology_entry('SuspectComponent')
         id_entry = self.complete_ontology_entry(component_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -839,9 +835,9 @@ class KnowledgeGraphQueryTool:
         :return: uncertainty for signal classification instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: uncertainty for the specified signal classification:", signal_classification_id)
-            print("####################################")
+            logger.info(
+                "QUERY: uncertainty for the specified signal classification: %s", signal_classification_id, extra=BANNER
+            )
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         id_entry = self.complete_ontology_entry(signal_classification_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -864,9 +860,7 @@ class KnowledgeGraphQueryTool:
         :return: date for diag log instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: date for the specified diag log:", diag_log_id)
-            print("####################################")
+            logger.info("QUERY: date for the specified diag log: %s", diag_log_id, extra=BANNER)
         diag_log_entry = self.complete_ontology_entry('DiagLog')
         id_entry = self.complete_ontology_entry(diag_log_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -889,9 +883,7 @@ class KnowledgeGraphQueryTool:
         :return: fault conditions for fault path instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: fault conditions for the specified fault path:", fault_path_id)
-            print("####################################")
+            logger.info("QUERY: fault conditions for the specified fault path: %s", fault_path_id, extra=BANNER)
         fault_path_entry = self.complete_ontology_entry('FaultPath')
         id_entry = self.complete_ontology_entry(fault_path_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -914,9 +906,7 @@ class KnowledgeGraphQueryTool:
         :return: error codes for the diag entity instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: error codes for the specified diag entity:", diag_entity_id)
-            print("####################################")
+            logger.info("QUERY: error codes for the specified diag entity: %s", diag_entity_id, extra=BANNER)
         error_code_entry = self.complete_ontology_entry('ErrorCode')
         diag_log_entry = self.complete_ontology_entry('DiagLog')
         diag_entity_entry = self.complete_ontology_entry('DiagEntity')
@@ -947,9 +937,7 @@ class KnowledgeGraphQueryTool:
         :return: error codes for diag log instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: error codes for the specified diag log:", diag_log_id)
-            print("####################################")
+            logger.info("QUERY: error codes for the specified diag log: %s", diag_log_id, extra=BANNER)
         diag_log_entry = self.complete_ontology_entry('DiagLog')
         id_entry = self.complete_ontology_entry(diag_log_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -972,9 +960,7 @@ class KnowledgeGraphQueryTool:
         :return: diag steps for diag log instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: diag steps for the specified diag log:", diag_log_id)
-            print("####################################")
+            logger.info("QUERY: diag steps for the specified diag log: %s", diag_log_id, extra=BANNER)
         diag_log_entry = self.complete_ontology_entry('DiagLog')
         id_entry = self.complete_ontology_entry(diag_log_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -997,9 +983,7 @@ class KnowledgeGraphQueryTool:
         :return: fault path for diag log instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: fault path for the specified diag log:", diag_log_id)
-            print("####################################")
+            logger.info("QUERY: fault path for the specified diag log: %s", diag_log_id, extra=BANNER)
         diag_log_entry = self.complete_ontology_entry('DiagLog')
         id_entry = self.complete_ontology_entry(diag_log_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1022,9 +1006,7 @@ class KnowledgeGraphQueryTool:
         :return: fault path description for the specified ID
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: fault path description for the specified ID:", fault_path_id)
-            print("####################################")
+            logger.info("QUERY: fault path description for the specified ID: %s", fault_path_id, extra=BANNER)
         fault_path_entry = self.complete_ontology_entry('FaultPath')
         id_entry = self.complete_ontology_entry(fault_path_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1047,9 +1029,7 @@ class KnowledgeGraphQueryTool:
         :return: fault condition description for the specified ID
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: fault condition description for the specified ID:", fault_condition_id)
-            print("####################################")
+            logger.info("QUERY: fault condition description for the specified ID: %s", fault_condition_id, extra=BANNER)
         fault_condition_entry = self.complete_ontology_entry('FaultCondition')
         id_entry = self.complete_ontology_entry(fault_condition_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1072,9 +1052,7 @@ class KnowledgeGraphQueryTool:
         :return: diag entity for diag log instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: diag entity for the specified diag log:", diag_log_id)
-            print("####################################")
+            logger.info("QUERY: diag entity for the specified diag log: %s", diag_log_id, extra=BANNER)
         diag_log_entry = self.complete_ontology_entry('DiagLog')
         id_entry = self.complete_ontology_entry(diag_log_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1097,9 +1075,7 @@ class KnowledgeGraphQueryTool:
         :return: signal for `SensorSignal` instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: signal for the specified `SensorSignal`:", sensor_signal_id)
-            print("####################################")
+            logger.info("QUERY: signal for the specified `SensorSignal`: %s", sensor_signal_id, extra=BANNER)
         sensor_signal_entry = self.complete_ontology_entry('SensorSignal')
         id_entry = self.complete_ontology_entry(sensor_signal_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1113,6 +1089,38 @@ class KnowledgeGraphQueryTool:
             """
         return [row['signal']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
+    def query_signal_array_by_sensor_signal_instance(
+            self, sensor_signal_id: str, verbose: bool = True
+    ) -> List["np.ndarray"]:
+        """
+        Queries the signal for the specified `SensorSignal` instance and decodes it into an array.
+
+        Supports the binary encodings, blob references (memory-mapped, zero-copy) and the legacy list string
+        representation.
+
+        :param sensor_signal_id: ID of the `SensorSignal` instance to query signal for
+        :param verbose: if true, logging is activated
+        :return: decoded signal for `SensorSignal` instance
+        """
+        if verbose and self.verbose:
+            logger.info("QUERY: signal array for the specified `SensorSignal`: %s", sensor_signal_id, extra=BANNER)
+        sensor_signal_entry = self.complete_ontology_entry('SensorSignal')
+        id_entry = self.complete_ontology_entry(sensor_signal_id)
+        id_entry = id_entry.replace('<', '').replace('>', '')
+        signal_entry = self.complete_ontology_entry('signal')
+        s = f"""
+            SELECT ?signal WHERE {{
+                ?sensor_signal a {sensor_signal_entry} .
+                FILTER(STR(?sensor_signal) = "{id_entry}") .
+                ?sensor_signal {signal_entry} ?signal .
+            }}
+            """
+        from nesy_diag_ontology.signal_encoding import decode_array
+        return [
+            decode_array(row['signal']['value'], row['signal'].get('datatype', ""), self.blob_store)
+            for row in self.fuseki_connection.query_knowledge_graph(s, verbose)
+        ]
+
     def query_sensor_signal_by_classification_instance(
             self, signal_classification_id: str, verbose: bool = True
     ) -> List[str]:
@@ -1124,9 +1132,10 @@ class KnowledgeGraphQueryTool:
         :return: sensor signal instance
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: sensor signal instance for the specified classification:", signal_classification_id)
-            print("####################################")
+            logger.info(
+                "QUERY: sensor signal instance for the specified classification: %s",
+                signal_classification_id, extra=BANNER
+            )
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         id_entry = self.complete_ontology_entry(signal_classification_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1149,9 +1158,9 @@ class KnowledgeGraphQueryTool:
         :return: suspect component
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: suspect component for the specified classification:", classification_id)
-            print("####################################")
+            logger.info(
+                "QUERY: suspect component for the specified classification: %s", classification_id, extra=BANNER
+            )
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         manual_inspection_entry = self.complete_ontology_entry('ManualInspection')
         id_entry = self.complete_ontology_entry(classification_id)
@@ -1177,9 +1186,10 @@ class KnowledgeGraphQueryTool:
         :return: classification reason
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: classification reason for the specified classification:", signal_classification_id)
-            print("####################################")
+            logger.info(
+                "QUERY: classification reason for the specified classification: %s",
+                signal_classification_id, extra=BANNER
+            )
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         id_entry = self.complete_ontology_entry(signal_classification_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1202,9 +1212,10 @@ class KnowledgeGraphQueryTool:
         :return: classification reason
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: classification reason for the specified classification:", signal_classification_id)
-            print("####################################")
+            logger.info(
+                "QUERY: classification reason for the specified classification: %s",
+                signal_classification_id, extra=BANNER
+            )
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         id_entry = self.complete_ontology_entry(signal_classification_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1227,9 +1238,10 @@ class KnowledgeGraphQueryTool:
         :return: classification reason
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: classification reason for the specified manual inspection:", manual_inspection_id)
-            print("####################################")
+            logger.info(
+                "QUERY: classification reason for the specified manual inspection: %s",
+                manual_inspection_id, extra=BANNER
+            )
         manual_inspection_entry = self.complete_ontology_entry('ManualInspection')
         id_entry = self.complete_ontology_entry(manual_inspection_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1252,9 +1264,10 @@ class KnowledgeGraphQueryTool:
         :return: classification reason
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: classification reason for the specified manual inspection:", manual_inspection_id)
-            print("####################################")
+            logger.info(
+                "QUERY: classification reason for the specified manual inspection: %s",
+                manual_inspection_id, extra=BANNER
+            )
         manual_inspection_entry = self.complete_ontology_entry('ManualInspection')
         id_entry = self.complete_ontology_entry(manual_inspection_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1268,16 +1281,16 @@ class KnowledgeGraphQueryTool:
             """
         return [row['led_to']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
-    def query_channel_by_name(self, chan_name: str) -> List[str]:
+    def query_channel_by_name(self, chan_name: str, verbose: bool = True) -> List[str]:
         """
         Queries a multivariate signal channel by its name.
 
         :param chan_name: name to query channel for
+        :param verbose: if true, logging is activated
         :return: channel
         """
-        print("########################################################################")
-        print(colored("QUERY: signal channel by name - " + chan_name, "green", "on_grey", ["bold"]))
-        print("########################################################################")
+        if verbose and self.verbose:
+            logger.info("QUERY: signal channel by name - %s", chan_name, extra=BANNER)
         chan_entry = self.complete_ontology_entry('Channel')
         chan_name_entry = self.complete_ontology_entry('channel_name')
         s = f"""
@@ -1287,18 +1300,18 @@ class KnowledgeGraphQueryTool:
                 FILTER(STR(?chan_name) = "{chan_name}")
             }}
             """
-        return [row['chan']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, True)]
+        return [row['chan']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
-    def query_sub_component_by_name(self, sub_component_name: str) -> List[str]:
+    def query_sub_component_by_name(self, sub_component_name: str, verbose: bool = True) -> List[str]:
         """
         Queries a subcomponent by its name.
 
         :param sub_component_name: name to query subcomponent for
+        :param verbose: if true, logging is activated
         :return: subcomponent
         """
-        print("########################################################################")
-        print(colored("QUERY: subcomponents by name - " + sub_component_name, "green", "on_grey", ["bold"]))
-        print("########################################################################")
+        if verbose and self.verbose:
+            logger.info("QUERY: subcomponents by name - %s", sub_component_name, extra=BANNER)
         sub_comp_entry = self.complete_ontology_entry('SubComponent')
         component_name_entry = self.complete_ontology_entry('component_name')
         s = f"""
@@ -1308,7 +1321,7 @@ class KnowledgeGraphQueryTool:
                 FILTER(STR(?comp_name) = "{sub_component_name}")
             }}
             """
-        return [row['sub_comp']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, True)]
+        return [row['sub_comp']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
     def query_prediction_by_classification(self, classification_id: str, verbose: bool = True) -> List[str]:
         """
@@ -1319,9 +1332,7 @@ class KnowledgeGraphQueryTool:
         :return: prediction
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: prediction for the specified classification:", classification_id)
-            print("####################################")
+            logger.info("QUERY: prediction for the specified classification: %s", classification_id, extra=BANNER)
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         manual_classification_entry = self.complete_ontology_entry('ManualInspection')
         id_entry = self.complete_ontology_entry(classification_id)
@@ -1349,9 +1360,9 @@ class KnowledgeGraphQueryTool:
         :return: generated heatmap
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: heatmap instance for the specified classification:", signal_classification_id)
-            print("####################################")
+            logger.info(
+                "QUERY: heatmap instance for the specified classification: %s", signal_classification_id, extra=BANNER
+            )
         signal_classification_entry = self.complete_ontology_entry('SignalClassification')
         id_entry = self.complete_ontology_entry(signal_classification_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1374,9 +1385,9 @@ class KnowledgeGraphQueryTool:
         :return: heatmap generation method
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: heatmap generation method for the specified heatmap instance:", heatmap_id)
-            print("####################################")
+            logger.info(
+                "QUERY: heatmap generation method for the specified heatmap instance: %s", heatmap_id, extra=BANNER
+            )
         heatmap_entry = self.complete_ontology_entry('Heatmap')
         id_entry = self.complete_ontology_entry(heatmap_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1399,9 +1410,7 @@ class KnowledgeGraphQueryTool:
         :return: heatmap values (string)
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: heatmap values for the specified heatmap instance:", heatmap_id)
-            print("####################################")
+            logger.info("QUERY: heatmap values for the specified heatmap instance: %s", heatmap_id, extra=BANNER)
         heatmap_entry = self.complete_ontology_entry('Heatmap')
         id_entry = self.complete_ontology_entry(heatmap_id)
         id_entry = id_entry.replace('<', '').replace('>', '')
@@ -1415,6 +1424,36 @@ class KnowledgeGraphQueryTool:
             """
         return [row['gen_heatmap']['value'] for row in self.fuseki_connection.query_knowledge_graph(s, verbose)]
 
+    def query_heatmap_array_by_heatmap(self, heatmap_id: str, verbose: bool = True) -> List["np.ndarray"]:
+        """
+        Queries the heatmap values for the specified heatmap instance and decodes them into an array.
+
+        Supports the binary encodings, blob references (memory-mapped, zero-copy) and the legacy list string
+        representation.
+
+        :param heatmap_id: ID of heatmap instance
+        :param verbose: if true, logging is activated
+        :return: decoded heatmap values
+        """
+        if verbose and self.verbose:
+            logger.info("QUERY: heatmap array for the specified heatmap instance: %s", heatmap_id, extra=BANNER)
+        heatmap_entry = self.complete_ontology_entry('Heatmap')
+        id_entry = self.complete_ontology_entry(heatmap_id)
+        id_entry = id_entry.replace('<', '').replace('>', '')
+        heatmap_values_entry = self.complete_ontology_entry('generated_heatmap')
+        s = f"""
+            SELECT ?gen_heatmap WHERE {{
+                ?heatmap a {heatmap_entry} .
+                FILTER(STR(?heatmap) = "{id_entry}") .
+                ?heatmap {heatmap_values_entry} ?gen_heatmap .
+            }}
+            """
+        from nesy_diag_ontology.signal_encoding import decode_array
+        return [
+            decode_array(row['gen_heatmap']['value'], row['gen_heatmap'].get('datatype', ""), self.blob_store)
+            for row in self.fuseki_connection.query_knowledge_graph(s, verbose)
+        ]
+
     def query_all_heatmap_instances(self, verbose: bool = True) -> List[str]:
         """
         Queries all heatmap instances stored in the knowledge graph.
@@ -1423,9 +1462,7 @@ class KnowledgeGraphQueryTool:
         :return: all heatmaps stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: all heatmap instances")
-            print("####################################")
+            logger.info("QUERY: all heatmap instances", extra=BANNER)
         heatmap_entry = self.complete_ontology_entry('Heatmap')
         s = f"""
             SELECT ?heatmap WHERE {{
@@ -1442,9 +1479,7 @@ class KnowledgeGraphQueryTool:
         :return: all component sets stored in the knowledge graph
         """
         if verbose and self.verbose:
-            print("####################################")
-            print("QUERY: all component set instances")
-            print("####################################")
+            logger.info("QUERY: all component set instances", extra=BANNER)
         component_set_entry = self.complete_ontology_entry('ComponentSet')
         set_name_entry = self.complete_ontology_entry('set_name')
         s = f"""
@@ -1525,6 +1560,10 @@ if __name__ == '__main__':
     qt.print_res(qt.query_heatmap_by_classification_instance(dummy_id))
     qt.print_res(qt.query_generation_method_by_heatmap(dummy_id))
     qt.print_res(qt.query_heatmap_string_by_heatmap(dummy_id))
+    qt.print_res(qt.query_signal_array_by_sensor_signal_instance(dummy_id))
+    qt.print_res(qt.query_heatmap_array_by_heatmap(dummy_id))
     qt.print_res(qt.query_all_heatmap_instances(False))
     qt.print_res(qt.query_all_component_set_instances(False))
     qt.print_res(qt.query_model_by_model_id("42qq#34"))
+    qt.print_res(qt.query_all_suspect_component_instances(False))
+    qt.print_res(qt.query_all_model_instances(False))
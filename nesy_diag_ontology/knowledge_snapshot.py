@@ -3,27 +3,36 @@
 # @author Tim Bohne
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Union, List, Tuple, Callable, Dict, Iterator
 
 from termcolor import colored
 
-from knowledge_graph_query_tool import KnowledgeGraphQueryTool
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL
+from nesy_diag_ontology.connection_controller import ConnectionController
+from nesy_diag_ontology.knowledge_graph_index import KnowledgeGraphIndex
+from nesy_diag_ontology.knowledge_graph_query_tool import KnowledgeGraphQueryTool
 
+KnowledgeAccess = Union[KnowledgeGraphQueryTool, KnowledgeGraphIndex]
 
-def knowledge_snapshot_error_code_perspective() -> None:
+
+def knowledge_snapshot_error_code_perspective(qt: KnowledgeAccess) -> None:
     """
     Presents a snapshot of the knowledge currently stored in the KG from an error-code-centric perspective.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
     """
     print("###########################################################################")
     print("KNOWLEDGE SNAPSHOT - ERROR CODE PERSPECTIVE")
     print("###########################################################################\n")
-    for error_code in qt.query_all_error_code_instances(False):
+    for error_code in sorted(qt.query_all_error_code_instances(False)):
         print(colored(error_code, "yellow", "on_grey", ["bold"]))
         print(
             colored("\t- fault condition:", "blue", "on_grey", ["bold"]),
             qt.query_fault_condition_by_error_code(error_code, False)[0]
         )
         print(colored("\t- diag entity occurrences:", "blue", "on_grey", ["bold"]))
-        diag_entity_occurrences = qt.query_diag_entity_by_error_code(error_code, False)
+        diag_entity_occurrences = sorted(qt.query_diag_entity_by_error_code(error_code, False))
         for diag_entity_occ in diag_entity_occurrences:
             print("\t\t-", diag_entity_occ)
 
@@ -38,64 +47,70 @@ def knowledge_snapshot_error_code_perspective() -> None:
             print(colored("\t\t- " + ordered_sus_comp[i], "yellow", "on_grey", ["bold"]))
             print(
                 colored("\t\t\taffected by:", "blue", "on_grey", ["bold"]),
-                qt.query_affected_by_relations_by_suspect_component(ordered_sus_comp[i], False)
+                sorted(qt.query_affected_by_relations_by_suspect_component(ordered_sus_comp[i], False))
             )
             print(
                 colored("\t\t\tverifies:", "blue", "on_grey", ["bold"]),
-                qt.query_verifies_relation_by_suspect_component(ordered_sus_comp[i], False)
+                sorted(qt.query_verifies_relation_by_suspect_component(ordered_sus_comp[i], False))
             )
         print()
     print("\n----------------------------------------------------------------------\n")
 
 
-def knowledge_snapshot_component_set_perspective() -> None:
+def knowledge_snapshot_component_set_perspective(qt: KnowledgeAccess) -> None:
     """
     Presents a snapshot of the knowledge currently stored in the KG from a component-set-centric perspective.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
     """
     print("###########################################################################")
     print("KNOWLEDGE SNAPSHOT - COMPONENT SET PERSPECTIVE")
     print("###########################################################################\n")
-    for comp_set in qt.query_all_component_set_instances(False):
+    for comp_set in sorted(qt.query_all_component_set_instances(False)):
         print(colored(comp_set, "yellow", "on_grey", ["bold"]))
         print(
             colored("\t- verified by:", "blue", "on_grey", ["bold"]),
-            qt.query_verifies_relations_by_component_set(comp_set, False)
+            sorted(qt.query_verifies_relations_by_component_set(comp_set, False))
         )
         print(
             colored("\t- includes:", "blue", "on_grey", ["bold"]),
-            qt.query_includes_relation_by_component_set(comp_set, False)
+            sorted(qt.query_includes_relation_by_component_set(comp_set, False))
         )
     print("\n----------------------------------------------------------------------\n")
 
 
-def knowledge_snapshot_component_perspective() -> None:
+def knowledge_snapshot_component_perspective(qt: KnowledgeAccess) -> None:
     """
     Presents a snapshot of the knowledge currently stored in the KG from a component-centric perspective.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
     """
     print("###########################################################################")
     print("KNOWLEDGE SNAPSHOT - COMPONENT PERSPECTIVE")
     print("###########################################################################\n")
-    for comp in qt.query_all_component_instances(False):
+    for comp in sorted(qt.query_all_component_instances(False)):
         print(colored(comp, "yellow", "on_grey", ["bold"]))
         print(
             colored("\t- affected by:", "blue", "on_grey", ["bold"]),
-            qt.query_affected_by_relations_by_suspect_component(comp, False)
+            sorted(qt.query_affected_by_relations_by_suspect_component(comp, False))
         )
         print(
             colored("\t- verifies:", "blue", "on_grey", ["bold"]),
-            qt.query_verifies_relation_by_suspect_component(comp, False)
+            sorted(qt.query_verifies_relation_by_suspect_component(comp, False))
         )
     print("\n----------------------------------------------------------------------\n")
 
 
-def knowledge_snapshot_signal_perspective() -> None:
+def knowledge_snapshot_signal_perspective(qt: KnowledgeAccess) -> None:
     """
     Presents a snapshot of the knowledge currently stored in the KG regarding sensor signals.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
     """
     print("###########################################################################")
     print("KNOWLEDGE SNAPSHOT - SENSOR SIGNAL PERSPECTIVE")
     print("###########################################################################\n")
-    for signal in qt.query_all_recorded_sensor_signals(False):
+    for signal in sorted(qt.query_all_recorded_sensor_signals(False)):
         signal_id = signal.split("#")[1]
         print(colored("signal: " + signal.split("#")[1], "yellow", "on_grey", ["bold"]))
         signal_str = qt.query_signal_by_sensor_signal_instance(signal_id, False)[0]
@@ -103,14 +118,16 @@ def knowledge_snapshot_signal_perspective() -> None:
     print("\n----------------------------------------------------------------------\n")
 
 
-def knowledge_snapshot_signal_classification_perspective() -> None:
+def knowledge_snapshot_signal_classification_perspective(qt: KnowledgeAccess) -> None:
     """
     Presents a snapshot of the knowledge currently stored in the KG regarding signal classifications.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
     """
     print("###########################################################################")
     print("KNOWLEDGE SNAPSHOT - SIGNAL CLASSIFICATION PERSPECTIVE")
     print("###########################################################################\n")
-    for signal_classification in qt.query_all_signal_classifications(False):
+    for signal_classification in sorted(qt.query_all_signal_classifications(False)):
         signal_classification_id = signal_classification.split("#")[1]
         print(colored(signal_classification_id, "yellow", "on_grey", ["bold"]))
         print(
@@ -155,14 +172,16 @@ def knowledge_snapshot_signal_classification_perspective() -> None:
     print("\n----------------------------------------------------------------------\n")
 
 
-def knowledge_snapshot_manual_inspection_perspective() -> None:
+def knowledge_snapshot_manual_inspection_perspective(qt: KnowledgeAccess) -> None:
     """
     Presents a snapshot of the knowledge currently stored in the KG regarding manual inspections.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
     """
     print("###########################################################################")
     print("KNOWLEDGE SNAPSHOT - MANUAL INSPECTION PERSPECTIVE")
     print("###########################################################################\n")
-    for manual_inspection in qt.query_all_manual_inspection_instances(False):
+    for manual_inspection in sorted(qt.query_all_manual_inspection_instances(False)):
         manual_inspection_id = manual_inspection.split("#")[1]
         print(colored(manual_inspection_id, "yellow", "on_grey", ["bold"]))
         suspect_comp_instance = qt.query_suspect_component_by_classification(manual_inspection_id, False)
@@ -179,20 +198,22 @@ def knowledge_snapshot_manual_inspection_perspective() -> None:
     print("\n----------------------------------------------------------------------\n")
 
 
-def knowledge_snapshot_diag_log_perspective() -> None:
+def knowledge_snapshot_diag_log_perspective(qt: KnowledgeAccess) -> None:
     """
     Presents a snapshot of the knowledge currently stored in the KG regarding diagnosis logs.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
     """
     print("###########################################################################")
     print("KNOWLEDGE SNAPSHOT - DIAGNOSIS LOG PERSPECTIVE")
     print("###########################################################################\n")
-    for diag_log in qt.query_all_diag_log_instances(False):
+    for diag_log in sorted(qt.query_all_diag_log_instances(False)):
         diag_log_id = diag_log.split("#")[1]
         print(colored(diag_log_id, "yellow", "on_grey", ["bold"]))
         print(colored("\t- date:", "blue", "on_grey", ["bold"]), qt.query_date_by_diag_log(diag_log_id, False)[0])
         print(colored("\t- appearing error codes:", "blue", "on_grey", ["bold"]))
 
-        appearing_error_codes = qt.query_error_codes_by_diag_log(diag_log_id, False)
+        appearing_error_codes = sorted(qt.query_error_codes_by_diag_log(diag_log_id, False))
         for error_code in appearing_error_codes:
             print("\t\t-", error_code.split("#")[1])
 
@@ -205,76 +226,195 @@ def knowledge_snapshot_diag_log_perspective() -> None:
         print(colored("\t- created for diag entity:", "blue", "on_grey", ["bold"]), diag_entity_id)
 
         print(colored("\t- diagnostic steps:", "blue", "on_grey", ["bold"]))
-        diag_steps = qt.query_diag_steps_by_diag_log(diag_log_id, False)
+        diag_steps = sorted(qt.query_diag_steps_by_diag_log(diag_log_id, False))
         for diag_step in diag_steps:
             print("\t\t-", diag_step.split("#")[1])
     print("\n----------------------------------------------------------------------\n")
 
 
-def knowledge_snapshot_fault_path_perspective() -> None:
+def knowledge_snapshot_fault_path_perspective(qt: KnowledgeAccess) -> None:
     """
     Presents a snapshot of the knowledge currently stored in the KG regarding fault paths.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
     """
     print("###########################################################################")
     print("KNOWLEDGE SNAPSHOT - FAULT PATH PERSPECTIVE")
     print("###########################################################################\n")
-    for fault_path in qt.query_all_fault_path_instances(False):
+    for fault_path in sorted(qt.query_all_fault_path_instances(False)):
         fault_path_id = fault_path.split("#")[1]
         fault_path_desc = qt.query_fault_path_description_by_id(fault_path_id, False)
         print(colored("fault path: " + fault_path_id, "yellow", "on_grey", ["bold"]))
         print(colored("\t- path description:" + str(fault_path_desc), "blue", "on_grey", ["bold"]))
         print(colored("\t- fault conditions that resulted in this fault path:", "blue", "on_grey", ["bold"]))
-        fault_conditions = qt.query_resulted_in_by_fault_path(fault_path_id, False)
+        fault_conditions = sorted(qt.query_resulted_in_by_fault_path(fault_path_id, False))
         for fc in fault_conditions:
             fault_condition_desc = qt.query_fault_condition_description_by_id(fc.split("#")[1], False)[0]
             print("\t\t-", fault_condition_desc)
     print("\n----------------------------------------------------------------------\n")
 
 
-def knowledge_snapshot_diag_entity_perspective() -> None:
+def knowledge_snapshot_diag_entity_perspective(qt: KnowledgeAccess) -> None:
     """
     Presents a snapshot of the knowledge currently stored in the KG regarding diag entities.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
     """
     print("###########################################################################")
     print("KNOWLEDGE SNAPSHOT - DIAG ENTITY PERSPECTIVE")
     print("###########################################################################\n")
-    for diag_entity_instance_id, entity_id in qt.query_all_diag_entity_instances(False):
+    for diag_entity_instance_id, entity_id in sorted(qt.query_all_diag_entity_instances(False)):
         diag_entity_instance_id = diag_entity_instance_id.split("#")[1]
         print(colored(diag_entity_instance_id, "yellow", "on_grey", ["bold"]))
         print(colored("\t- entity ID: " + entity_id, "blue", "on_grey", ["bold"]))
         print(colored("\t- error codes recorded in this diag entity:", "blue", "on_grey", ["bold"]))
-        error_codes = qt.query_error_codes_recorded_in_diag_entity(diag_entity_instance_id, False)
+        error_codes = sorted(qt.query_error_codes_recorded_in_diag_entity(diag_entity_instance_id, False))
         for code in error_codes:
             print("\t\t-", code)
     print("\n----------------------------------------------------------------------\n")
 
 
+EXPERT_PERSPECTIVES: List[Tuple[Callable[[KnowledgeAccess], None], List[str]]] = [
+    (
+        knowledge_snapshot_error_code_perspective,
+        ['ErrorCode', 'FaultCondition', 'DiagnosticAssociation', 'SuspectComponent', 'ComponentSet', 'DiagLog',
+         'DiagEntity']
+    ),
+    (knowledge_snapshot_component_perspective, ['SuspectComponent', 'ComponentSet']),
+    (knowledge_snapshot_component_set_perspective, ['SuspectComponent', 'ComponentSet'])
+]
+
+DIAG_PERSPECTIVES: List[Tuple[Callable[[KnowledgeAccess], None], List[str]]] = [
+    (knowledge_snapshot_signal_perspective, ['SensorSignal']),
+    (
+        knowledge_snapshot_signal_classification_perspective,
+        ['SignalClassification', 'ManualInspection', 'DiagnosticAssociation', 'Model', 'Heatmap']
+    ),
+    (
+        knowledge_snapshot_manual_inspection_perspective,
+        ['ManualInspection', 'SignalClassification', 'DiagnosticAssociation']
+    ),
+    (knowledge_snapshot_diag_log_perspective, ['DiagLog', 'ErrorCode', 'SignalClassification', 'ManualInspection']),
+    (knowledge_snapshot_fault_path_perspective, ['FaultPath', 'FaultCondition']),
+    (knowledge_snapshot_diag_entity_perspective, ['DiagEntity', 'DiagLog', 'ErrorCode'])
+]
+
+# only the excerpt of the signals is presented in the snapshot
+SNAPSHOT_LITERAL_LIMITS = {'signal': 50}
+
+
+THEME_TITLES = {
+    'expert': "#################### EXPERT KNOWLEDGE STORED IN THE KG ####################",
+    'diag': "################## DIAGNOSIS KNOWLEDGE STORED IN THE KG ###################"
+}
+
+THEME_PERSPECTIVES = {'expert': EXPERT_PERSPECTIVES, 'diag': DIAG_PERSPECTIVES}
+
+
+def print_theme_header(theme: str) -> None:
+    """
+    Presents the header of the specified snapshot theme.
+
+    :param theme: snapshot theme [expert | diag]
+    """
+    print("###########################################################################")
+    print("###########################################################################")
+    print(THEME_TITLES[theme])
+    print("###########################################################################")
+    print("###########################################################################\n")
+
+
+def iter_exports(
+        connection: ConnectionController, concept_lists: List[List[str]], jobs: int
+) -> Iterator[KnowledgeGraphIndex]:
+    """
+    Fetches the bulk exports of the specified concept lists concurrently and yields them in order.
+
+    At most `jobs` exports are fetched / held at a time (ahead of the consumer), and identical concept lists share a
+    single export, which is released after its last use.
+
+    :param connection: connection to the knowledge graph
+    :param concept_lists: concepts (classes) of each export
+    :param jobs: maximum number of concurrent / held exports
+    :return: index per concept list
+    """
+    keys = [tuple(concepts) for concepts in concept_lists]
+    last_use = {key: i for i, key in enumerate(keys)}
+    exports: Dict[Tuple[str, ...], Future] = {}
+    # next concept list whose export is to be submitted
+    ahead = 0
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for i, key in enumerate(keys):
+            while ahead < len(keys):
+                if keys[ahead] not in exports:
+                    if len(exports) >= jobs and ahead > i:
+                        break
+                    exports[keys[ahead]] = executor.submit(
+                        KnowledgeGraphIndex.from_export, connection, list(keys[ahead]), SNAPSHOT_LITERAL_LIMITS
+                    )
+                ahead += 1
+            yield exports[key].result()
+            if last_use[key] == i:
+                del exports[key]
+
+
+def render_snapshot(
+        connection: Union[ConnectionController, None], themes: List[str], index: KnowledgeGraphIndex = None,
+        jobs: int = 1
+) -> None:
+    """
+    Presents the snapshot perspectives of the specified themes - each based on a single bulk export of the relevant
+    concepts.
+
+    The exports are fetched concurrently (at most `jobs` at a time, cf. `iter_exports`), but the perspectives are
+    always presented in the same order, i.e., the output does not depend on the number of jobs.
+
+    :param connection: connection to the knowledge graph (not needed if an index is specified)
+    :param themes: snapshot themes to be presented [expert | diag]
+    :param index: optional index of the entire KG (e.g., read from a backup) - if specified, no queries are sent
+    :param jobs: maximum number of concurrent exports (bounds the load on the server)
+    """
+    perspectives = [(theme, snapshot, concepts) for theme in themes for snapshot, concepts in THEME_PERSPECTIVES[theme]]
+    if index is None:
+        indexes = iter_exports(connection, [concepts for _, _, concepts in perspectives], jobs)
+    else:
+        indexes = (index for _ in perspectives)
+    for i, ((theme, snapshot, _), perspective_index) in enumerate(zip(perspectives, indexes)):
+        if i == 0 or perspectives[i - 1][0] != theme:
+            print_theme_header(theme)
+        snapshot(perspective_index)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Knowledge snapshot - shows current content of KG')
     parser.add_argument(
-        '--perspective', type=str, help='perspective of snapshot [expert | diag]', required=False, default='expert'
+        '--perspective', type=str, help='perspective of snapshot [expert | diag | all]', required=False,
+        default='expert'
+    )
+    parser.add_argument('--kg-url', type=str, help='URL of the knowledge graph server', default=FUSEKI_URL)
+    parser.add_argument(
+        '--from-file', type=str, required=False, default="",
+        help='create the snapshot from the specified KG backup (.nt / .nt.gz / .nt.zst) or binary snapshot (.kgb)'
     )
+    parser.add_argument('--jobs', type=int, help='maximum number of concurrent queries', required=False, default=4)
     args = parser.parse_args()
-    qt = KnowledgeGraphQueryTool()
-
-    if args.perspective == 'expert':  # expert knowledge
-        print("###########################################################################")
-        print("###########################################################################")
-        print("#################### EXPERT KNOWLEDGE STORED IN THE KG ####################")
-        print("###########################################################################")
-        print("###########################################################################\n")
-        knowledge_snapshot_error_code_perspective()
-        knowledge_snapshot_component_perspective()
-        knowledge_snapshot_component_set_perspective()
-    elif args.perspective == 'diag':  # diagnosis
-        print("###########################################################################")
-        print("###########################################################################")
-        print("################## DIAGNOSIS KNOWLEDGE STORED IN THE KG ###################")
-        print("###########################################################################")
-        print("###########################################################################\n")
-        knowledge_snapshot_signal_perspective()
-        knowledge_snapshot_signal_classification_perspective()
-        knowledge_snapshot_manual_inspection_perspective()
-        knowledge_snapshot_diag_log_perspective()
-        knowledge_snapshot_fault_path_perspective()
-        knowledge_snapshot_diag_entity_perspective()
+    if args.perspective == 'all':  # expert knowledge + diagnosis
+        snapshot_themes = ['expert', 'diag']
+    elif args.perspective in THEME_PERSPECTIVES:
+        snapshot_themes = [args.perspective]
+    else:
+        snapshot_themes = []
+    kg_connection, kg_index = None, None
+    if args.from_file != "" and len(snapshot_themes) > 0:
+        # NumPy is only needed for binary snapshots
+        from nesy_diag_ontology.binary_snapshot import load_kg_file
+        # only the triples of the concepts of the presented perspectives are indexed
+        snapshot_classes = sorted({
+            concept for theme in snapshot_themes for _, concepts in THEME_PERSPECTIVES[theme] for concept in concepts
+        })
+        kg_index = load_kg_file(args.from_file, SNAPSHOT_LITERAL_LIMITS, snapshot_classes)
+    else:
+        kg_connection = ConnectionController(namespace=ONTOLOGY_PREFIX, fuseki_url=args.kg_url, verbose=False)
+
+    if len(snapshot_themes) > 0:
+        render_snapshot(kg_connection, snapshot_themes, kg_index, args.jobs)
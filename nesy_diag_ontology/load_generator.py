@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from nesy_diag_ontology.benchmark_suite import SCALES, SIGNAL_LENGTH, BenchmarkSamples, latency_stats
+from nesy_diag_ontology.config import DATA_ENDPOINT, SIGNAL_ENCODINGS
+from nesy_diag_ontology.kg_logging import LOGGER_NAME
+from nesy_diag_ontology.knowledge_graph_query_tool import KnowledgeGraphQueryTool
+from nesy_diag_ontology.ontology_instance_generator import OntologyInstanceGenerator
+from nesy_diag_ontology.restore import restore_knowledge_graph
+from nesy_diag_ontology.slow_query_log import QUERY_LOG
+from nesy_diag_ontology.standin_server import StandInServer
+from nesy_diag_ontology.synthetic_kg import SyntheticKnowledgeGraph
+
+# mean think time between the diagnostic steps of a session in seconds (exponentially distributed)
+THINK_TIME_S = 0.5
+# length of the sensor signals / heatmaps recorded by the sessions
+SESSION_SIGNAL_LENGTH = 500
+# probability that a checked suspect component is classified as anomalous (ends the diagnosis)
+ANOMALY_PROBABILITY = 0.3
+# duration per concurrency level in seconds
+DURATION_S = 30.0
+# minimum throughput per session relative to the lowest concurrency level (below: past the knee)
+KNEE_EFFICIENCY = 0.8
+
+
+class LoadStatistics(logging.Handler):
+    """
+    Thread-safe per-operation latencies and errors of the simulated sessions. Errors are raised exceptions as well as
+    error records logged during an operation (e.g., failed KG extensions, which are not raised).
+    """
+
+    def __init__(self) -> None:
+        super().__init__(level=logging.ERROR)
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.diagnoses = 0
+        self.failed_diagnoses = 0
+        self.lock = threading.Lock()
+        # operation the current thread is executing
+        self.active = threading.local()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        operation = getattr(self.active, "operation", None)
+        if operation is not None:
+            self.record_error(operation, record.getMessage().split(" - ")[0])
+
+    def record_error(self, operation: str, error: str) -> None:
+        with self.lock:
+            errors = self.errors.setdefault(operation, {})
+            errors[error] = errors.get(error, 0) + 1
+
+    def measure(self, operation: Callable, *args):
+        """
+        Executes and measures the specified operation.
+
+        :param operation: method of the `KnowledgeGraphQueryTool` / `OntologyInstanceGenerator`
+        :param args: arguments of the operation
+        :return: result of the operation
+        """
+        name = operation.__name__
+        self.active.operation = name
+        start = time.perf_counter()
+        try:
+            return operation(*args)
+        except Exception as e:
+            self.record_error(name, type(e).__name__)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.active.operation = None
+            with self.lock:
+                self.latencies.setdefault(name, []).append(duration)
+
+    def finish_diagnosis(self, failed: bool) -> None:
+        with self.lock:
+            self.diagnoses += 1
+            self.failed_diagnoses += failed
+
+    def summary(self, elapsed: float) -> Dict[str, Dict]:
+        """
+        Summarizes the throughput, latency percentiles and error rates per operation.
+
+        :param elapsed: duration of the measurement in seconds
+        :return: statistics per operation
+        """
+        with self.lock:
+            results = {}
+            for name, latencies in sorted(self.latencies.items()):
+                errors = self.errors.get(name, {})
+                results[name] = {
+                    "ops_per_s": round(len(latencies) / elapsed, 2), **latency_stats(latencies),
+                    "max_ms": round(max(latencies) * 1000, 3),
+                    "error_rate": round(min(1.0, sum(errors.values()) / len(latencies)), 4), "errors": errors
+                }
+            return results
+
+
+class DiagnosisSession:
+    """
+    Simulated diagnosis session - follows the call pattern of a diagnosis (cf. nesy_diag_smach): diag entity, suspect
+    components of an error code, one classification per checked component (sensor signal + heatmap if the component
+    is assessed by a model, manual inspection otherwise) until an anomaly is found, fault path and diag log.
+    """
+
+    def __init__(
+            self, kg_url: str, samples: BenchmarkSamples, stats: LoadStatistics, session_idx: int, think_time: float,
+            signal_length: int, signal_encoding: str, seed: int
+    ) -> None:
+        """
+        Initializes the session.
+
+        :param kg_url: URL of the knowledge graph server
+        :param samples: samples of the KG (error codes, models of the suspect components)
+        :param stats: statistics the operations are recorded in
+        :param session_idx: index of the session (IDs of the diag entities)
+        :param think_time: mean think time between the diagnostic steps in seconds
+        :param signal_length: length of the recorded sensor signals / heatmaps
+        :param signal_encoding: representation of sensor signals and heatmaps in the KG
+        :param seed: seed of the session's random generators
+        """
+        self.instance_gen = OntologyInstanceGenerator(kg_url=kg_url, verbose=False, signal_encoding=signal_encoding)
+        self.qt = KnowledgeGraphQueryTool(kg_url=kg_url, verbose=False)
+        self.samples = samples
+        self.error_codes = samples.literals[("ErrorCode", "code")]
+        self.stats = stats
+        self.session_idx = session_idx
+        self.think_time = think_time
+        self.signal_length = signal_length
+        self.rand = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+
+    def think(self) -> None:
+        if self.think_time > 0:
+            time.sleep(self.rand.expovariate(1 / self.think_time))
+
+    def run(self, deadline: float, max_diagnoses: int) -> None:
+        """
+        Performs diagnoses until the deadline is reached (or the maximum number of diagnoses is performed).
+
+        :param deadline: `time.perf_counter()` value after which no further diagnosis is started
+        :param max_diagnoses: maximum number of diagnoses (0: unlimited)
+        """
+        diag_idx = 0
+        while time.perf_counter() < deadline and (max_diagnoses == 0 or diag_idx < max_diagnoses):
+            try:
+                self.diagnose(diag_idx)
+                self.stats.finish_diagnosis(failed=False)
+            except Exception:
+                # the remaining steps depend on the failed one - the error is recorded for the operation
+                self.stats.finish_diagnosis(failed=True)
+            diag_idx += 1
+
+    def diagnose(self, diag_idx: int) -> str:
+        """
+        Performs a simulated diagnosis.
+
+        :param diag_idx: index of the diagnosis within the session
+        :return: ID of the diag log
+        """
+        measure, gen, qt = self.stats.measure, self.instance_gen, self.qt
+        entity_id = "LOAD_" + str(self.session_idx) + "_" + str(diag_idx)
+        measure(gen.extend_knowledge_graph_with_diag_entity_data, entity_id)
+        diag_entity_id = measure(qt.query_diag_entity_instance_by_id, entity_id)[0].split("#")[1]
+        error_code = self.rand.choice(self.error_codes)
+        fault_cond_id = measure(qt.query_fault_condition_instance_by_code, error_code)[0].split("#")[1]
+        suspect_components = measure(qt.query_suspect_components_by_error_code, error_code)
+
+        classification_ids, reason = [], ""
+        for comp in suspect_components:
+            self.think()
+            measure(qt.query_affected_by_relations_by_suspect_component, comp)
+            if reason == "":
+                reason = measure(
+                    qt.query_diag_association_instance_by_error_code_and_sus_comp, error_code, comp
+                )[0].split("#")[1]
+            anomaly = self.rand.random() < ANOMALY_PROBABILITY
+            if comp in self.samples.models:
+                signal = np.round(self.rng.uniform(0, 20, self.signal_length), 2).tolist()
+                signal_id = measure(gen.extend_knowledge_graph_with_sensor_signal, signal)
+                heatmap = np.round(self.rng.random(self.signal_length), 2).tolist()
+                heatmap_id = measure(gen.extend_knowledge_graph_with_heatmap, "GradCAM", heatmap)
+                measure(gen.extend_knowledge_graph_with_overlays_relation, heatmap_id, signal_id)
+                reason = measure(
+                    gen.extend_knowledge_graph_with_signal_classification, anomaly, reason, comp,
+                    round(self.rand.random(), 2), self.samples.models[comp], signal_id, heatmap_id
+                )
+            else:
+                reason = measure(gen.extend_knowledge_graph_with_manual_inspection, anomaly, reason, comp)
+            classification_ids.append(reason)
+            if anomaly:
+                break
+
+        self.think()
+        fault_path = " -> ".join(suspect_components[:len(classification_ids)])
+        fault_path_id = measure(gen.extend_knowledge_graph_with_fault_path, fault_path, fault_cond_id)
+        diag_log_id = measure(
+            gen.extend_knowledge_graph_with_diag_log, date.today().strftime("%d.%m.%Y"), [error_code],
+            [fault_path_id], classification_ids, diag_entity_id
+        )
+        measure(qt.query_diag_steps_by_diag_log, diag_log_id)
+        return diag_log_id
+
+
+def run_level(
+        kg_url: str, samples: BenchmarkSamples, sessions: int, duration: float, max_diagnoses: int, think_time: float,
+        signal_length: int, signal_encoding: str, seed: int
+) -> Dict:
+    """
+    Runs the specified number of concurrent sessions (threads) for the specified duration.
+
+    :param kg_url: URL of the knowledge graph server
+    :param samples: samples of the KG
+    :param sessions: number of concurrent sessions
+    :param duration: duration in seconds (no further diagnoses are started afterwards)
+    :param max_diagnoses: maximum number of diagnoses per session (0: unlimited)
+    :param think_time: mean think time between the diagnostic steps in seconds
+    :param signal_length: length of the recorded sensor signals / heatmaps
+    :param signal_encoding: representation of sensor signals and heatmaps in the KG
+    :param seed: seed of the sessions
+    :return: throughput, latencies and error rates (overall + per operation)
+    """
+    stats = LoadStatistics()
+    package_logger = logging.getLogger(LOGGER_NAME)
+    package_logger.addHandler(stats)
+    try:
+        diag_sessions = [
+            DiagnosisSession(
+                kg_url, samples, stats, sessions * 1000 + idx, think_time, signal_length, signal_encoding, seed + idx
+            ) for idx in range(sessions)
+        ]
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=session.run, args=(start + duration, max_diagnoses)) for session in diag_sessions
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        package_logger.removeHandler(stats)
+    operations = stats.summary(elapsed)
+    num_ops = sum(op["count"] for op in operations.values())
+    num_errors = sum(sum(op["errors"].values()) for op in operations.values())
+    return {
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 3),
+        "diagnoses": stats.diagnoses,
+        "failed_diagnoses": stats.failed_diagnoses,
+        # successfully completed diagnoses
+        "diagnoses_per_s": round((stats.diagnoses - stats.failed_diagnoses) / elapsed, 3),
+        "ops_per_s": round(num_ops / elapsed, 2),
+        "error_rate": round(num_errors / max(num_ops, 1), 4),
+        "operations": operations
+    }
+
+
+def find_knee(levels: List[Dict]) -> int:
+    """
+    Determines the concurrency knee, i.e., the highest concurrency level at which the throughput (diagnoses per
+    second and session) is still at least `KNEE_EFFICIENCY` of the throughput at the lowest level (without errors).
+
+    :param levels: results per concurrency level (ascending)
+    :return: number of sessions at the knee (0: already saturated at the lowest level)
+    """
+    base = levels[0]["diagnoses_per_s"] / levels[0]["sessions"]
+    knee = 0
+    for level in levels:
+        efficiency = level["diagnoses_per_s"] / level["sessions"] / base if base > 0 else 0
+        level["efficiency"] = round(efficiency, 3)
+        if efficiency >= KNEE_EFFICIENCY and level["failed_diagnoses"] == 0:
+            knee = level["sessions"]
+    return knee
+
+
+def run_load(
+        sessions: List[int], duration: float = DURATION_S, max_diagnoses: int = 0, think_time: float = THINK_TIME_S,
+        signal_length: int = SESSION_SIGNAL_LENGTH, signal_encoding: str = "legacy", scale: str = "small",
+        seed: int = 42, kg_url: str = "", restore: bool = True
+) -> Dict:
+    """
+    Generates the load of concurrent diagnosis sessions for each concurrency level - the expert knowledge and
+    diagnosis histories are taken from a synthetic KG (loaded into an in-process stand-in server or restored on the
+    specified server).
+
+    :param sessions: concurrency levels, i.e., numbers of concurrent sessions
+    :param duration: duration per concurrency level in seconds
+    :param max_diagnoses: maximum number of diagnoses per session and level (0: unlimited)
+    :param think_time: mean think time between the diagnostic steps in seconds
+    :param signal_length: length of the recorded sensor signals / heatmaps
+    :param signal_encoding: representation of sensor signals and heatmaps in the KG
+    :param scale: scale of the synthetic KG (cf. `SCALES`)
+    :param seed: seed of the synthetic KG and the sessions
+    :param kg_url: URL of the knowledge graph server, empty: in-process stand-in
+    :param restore: whether the synthetic KG should be restored on the specified server (otherwise it is expected to
+                    already hold the synthetic KG of the same scale and seed)
+    :return: results per concurrency level and the knee
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        kg_file = os.path.join(tmp_dir, scale + ".nt")
+        num_triples = SyntheticKnowledgeGraph(**SCALES[scale], signal_length=SIGNAL_LENGTH, seed=seed).write(kg_file)
+        samples = BenchmarkSamples.from_file(kg_file, seed)
+        print("scale", scale + ":", num_triples, "triples", file=sys.stderr)
+        server = None
+        if kg_url == "":
+            server = StandInServer().start()
+            server.load(kg_file)
+            kg_url = server.url
+        elif restore:
+            restore_knowledge_graph(kg_file, kg_url, DATA_ENDPOINT)
+    try:
+        levels = []
+        for num_sessions in sorted(sessions):
+            print("running", num_sessions, "concurrent session(s)..", file=sys.stderr)
+            levels.append(run_level(
+                kg_url, samples, num_sessions, duration, max_diagnoses, think_time, signal_length, signal_encoding,
+                seed
+            ))
+    finally:
+        if server is not None:
+            server.stop()
+    return {"triples": num_triples, "knee_sessions": find_knee(levels), "levels": levels}
+
+
+def print_results(results: Dict) -> None:
+    for level in results["levels"]:
+        print(
+            level["sessions"], "session(s):", level["diagnoses_per_s"], "diagnoses/s |", level["ops_per_s"], "ops/s |",
+            "efficiency:", level["efficiency"], "| failed diagnoses:", level["failed_diagnoses"], "of",
+            level["diagnoses"], "| error rate:", level["error_rate"]
+        )
+        print("\tops/s\t\tp50 ms\t\tp95 ms\t\tp99 ms\t\terrors\t\toperation")
+        for name, stats in level["operations"].items():
+            print(
+                "\t" + "\t\t".join(str(stats[key]) for key in ["ops_per_s", "p50_ms", "p95_ms", "p99_ms", "error_rate"])
+                + "\t\t" + name
+            )
+    if results["knee_sessions"] > 0:
+        print("concurrency knee:", results["knee_sessions"], "session(s)")
+    else:
+        print("concurrency knee: saturated (or failing) at the lowest level")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Load generator - concurrent diagnosis sessions (throughput, tail latency and error rates)'
+    )
+    parser.add_argument(
+        '--sessions', type=int, nargs='+', default=[1, 2, 4, 8], help='concurrency levels (numbers of sessions)'
+    )
+    parser.add_argument('--duration', type=float, default=DURATION_S, help='duration per concurrency level in s')
+    parser.add_argument(
+        '--diagnoses', type=int, default=0, help='maximum number of diagnoses per session and level (0: unlimited)'
+    )
+    parser.add_argument('--think-time', type=float, default=THINK_TIME_S, help='mean think time between steps in s')
+    parser.add_argument(
+        '--signal-length', type=int, default=SESSION_SIGNAL_LENGTH, help='length of the recorded signals / heatmaps'
+    )
+    parser.add_argument(
+        '--signal-encoding', type=str, choices=SIGNAL_ENCODINGS, default="legacy", help='encoding of signals / heatmaps'
+    )
+    parser.add_argument('--scale', type=str, choices=list(SCALES), default="small", help='scale of the synthetic KG')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the synthetic KG and the sessions')
+    parser.add_argument(
+        '--kg-url', type=str, default="", help='load the specified KG server instead of the in-process stand-in'
+    )
+    parser.add_argument(
+        '--skip-restore', action='store_true', help='the KG server already holds the synthetic KG (scale + seed)'
+    )
+    parser.add_argument('--output', type=str, default="", help='write the results to the specified JSON file')
+    args = parser.parse_args()
+
+    # latencies are reported per operation, slow queries are not to be reported individually
+    QUERY_LOG.threshold_s = float("inf")
+    load_results = run_load(
+        args.sessions, args.duration, args.diagnoses, args.think_time, args.signal_length, args.signal_encoding,
+        args.scale, args.seed, args.kg_url, not args.skip_restore
+    )
+    print_results(load_results)
+    if args.output != "":
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump({"python": sys.version.split()[0], "parameters": vars(args), **load_results}, out, indent=4)
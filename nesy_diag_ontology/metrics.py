@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Iterator
+
+from nesy_diag_ontology.config import METRICS_ENABLED, METRICS_LATENCY_BUCKETS_S, FUSEKI_URL
+from nesy_diag_ontology.tracing import traced
+
+METRIC_PREFIX = "nesy_diag"
+
+
+class OperationStats:
+    """
+    Statistics of a single operation (public method) - the requests issued within an operation are counted
+    inclusively, i.e., also for the (instrumented) operations it calls.
+    """
+
+    def __init__(self, name: str, buckets: List[float]) -> None:
+        """
+        Initializes the (empty) statistics.
+
+        :param name: name of the operation, e.g., KnowledgeGraphQueryTool.query_fault_condition_by_error_code
+        :param buckets: upper bounds of the latency histogram buckets (seconds)
+        """
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        # one counter per bucket + overflow (+Inf), non-cumulative
+        self.latency_counts = [0] * (len(buckets) + 1)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rows = 0
+
+    def to_dict(self, buckets: List[float]) -> Dict:
+        """
+        Returns the statistics as dictionary (JSON dump).
+
+        :param buckets: upper bounds of the latency histogram buckets (seconds)
+        :return: statistics
+        """
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_sum_s": round(self.latency_sum, 6),
+            "latency_mean_s": round(self.latency_sum / self.calls, 6) if self.calls > 0 else 0.0,
+            "latency_histogram": {
+                **{str(bound): count for bound, count in zip(buckets, self.latency_counts)},
+                "+Inf": self.latency_counts[-1]
+            },
+            "requests": self.requests,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "result_rows": self.rows
+        }
+
+
+class RoundTripCounter:
+    """
+    Counts the HTTP requests to the knowledge graph server issued by all threads while it's active, cf.
+    `count_round_trips`.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rows = 0
+
+
+class MetricsRegistry:
+    """
+    Process-wide registry of per-operation metrics: calls, errors, latency histogram, number of HTTP requests to the
+    knowledge graph server, bytes sent / received and result rows.
+
+    Recording a call costs two clock reads and a few counter updates, i.e., it is negligible compared to a round trip.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, buckets: List[float] = None) -> None:
+        """
+        Initializes the registry.
+
+        :param enabled: whether calls / requests are recorded
+        :param buckets: upper bounds of the latency histogram buckets (seconds)
+        """
+        self.enabled = enabled
+        self.buckets = sorted(buckets if buckets is not None else METRICS_LATENCY_BUCKETS_S)
+        self.operations: Dict[str, OperationStats] = {}
+        self.lock = threading.Lock()
+        # operations currently executed by the thread (outermost first)
+        self.local = threading.local()
+        # active round trip counters (recorded regardless of `enabled`)
+        self.counters: List[RoundTripCounter] = []
+
+    def operation(self, name: str) -> OperationStats:
+        """
+        Returns the statistics of the specified operation (created on first use).
+
+        :param name: name of the operation
+        :return: statistics of the operation
+        """
+        stats = self.operations.get(name)
+        if stats is None:
+            with self.lock:
+                stats = self.operations.setdefault(name, OperationStats(name, self.buckets))
+        return stats
+
+    def active_operations(self) -> List[OperationStats]:
+        """
+        Returns the operations currently executed by the calling thread.
+
+        :return: active operations (outermost first)
+        """
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def record_call(self, stats: OperationStats, duration: float, failed: bool) -> None:
+        """
+        Records a completed call of the specified operation.
+
+        :param stats: statistics of the operation
+        :param duration: duration of the call in seconds
+        :param failed: whether the call raised an exception
+        """
+        bucket = bisect_left(self.buckets, duration)
+        with self.lock:
+            stats.calls += 1
+            stats.errors += failed
+            stats.latency_sum += duration
+            stats.latency_counts[bucket] += 1
+
+    def record_request(
+            self, bytes_sent: int, bytes_received: int, rows: int, operations: List[OperationStats] = None
+    ) -> None:
+        """
+        Records an HTTP request to the knowledge graph server for all active operations of the calling thread.
+
+        :param bytes_sent: size of the request body
+        :param bytes_received: size of the response body
+        :param rows: number of result rows (SELECT queries)
+        :param operations: operations to attribute the request to (default: active operations)
+        """
+        if len(self.counters) > 0:
+            with self.lock:
+                for counter in self.counters:
+                    counter.requests += 1
+                    counter.bytes_sent += bytes_sent
+                    counter.bytes_received += bytes_received
+                    counter.rows += rows
+        if not self.enabled:
+            return
+        with self.lock:
+            for stats in self.active_operations() if operations is None else operations:
+                stats.requests += 1
+                stats.bytes_sent += bytes_sent
+                stats.bytes_received += bytes_received
+                stats.rows += rows
+
+    def record_transfer(self, bytes_received: int, rows: int, operations: List[OperationStats]) -> None:
+        """
+        Records data received after the request itself was recorded (streamed results).
+
+        :param bytes_received: size of the (additionally) received data
+        :param rows: number of (additionally) received result rows
+        :param operations: operations the request was attributed to
+        """
+        if len(self.counters) > 0:
+            with self.lock:
+                for counter in self.counters:
+                    counter.bytes_received += bytes_received
+                    counter.rows += rows
+        if not self.enabled:
+            return
+        with self.lock:
+            for stats in operations:
+                stats.bytes_received += bytes_received
+                stats.rows += rows
+
+    def reset(self) -> None:
+        """
+        Discards all recorded metrics.
+        """
+        with self.lock:
+            self.operations = {}
+
+    def to_json(self) -> Dict:
+        """
+        Returns the recorded metrics as JSON dump.
+
+        :return: metrics per operation
+        """
+        with self.lock:
+            return {
+                "timestamp": time.time(),
+                "latency_buckets_s": self.buckets,
+                "operations": {name: stats.to_dict(self.buckets) for name, stats in sorted(self.operations.items())}
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the recorded metrics in the Prometheus text exposition format.
+
+        :return: metrics (text format 0.0.4)
+        """
+        counters = [
+            ("operation_calls_total", "calls of the operation", lambda s: s.calls),
+            ("operation_errors_total", "calls of the operation that raised an exception", lambda s: s.errors),
+            ("kg_requests_total", "HTTP requests to the knowledge graph server", lambda s: s.requests),
+            ("kg_request_bytes_total", "bytes sent to the knowledge graph server", lambda s: s.bytes_sent),
+            ("kg_response_bytes_total", "bytes received from the knowledge graph server", lambda s: s.bytes_received),
+            ("kg_result_rows_total", "result rows received from the knowledge graph server", lambda s: s.rows)
+        ]
+        with self.lock:
+            operations = sorted(self.operations.items())
+            lines = []
+            for metric, description, value in counters:
+                lines.append("# HELP " + METRIC_PREFIX + "_" + metric + " " + description)
+                lines.append("# TYPE " + METRIC_PREFIX + "_" + metric + " counter")
+                for name, stats in operations:
+                    lines.append(METRIC_PREFIX + "_" + metric + '{operation="' + name + '"} ' + str(value(stats)))
+            histogram = METRIC_PREFIX + "_operation_duration_seconds"
+            lines.append("# HELP " + histogram + " duration of the operation")
+            lines.append("# TYPE " + histogram + " histogram")
+            for name, stats in operations:
+                label = 'operation="' + name + '"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + ["+Inf"], stats.latency_counts):
+                    cumulative += count
+                    lines.append(histogram + "_bucket{" + label + ',le="' + str(bound) + '"} ' + str(cumulative))
+                lines.append(histogram + "_sum{" + label + "} " + repr(stats.latency_sum))
+                lines.append(histogram + "_count{" + label + "} " + str(stats.calls))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """
+        Writes the recorded metrics to the specified file - Prometheus text format (e.g., for the textfile collector of
+        the node exporter) unless the file ends with `.json`.
+
+        :param path: path of the metrics file
+        """
+        data = json.dumps(self.to_json(), indent=4) if path.endswith(".json") else self.to_prometheus()
+        # written atomically, the file may be read at any time
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+
+METRICS = MetricsRegistry()
+
+
+@contextmanager
+def count_round_trips() -> Iterator[RoundTripCounter]:
+    """
+    Counts the HTTP requests issued by `ConnectionController`s (of all threads) within the context, e.g.:
+
+        with count_round_trips() as round_trips:
+            enhancer.add_error_code_to_knowledge_graph("E0", "fault condition", ["C0", "C1"])
+        assert round_trips.requests <= 7
+
+    :return: round trip counter (final once the context is left)
+    """
+    counter = RoundTripCounter()
+    with METRICS.lock:
+        METRICS.counters = METRICS.counters + [counter]
+    try:
+        yield counter
+    finally:
+        with METRICS.lock:
+            METRICS.counters = [c for c in METRICS.counters if c is not counter]
+
+
+def instrument(name: str, func: Callable) -> Callable:
+    """
+    Wraps the specified function such that its calls are recorded as the specified operation.
+
+    :param name: name of the operation
+    :param func: function to be instrumented
+    :return: instrumented function
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not METRICS.enabled:
+            return func(*args, **kwargs)
+        stats = METRICS.operation(name)
+        stack = METRICS.active_operations()
+        # recursive calls are recorded as calls, but requests are only attributed once
+        nested = stats in stack
+        if not nested:
+            stack.append(stats)
+        failed = True
+        start = time.perf_counter()
+        try:
+            res = func(*args, **kwargs)
+            failed = False
+            return res
+        finally:
+            duration = time.perf_counter() - start
+            if not nested:
+                stack.pop()
+            METRICS.record_call(stats, duration, failed)
+
+    return wrapper
+
+
+def instrumented(*exclude: str) -> Callable[[type], type]:
+    """
+    Class decorator - instruments all public methods of the class (except for the specified ones), i.e., their calls
+    are recorded in the metrics and traced as spans (if enabled). Static methods and generators are not instrumented,
+    requests issued by generators are attributed to the consuming operations.
+
+    :param exclude: names of public methods that should not be instrumented (e.g., trivial helpers)
+    :return: class decorator
+    """
+
+    def decorate(cls: type) -> type:
+        for attr_name, attr in list(vars(cls).items()):
+            if attr_name.startswith("_") or attr_name in exclude or not inspect.isfunction(attr):
+                continue
+            if inspect.isgeneratorfunction(attr):
+                continue
+            name = cls.__name__ + "." + attr_name
+            setattr(cls, attr_name, instrument(name, traced(name, attr)))
+        return cls
+
+    return decorate
+
+
+if __name__ == '__main__':
+    # the instrumented classes record into the registry of the package module (this one is `__main__`)
+    from nesy_diag_ontology import metrics
+    from nesy_diag_ontology.knowledge_graph_query_tool import KnowledgeGraphQueryTool
+
+    parser = argparse.ArgumentParser(description='Per-operation metrics of the KG query tool (Prometheus / JSON)')
+    parser.add_argument('--kg-url', type=str, default=FUSEKI_URL, help='URL of the knowledge graph server')
+    parser.add_argument('--error-code', type=str, default="E0", help='error code used for the example queries')
+    parser.add_argument('--format', type=str, choices=['prometheus', 'json'], default='prometheus')
+    parser.add_argument('--output', type=str, default="", help='write the metrics to the specified file')
+    args = parser.parse_args()
+
+    qt = KnowledgeGraphQueryTool(kg_url=args.kg_url, verbose=False)
+    qt.query_all_error_code_instances()
+    qt.query_fault_condition_by_error_code(args.error_code)
+    for comp in qt.query_suspect_components_by_error_code(args.error_code):
+        qt.query_affected_by_relations_by_suspect_component(comp)
+    qt.query_diag_entity_by_error_code(args.error_code)
+
+    if args.output != "":
+        metrics.METRICS.dump(args.output)
+    elif args.format == 'json':
+        print(json.dumps(metrics.METRICS.to_json(), indent=4))
+    else:
+        print(metrics.METRICS.to_prometheus(), end="")
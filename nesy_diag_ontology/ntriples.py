@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import gzip
+import re
+from typing import Iterator, Tuple, Union, TextIO, Callable, BinaryIO
+
+ESCAPE_PATTERN = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|[tbnrf"\'\\])')
+ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def unescape(text: str) -> str:
+    """
+    Resolves the N-Triples escape sequences (ECHAR / UCHAR) in the specified text.
+
+    :param text: text to be unescaped
+    :return: unescaped text
+    """
+    if "\\" not in text:
+        return text
+    return ESCAPE_PATTERN.sub(
+        lambda m: ESCAPES[m.group(1)] if len(m.group(1)) == 1 else chr(int(m.group(1)[1:], 16)), text
+    )
+
+
+def parse_term(term: str) -> str:
+    """
+    Parses the specified IRI / blank node term.
+
+    :param term: N-Triples representation of the term, e.g., <http://...>
+    :return: IRI (without angle brackets) or blank node label (with `_:` prefix)
+    """
+    if term.startswith("<"):
+        return unescape(term[1:-1])
+    return term
+
+
+def parse_object(term: str) -> Tuple[str, bool, str]:
+    """
+    Parses the specified object term (IRI, blank node, literal or abbreviated numeric / boolean literal).
+
+    :param term: N-Triples representation of the object
+    :return: (IRI / blank node / literal value, whether the object is a literal, literal datatype / language tag)
+    """
+    if term.startswith('"'):
+        closing_quote = term.rfind('"')
+        suffix = term[closing_quote + 1:]
+        datatype = suffix[3:-1] if suffix.startswith("^^") else suffix
+        return unescape(term[1:closing_quote]), True, datatype
+    if term.startswith("<") or term.startswith("_:"):
+        return parse_term(term), False, ""
+    # abbreviated numeric / boolean literal (e.g., in tab-separated query results)
+    return term, True, ""
+
+
+def parse_triple(line: str) -> Union[Tuple[str, str, str, bool, str], None]:
+    """
+    Parses the specified N-Triples line.
+
+    :param line: line of an N-Triples document
+    :return: (subject, predicate, object, whether the object is a literal, literal datatype / language tag),
+             None for empty lines and comments
+    """
+    line = line.strip()
+    if len(line) == 0 or line.startswith("#"):
+        return None
+    subj, pred, rest = line.split(None, 2)
+    # strip the terminating " ."
+    return (parse_term(subj), parse_term(pred)) + parse_object(rest[:-1].rstrip())
+
+
+def parse_result_row(line: str) -> Union[Tuple[str, str, str, bool, str], None]:
+    """
+    Parses the specified row of a tab-separated `SELECT ?s ?p ?o` result.
+
+    :param line: result row (RDF terms in N-Triples syntax separated by tabs)
+    :return: (subject, predicate, object, whether the object is a literal, literal datatype / language tag),
+             None for empty rows
+    """
+    if len(line.strip()) == 0:
+        return None
+    subj, pred, obj = line.rstrip("\r\n").split("\t", 2)
+    return (parse_term(subj), parse_term(pred)) + parse_object(obj)
+
+
+def open_n_triples(path: str, binary: bool = False) -> Union[TextIO, BinaryIO]:
+    """
+    Opens the specified N-Triples file (optionally gzip / zstd compressed) for reading.
+
+    :param path: path of the `.nt` / `.nt.gz` / `.nt.zst` file
+    :param binary: whether the lines should be read as (UTF-8 encoded) bytes
+    :return: text / binary stream
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb") if binary else gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        # optional dependency, only needed for zstd compressed backups
+        import zstandard
+        return zstandard.open(path, "rb") if binary else zstandard.open(path, "rt", encoding="utf-8")
+    return open(path, "rb") if binary else open(path, "r", encoding="utf-8")
+
+
+def iter_triples(
+        lines: Iterator[str], parse: Callable[[str], Union[Tuple[str, str, str, bool, str], None]] = parse_triple
+) -> Iterator[Tuple[str, str, str, bool, str]]:
+    """
+    Iterates over the triples of the specified lines (streaming, no graph is built).
+
+    :param lines: N-Triples lines (or result rows)
+    :param parse: parser for a single line
+    :return: (subject, predicate, object, whether the object is a literal, literal datatype / language tag) tuples
+    """
+    for line in lines:
+        triple = parse(line)
+        if triple is not None:
+            yield triple
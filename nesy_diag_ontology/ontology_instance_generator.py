@@ -3,18 +3,23 @@
 # @author Tim Bohne
 
 import uuid
-from typing import List, Union
+from typing import List, Union, Dict, TYPE_CHECKING
 
-from owlready2 import *
-from rdflib import Namespace, RDF
-
-from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL, SIGNAL_ENCODINGS
 from nesy_diag_ontology.connection_controller import ConnectionController
-from nesy_diag_ontology.expert_knowledge_enhancer import ExpertKnowledgeEnhancer
 from nesy_diag_ontology.fact import Fact
+from nesy_diag_ontology.ingestion_queue import IngestionQueue
+from nesy_diag_ontology.kg_logging import get_logger
 from nesy_diag_ontology.knowledge_graph_query_tool import KnowledgeGraphQueryTool
+from nesy_diag_ontology.metrics import instrumented
+
+if TYPE_CHECKING:
+    from nesy_diag_ontology.expert_knowledge_enhancer import ExpertKnowledgeEnhancer
+
+logger = get_logger(__name__)
 
 
+@instrumented()
 class OntologyInstanceGenerator:
     """
     Enhances the KG with diagnosis-specific instance data, i.e., it connects the diag data recorded in a particular
@@ -22,18 +27,160 @@ class OntologyInstanceGenerator:
     corresponding background knowledge stored in the KG.
     """
 
-    def __init__(self, kg_url: str = FUSEKI_URL, verbose: bool = True) -> None:
+    def __init__(
+            self, kg_url: str = FUSEKI_URL, verbose: bool = True, signal_encoding: str = "legacy",
+            compress_signals: bool = False, blob_store_dir: str = "", warm_up: bool = False,
+            ingestion_queue: IngestionQueue = None, session_id: str = ""
+    ) -> None:
         """
         Initializes the ontology instance generator.
 
         :param kg_url: URL of the knowledge graph server
         :param verbose: whether the ontology instance generator should log its actions
+        :param signal_encoding: representation of sensor signals and heatmaps in the KG - "legacy" stores the list
+                                string, "float32" / "float16" store base64-encoded little-endian typed literals
+        :param compress_signals: whether encoded sensor signals and heatmaps should additionally be zlib compressed
+        :param blob_store_dir: optional directory of a local blob store - if specified, sensor signals and heatmaps
+                               are stored there and the KG only holds a hash reference plus dtype / shape metadata
+        :param warm_up: whether the model and component registries should be populated from the KG right away
+        :param ingestion_queue: optional queue for non-blocking KG extensions - if specified, the generated facts are
+                                uploaded by background workers (IDs are still returned synchronously); KG queries only
+                                reflect the queued extensions after `flush()`
+        :param session_id: ID of the diagnosis session (facts of one session are delivered in order), random if empty
         """
+        assert signal_encoding in SIGNAL_ENCODINGS
         # establish connection to Apache Jena Fuseki server
         self.fuseki_connection = ConnectionController(namespace=ONTOLOGY_PREFIX, fuseki_url=kg_url, verbose=verbose)
         self.knowledge_graph_query_tool = KnowledgeGraphQueryTool(kg_url=kg_url, verbose=verbose)
+        # rdflib / NumPy are only imported when needed (heavy imports, cf. `import_time_benchmark.py`)
+        from rdflib import Namespace, RDF
         self.onto_namespace = Namespace(ONTOLOGY_PREFIX)
+        self.rdf_type = RDF.type
         self.verbose = verbose
+        self.signal_encoding = signal_encoding
+        self.compress_signals = compress_signals
+        self.blob_store = None
+        if blob_store_dir != "":
+            from nesy_diag_ontology.blob_store import BlobStore
+            self.blob_store = BlobStore(blob_store_dir)
+        self.kg_url = kg_url
+        # per-instance registries of resolved instances, i.e., model ID -> model UUID, component name -> comp UUID
+        self.model_registry: Dict[str, str] = {}
+        self.component_registry: Dict[str, str] = {}
+        self.expert_knowledge_enhancer = None
+        self.ingestion_queue = ingestion_queue
+        self.session_id = session_id if session_id != "" else uuid.uuid4().hex
+        if warm_up:
+            self.warm_up_registries()
+
+    def submit_facts(self, fact_list: List[Fact]) -> None:
+        """
+        Enters the specified facts into the knowledge graph - either directly or via the ingestion queue.
+
+        :param fact_list: semantic facts to be entered into the knowledge graph
+        """
+        if self.ingestion_queue is None:
+            self.fuseki_connection.extend_knowledge_graph(fact_list)
+        else:
+            self.ingestion_queue.submit(fact_list, self.session_id)
+
+    def flush(self) -> List[List[Fact]]:
+        """
+        Blocks until all queued KG extensions of the session have been processed (no-op without ingestion queue).
+
+        Extensions that could not be entered despite the retries of the queue are not committed - they are returned,
+        e.g., to be resubmitted, since instances generated afterwards may refer to them.
+
+        :return: fact lists of the session that could not be entered into the knowledge graph (empty if all were
+                 committed or are pending in the write-ahead log)
+        """
+        if self.ingestion_queue is None:
+            return []
+        failed = self.ingestion_queue.flush(self.session_id)
+        if len(failed) > 0:
+            logger.error("%d queued KG extensions of session '%s' failed", len(failed), self.session_id)
+        return failed
+
+    def warm_up_registries(self) -> None:
+        """
+        Populates the model and component registries with all instances currently stored in the KG (two queries).
+        """
+        for model, model_id in self.knowledge_graph_query_tool.query_all_model_instances(False):
+            self.model_registry[model_id] = model.split("#")[1]
+        for comp, comp_name in self.knowledge_graph_query_tool.query_all_suspect_component_instances(False):
+            self.component_registry[comp_name] = comp.split("#")[1]
+
+    def clear_registries(self) -> None:
+        """
+        Clears the model and component registries, e.g., after the expert knowledge in the KG has been modified.
+        """
+        self.model_registry.clear()
+        self.component_registry.clear()
+
+    def get_expert_knowledge_enhancer(self) -> "ExpertKnowledgeEnhancer":
+        """
+        Returns the expert knowledge enhancer of this generator (created on first use, sharing the generator's
+        connection and query tool).
+
+        :return: expert knowledge enhancer
+        """
+        if self.expert_knowledge_enhancer is None:
+            from nesy_diag_ontology.expert_knowledge_enhancer import ExpertKnowledgeEnhancer
+            self.expert_knowledge_enhancer = ExpertKnowledgeEnhancer(
+                kg_url=self.kg_url, verbose=self.verbose, fuseki_connection=self.fuseki_connection,
+                knowledge_graph_query_tool=self.knowledge_graph_query_tool
+            )
+        return self.expert_knowledge_enhancer
+
+    def resolve_component(self, comp: str) -> str:
+        """
+        Resolves the UUID of the specified suspect component (only queried on first use).
+
+        :param comp: name of the suspect component
+        :return: UUID of the suspect component instance
+        """
+        if comp not in self.component_registry:
+            comp_res = self.knowledge_graph_query_tool.query_suspect_component_by_name(comp)
+            self.component_registry[comp] = comp_res[0].split("#")[1]
+        return self.component_registry[comp]
+
+    def resolve_model(self, model_id: str, comp: str) -> str:
+        """
+        Resolves the UUID of the specified model (only queried on first use). Missing models are added to the KG.
+
+        :param model_id: ID of the classification model
+        :param comp: component the model classifies (only used if the model has to be created)
+        :return: UUID of the model instance
+        """
+        if model_id not in self.model_registry:
+            model_res = self.knowledge_graph_query_tool.query_model_by_model_id(model_id)
+            if len(model_res) == 0:
+                logger.warning("model %s not part of kg; creating it..", model_id)
+                self.model_registry[model_id] = self.get_expert_knowledge_enhancer().add_model_to_knowledge_graph(
+                    42, "z-norm", "measure x", model_id, comp, [], "CNN"
+                )
+            else:
+                self.model_registry[model_id] = model_res[0].split("#")[1]
+        return self.model_registry[model_id]
+
+    def generate_array_fact(self, instance_uuid: str, prop: str, values: List[float]) -> Fact:
+        """
+        Generates a property fact for an array of values (sensor signal / heatmap) using the configured encoding.
+
+        :param instance_uuid: UUID of the instance to generate fact for
+        :param prop: array property, e.g., `signal`
+        :param values: array values
+        :return: generated fact
+        """
+        if self.blob_store is not None:
+            from nesy_diag_ontology.signal_encoding import encode_blob_reference
+            lexical, datatype = encode_blob_reference(values, self.blob_store, self.signal_encoding)
+            return Fact((instance_uuid, prop, lexical), property_fact=True, datatype=datatype)
+        if self.signal_encoding == "legacy":
+            return Fact((instance_uuid, prop, str(values)), property_fact=True)
+        from nesy_diag_ontology.signal_encoding import encode_array
+        lexical, datatype = encode_array(values, self.signal_encoding, self.compress_signals)
+        return Fact((instance_uuid, prop, lexical), property_fact=True, datatype=datatype)
 
     def extend_knowledge_graph_with_diag_entity_data(self, entity_id: str) -> None:
         """
@@ -46,13 +193,13 @@ class OntologyInstanceGenerator:
         diag_entity_instance = self.knowledge_graph_query_tool.query_diag_entity_instance_by_id(entity_id)
         if len(diag_entity_instance) > 0:
             if self.verbose:
-                print("Diag. entity (" + entity_id + ") already part of the KG")
+                logger.info("Diag. entity (%s) already part of the KG", entity_id)
         else:
             fact_list = [
-                Fact((diag_entity_uuid, RDF.type, self.onto_namespace["DiagEntity"].toPython())),
+                Fact((diag_entity_uuid, self.rdf_type, self.onto_namespace["DiagEntity"].toPython())),
                 Fact((diag_entity_uuid, self.onto_namespace.entity_id, entity_id), property_fact=True)
             ]
-        self.fuseki_connection.extend_knowledge_graph(fact_list)
+        self.submit_facts(fact_list)
 
     def extend_knowledge_graph_with_diag_log(
             self, diag_date: str, error_code_instances: List[str], fault_path_instances: List[str],
@@ -70,7 +217,7 @@ class OntologyInstanceGenerator:
         """
         diag_log_uuid = "diag_log_" + uuid.uuid4().hex
         fact_list = [
-            Fact((diag_log_uuid, RDF.type, self.onto_namespace["DiagLog"].toPython())),
+            Fact((diag_log_uuid, self.rdf_type, self.onto_namespace["DiagLog"].toPython())),
             Fact((diag_log_uuid, self.onto_namespace.date, diag_date), property_fact=True)
         ]
         for error_code in error_code_instances:
@@ -84,7 +231,7 @@ class OntologyInstanceGenerator:
         for classification_id in classification_instances:
             fact_list.append(Fact((classification_id, self.onto_namespace.diagStep, diag_log_uuid)))
         fact_list.append(Fact((diag_log_uuid, self.onto_namespace.createdFor, diag_entity_id)))
-        self.fuseki_connection.extend_knowledge_graph(fact_list)
+        self.submit_facts(fact_list)
         return diag_log_uuid
 
     def extend_knowledge_graph_with_fault_path(self, description: str, fault_cond_id: str) -> str:
@@ -97,11 +244,11 @@ class OntologyInstanceGenerator:
         """
         fault_path_uuid = "fault_path_" + uuid.uuid4().hex
         fact_list = [
-            Fact((fault_path_uuid, RDF.type, self.onto_namespace["FaultPath"].toPython())),
+            Fact((fault_path_uuid, self.rdf_type, self.onto_namespace["FaultPath"].toPython())),
             Fact((fault_path_uuid, self.onto_namespace.fault_path_desc, description), property_fact=True),
             Fact((fault_cond_id, self.onto_namespace.resultedIn, fault_path_uuid))
         ]
-        self.fuseki_connection.extend_knowledge_graph(fact_list)
+        self.submit_facts(fact_list)
         return fault_path_uuid
 
     def extend_knowledge_graph_with_signal_classification(
@@ -123,18 +270,12 @@ class OntologyInstanceGenerator:
         # either ID of DA or ID of another classification
         assert "diag_association_" in classification_reason or "manual_inspection_" in classification_reason \
                or "signal_classification_" in classification_reason
-        comp_uuid = self.knowledge_graph_query_tool.query_suspect_component_by_name(comp)[0].split("#")[1]
+        comp_uuid = self.resolve_component(comp)
         classification_uuid = "signal_classification_" + uuid.uuid4().hex
-        model_res = self.knowledge_graph_query_tool.query_model_by_model_id(model_id)
-        if len(model_res) == 0:
-            print("warning: model", model_id, "not part of kg; creating it..")
-            expert_knowledge_enhancer = ExpertKnowledgeEnhancer()
-            expert_knowledge_enhancer.add_model_to_knowledge_graph(42, "z-norm", "measure x", model_id, comp, [], "CNN")
-            model_res = self.knowledge_graph_query_tool.query_model_by_model_id(model_id)
-        model_uuid = model_res[0].split("#")[1]
+        model_uuid = self.resolve_model(model_id, comp)
 
         fact_list = [
-            Fact((classification_uuid, RDF.type, self.onto_namespace["SignalClassification"].toPython())),
+            Fact((classification_uuid, self.rdf_type, self.onto_namespace["SignalClassification"].toPython())),
             # properties
             Fact((classification_uuid, self.onto_namespace.prediction, prediction), property_fact=True),
             Fact((classification_uuid, self.onto_namespace.uncertainty, uncertainty), property_fact=True),
@@ -155,7 +296,7 @@ class OntologyInstanceGenerator:
             fact_list.append(Fact((classification_reason, self.onto_namespace.ledTo, classification_uuid)))
         else:  # the reason is a classification instance (manual or signal)
             fact_list.append(Fact((classification_reason, self.onto_namespace.reasonFor, classification_uuid)))
-        self.fuseki_connection.extend_knowledge_graph(fact_list)
+        self.submit_facts(fact_list)
         return classification_uuid
 
     def extend_knowledge_graph_with_heatmap(self, gen_method: str, heatmap: List[float]) -> str:
@@ -168,11 +309,11 @@ class OntologyInstanceGenerator:
         """
         heatmap_uuid = "heatmap_" + uuid.uuid4().hex
         fact_list = [
-            Fact((heatmap_uuid, RDF.type, self.onto_namespace["Heatmap"].toPython())),
+            Fact((heatmap_uuid, self.rdf_type, self.onto_namespace["Heatmap"].toPython())),
             Fact((heatmap_uuid, self.onto_namespace.generation_method, gen_method), property_fact=True),
-            Fact((heatmap_uuid, self.onto_namespace.generated_heatmap, str(heatmap)), property_fact=True)
+            self.generate_array_fact(heatmap_uuid, self.onto_namespace.generated_heatmap, heatmap)
         ]
-        self.fuseki_connection.extend_knowledge_graph(fact_list)
+        self.submit_facts(fact_list)
         return heatmap_uuid
 
     def extend_knowledge_graph_with_sensor_signal(
@@ -187,12 +328,12 @@ class OntologyInstanceGenerator:
         """
         signal_uuid = "sensor_signal_" + uuid.uuid4().hex
         fact_list = [
-            Fact((signal_uuid, RDF.type, self.onto_namespace["SensorSignal"].toPython())),
-            Fact((signal_uuid, self.onto_namespace.signal, str(sensor_signal)), property_fact=True)
+            Fact((signal_uuid, self.rdf_type, self.onto_namespace["SensorSignal"].toPython())),
+            self.generate_array_fact(signal_uuid, self.onto_namespace.signal, sensor_signal)
         ]
         if parallel_rec_set_id != "":  # signal part of parallelly recorded set?
             fact_list.append(Fact((signal_uuid, self.onto_namespace.partOf, parallel_rec_set_id)))
-        self.fuseki_connection.extend_knowledge_graph(fact_list)
+        self.submit_facts(fact_list)
         return signal_uuid
 
     def extend_knowledge_graph_with_overlays_relation(self, heatmap_id: str, signal_id: str) -> None:
@@ -203,7 +344,7 @@ class OntologyInstanceGenerator:
         :param signal_id: ID of the signal
         """
         fact_list = [Fact((heatmap_id, self.onto_namespace.overlays, signal_id))]
-        self.fuseki_connection.extend_knowledge_graph(fact_list)
+        self.submit_facts(fact_list)
 
     def extend_knowledge_graph_with_parallel_rec_signal_set(self) -> str:
         """
@@ -212,8 +353,8 @@ class OntologyInstanceGenerator:
         :return: signal set ID
         """
         signal_set_uuid = "parallel_rec_signal_set_" + uuid.uuid4().hex
-        fact_list = [Fact((signal_set_uuid, RDF.type, self.onto_namespace["ParallelRecSignalSet"].toPython()))]
-        self.fuseki_connection.extend_knowledge_graph(fact_list)
+        fact_list = [Fact((signal_set_uuid, self.rdf_type, self.onto_namespace["ParallelRecSignalSet"].toPython()))]
+        self.submit_facts(fact_list)
         return signal_set_uuid
 
     def extend_knowledge_graph_with_manual_inspection(
@@ -231,10 +372,10 @@ class OntologyInstanceGenerator:
         assert "diag_association_" in classification_reason or "manual_inspection_" in classification_reason \
                or "signal_classification_" in classification_reason
 
-        comp_id = self.knowledge_graph_query_tool.query_suspect_component_by_name(comp)[0].split("#")[1]
+        comp_id = self.resolve_component(comp)
         classification_uuid = "manual_inspection_" + uuid.uuid4().hex
         fact_list = [
-            Fact((classification_uuid, RDF.type, self.onto_namespace["ManualInspection"].toPython())),
+            Fact((classification_uuid, self.rdf_type, self.onto_namespace["ManualInspection"].toPython())),
             Fact((classification_uuid, self.onto_namespace.prediction, prediction), property_fact=True),
             Fact((classification_uuid, self.onto_namespace.checks, comp_id))
         ]
@@ -242,7 +383,7 @@ class OntologyInstanceGenerator:
             fact_list.append(Fact((classification_reason, self.onto_namespace.ledTo, classification_uuid)))
         else:  # the reason is a classification instance (manual or signal)
             fact_list.append(Fact((classification_reason, self.onto_namespace.reasonFor, classification_uuid)))
-        self.fuseki_connection.extend_knowledge_graph(fact_list)
+        self.submit_facts(fact_list)
         return classification_uuid
 
 
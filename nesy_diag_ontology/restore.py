@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator, Tuple, Set, Dict, BinaryIO, Union
+
+import requests
+
+from nesy_diag_ontology.config import FUSEKI_URL, DATA_ENDPOINT
+from nesy_diag_ontology.ntriples import open_n_triples
+
+# index of the blank node triples (uploaded together) in the progress file
+BLANK_NODE_CHUNK = -1
+
+
+def iter_chunks(
+        path: str, max_chunk_bytes: int, blank_node_triples: BinaryIO
+) -> Iterator[Tuple[int, bytes, int]]:
+    """
+    Splits the specified N-Triples file into size-bounded chunks (at triple boundaries) while streaming it.
+
+    Blank node labels are only unique within a single upload, i.e., triples containing blank nodes are not part of the
+    chunks, but collected separately (to be uploaded together).
+
+    :param path: path of the `.nt` / `.nt.gz` / `.nt.zst` file
+    :param max_chunk_bytes: maximum size of a chunk (unless a single triple is larger)
+    :param blank_node_triples: file the triples containing blank nodes are written to
+    :return: (chunk index, N-Triples, number of triples) tuples
+    """
+    chunk, chunk_bytes, chunk_idx = [], 0, 0
+    with open_n_triples(path) as f:
+        for line in f:
+            if len(line.strip()) == 0 or line.startswith("#"):
+                continue
+            data = line.encode("utf-8") if line.endswith("\n") else (line + "\n").encode("utf-8")
+            if "_:" in line:
+                blank_node_triples.write(data)
+                continue
+            if chunk_bytes + len(data) > max_chunk_bytes and len(chunk) > 0:
+                yield chunk_idx, b"".join(chunk), len(chunk)
+                chunk, chunk_bytes, chunk_idx = [], 0, chunk_idx + 1
+            chunk.append(data)
+            chunk_bytes += len(data)
+    if len(chunk) > 0:
+        yield chunk_idx, b"".join(chunk), len(chunk)
+
+
+class RestoreProgress:
+    """
+    Records the successfully uploaded chunks of a restore (append-only), i.e., an interrupted restore can be resumed.
+    """
+
+    def __init__(self, path: str, backup: str, max_chunk_bytes: int) -> None:
+        """
+        Initializes the progress, i.e., reads the chunks uploaded by previous (interrupted) runs.
+
+        :param path: path of the progress file
+        :param backup: path of the backup to be restored
+        :param max_chunk_bytes: maximum size of a chunk (the chunks of a resumed restore have to be identical)
+        """
+        self.path = path
+        self.completed: Set[int] = set()
+        header = {"backup": os.path.abspath(backup), "size": os.path.getsize(backup), "chunk_bytes": max_chunk_bytes}
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            if len(lines) > 0 and json.loads(lines[0]) != header:
+                raise ValueError(
+                    path + " belongs to a different backup / chunk size - remove it to restart the restore"
+                )
+            self.completed = {int(line) for line in lines[1:] if len(line.strip()) > 0}
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+        if len(self.completed) == 0 and self.file.tell() == 0:
+            self.file.write(json.dumps(header) + "\n")
+            self.file.flush()
+
+    def mark_completed(self, chunk_idx: int) -> None:
+        """
+        Records the specified chunk as uploaded.
+
+        :param chunk_idx: index of the chunk
+        """
+        with self.lock:
+            self.completed.add(chunk_idx)
+            self.file.write(str(chunk_idx) + "\n")
+            self.file.flush()
+
+    def close(self) -> None:
+        """
+        Closes the progress file.
+        """
+        self.file.close()
+
+
+def upload_chunk(
+        session: requests.Session, url: str, data: Union[bytes, BinaryIO], retries: int, backoff: float = 1.0,
+        content_type: str = 'application/n-triples'
+) -> None:
+    """
+    Uploads the specified N-Triples via the graph store protocol - failed uploads are retried with exponential backoff.
+
+    Repeating an upload is harmless, since the knowledge graph is a set of triples (no blank nodes in the chunks).
+
+    :param session: HTTP session of the uploading thread
+    :param url: data endpoint (graph store protocol)
+    :param data: N-Triples to be uploaded (or file containing them, only uploaded once, i.e., no retries)
+    :param retries: maximum number of retries
+    :param backoff: waiting time before the first retry in seconds (doubled for each further retry)
+    :param content_type: content type of the data, e.g., `application/sparql-update` for updates
+    """
+    for attempt in range(retries + 1):
+        try:
+            res = session.post(url, data=data, headers={'Content-Type': content_type})
+            if res.status_code in (200, 201, 204):
+                return
+            if res.status_code < 500 and res.status_code != 429:
+                # not caused by an overloaded / restarting server, e.g., invalid N-Triples
+                raise RuntimeError("upload failed - HTTP status code: " + str(res.status_code) + "\n" + res.text[:500])
+            error = "HTTP status code: " + str(res.status_code)
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+        if attempt < retries:
+            print("upload failed (" + error + ") - retry in", backoff * 2 ** attempt, "s")
+            time.sleep(backoff * 2 ** attempt)
+    raise RuntimeError("upload failed after " + str(retries) + " retries: " + error)
+
+
+def restore_knowledge_graph(
+        path: str, kg_url: str, data_endpoint: str, max_chunk_bytes: int = 16 * 1024 * 1024, jobs: int = 4,
+        retries: int = 5, progress_path: str = ""
+) -> Dict:
+    """
+    Restores the specified backup by uploading size-bounded chunks in parallel.
+
+    The file is streamed, i.e., at most `2 * jobs` chunks are held in memory. The uploaded chunks are recorded in a
+    progress file, which is removed after a complete restore - an interrupted restore continues where it stopped.
+
+    :param path: path of the backup (`.nt` / `.nt.gz` / `.nt.zst`)
+    :param kg_url: URL of the knowledge graph server
+    :param data_endpoint: data endpoint of the dataset, e.g., /nesy_diag/data
+    :param max_chunk_bytes: maximum size of a chunk
+    :param jobs: number of parallel uploads
+    :param retries: maximum number of retries per chunk
+    :param progress_path: path of the progress file (default: `<backup>.restore_progress`)
+    :return: statistics of the restore
+    """
+    url = kg_url + data_endpoint
+    progress = RestoreProgress(progress_path or path + ".restore_progress", path, max_chunk_bytes)
+    sessions = threading.local()
+
+    def upload(chunk_idx: int, data: bytes) -> None:
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        upload_chunk(sessions.session, url, data, retries)
+        progress.mark_completed(chunk_idx)
+
+    stats = {"chunks": 0, "skipped_chunks": 0, "triples": 0, "bytes": 0}
+    # only spilled to disk if there are many
+    blank_node_triples = tempfile.SpooledTemporaryFile(max_size=max_chunk_bytes)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = set()
+        try:
+            for chunk_idx, data, num_triples in iter_chunks(path, max_chunk_bytes, blank_node_triples):
+                if chunk_idx in progress.completed:
+                    stats["skipped_chunks"] += 1
+                    continue
+                if len(pending) >= 2 * jobs:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(upload, chunk_idx, data))
+                stats["chunks"] += 1
+                stats["triples"] += num_triples
+                stats["bytes"] += len(data)
+                if stats["chunks"] % 10 == 0:
+                    duration = time.perf_counter() - start
+                    print(
+                        "submitted", stats["chunks"], "chunks,", stats["triples"], "triples,",
+                        round(stats["bytes"] / (1024 * 1024) / duration, 2), "MB/s"
+                    )
+            for future in pending:
+                future.result()
+            if blank_node_triples.tell() > 0 and BLANK_NODE_CHUNK not in progress.completed:
+                # one upload, i.e., the blank node labels keep referring to the same nodes - not retried, since
+                # repeating it would duplicate the blank nodes (recorded as completed, i.e., not repeated on resume)
+                stats["bytes"] += blank_node_triples.tell()
+                blank_node_triples.seek(0)
+                stats["triples"] += sum(1 for _ in blank_node_triples)
+                blank_node_triples.seek(0)
+                upload_chunk(requests.Session(), url, blank_node_triples, retries=0)
+                progress.mark_completed(BLANK_NODE_CHUNK)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            progress.close()
+            raise
+        finally:
+            blank_node_triples.close()
+    progress.close()
+    os.remove(progress.path)
+    duration = time.perf_counter() - start
+    stats["duration_s"] = round(duration, 3)
+    stats["throughput_mb_s"] = round(stats["bytes"] / (1024 * 1024) / duration, 2) if duration > 0 else 0.0
+    stats["throughput_triples_s"] = round(stats["triples"] / duration) if duration > 0 else 0
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parallel chunked restore of a KG backup (N-Triples)')
+    parser.add_argument('backup', type=str, help='backup to be restored (.nt / .nt.gz / .nt.zst)')
+    parser.add_argument('--kg-url', type=str, default=FUSEKI_URL, help='URL of the knowledge graph server')
+    parser.add_argument(
+        '--dataset', type=str, default=DATA_ENDPOINT.split("/")[1], help='name of the dataset, e.g., nesy_diag'
+    )
+    parser.add_argument('--chunk-size', type=int, default=16, help='maximum size of an uploaded chunk in MB')
+    parser.add_argument('--jobs', type=int, default=4, help='number of parallel uploads')
+    parser.add_argument('--retries', type=int, default=5, help='maximum number of retries per chunk')
+    parser.add_argument('--progress-file', type=str, default="", help='default: <backup>.restore_progress')
+    args = parser.parse_args()
+
+    try:
+        restore_stats = restore_knowledge_graph(
+            args.backup, args.kg_url, "/" + args.dataset + "/data", args.chunk_size * 1024 * 1024, args.jobs,
+            args.retries, args.progress_file
+        )
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    except RuntimeError as e:
+        print(e)
+        print("restore incomplete - rerun the command to resume")
+        sys.exit(1)
+    print("restore completed successfully:", args.backup)
+    for key, val in restore_stats.items():
+        print("\t" + key + ":", val)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import io
+import json
+import sys
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List
+
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX
+from nesy_diag_ontology.connection_controller import ConnectionController
+from nesy_diag_ontology.expert_knowledge_enhancer import ExpertKnowledgeEnhancer
+from nesy_diag_ontology.knowledge_graph_index import KnowledgeGraphIndex
+from nesy_diag_ontology.knowledge_snapshot import EXPERT_PERSPECTIVES, DIAG_PERSPECTIVES, SNAPSHOT_LITERAL_LIMITS
+from nesy_diag_ontology.metrics import count_round_trips
+from nesy_diag_ontology.ontology_instance_generator import OntologyInstanceGenerator
+from nesy_diag_ontology.standin_server import StandInServer
+
+RAW_ONTOLOGY = "knowledge_base/raw_nesy_diag_ontology.owl"
+# numbers of suspect components of the added error codes
+SUSPECT_COMPONENT_COUNTS = [1, 5, 20]
+
+# maximum number of HTTP requests per operation (n: number of suspect components)
+ROUND_TRIP_BUDGETS: Dict[str, Callable[[int], int]] = {
+    # error code / fault condition lookup, two lookups per suspect component (instance, priority), upload
+    'add_error_code_to_knowledge_graph': lambda n: 3 + 2 * n,
+    # one upload per step + lookups: diag entity, each classified component, model (once), error code of the diag log
+    'full_diagnosis': lambda n: 14,
+    # outgoing + incoming relations of the concepts (one streamed export each)
+    'snapshot_perspective': lambda n: 2
+}
+
+
+def add_components(enhancer: ExpertKnowledgeEnhancer, names: List[str]) -> None:
+    """
+    Adds the specified components (without verifying components) to the knowledge graph.
+
+    :param enhancer: expert knowledge enhancer to be used
+    :param names: names of the components
+    """
+    for name in names:
+        enhancer.add_component_to_knowledge_graph(name, [])
+
+
+def check_add_error_code(kg_url: str) -> List[Dict]:
+    """
+    Counts the round trips of adding error codes with an increasing number of suspect components.
+
+    :param kg_url: URL of the knowledge graph server
+    :return: results (operation, parameter, round trips, budget)
+    """
+    enhancer = ExpertKnowledgeEnhancer(kg_url=kg_url, verbose=False)
+    results = []
+    for n in SUSPECT_COMPONENT_COUNTS:
+        components = ["C_" + str(n) + "_" + str(i) for i in range(n)]
+        add_components(enhancer, components)
+        with count_round_trips() as round_trips:
+            enhancer.add_error_code_to_knowledge_graph("E_" + str(n), "fault condition " + str(n), components)
+        results.append(result_entry('add_error_code_to_knowledge_graph', n, round_trips.requests))
+    return results
+
+
+def check_full_diagnosis(kg_url: str) -> List[Dict]:
+    """
+    Counts the round trips of recording a full diagnosis (cf. README): diag entity, signal, heatmap, fault path, two
+    signal classifications, manual inspection and diag log.
+
+    :param kg_url: URL of the knowledge graph server
+    :return: results (operation, parameter, round trips, budget)
+    """
+    enhancer = ExpertKnowledgeEnhancer(kg_url=kg_url, verbose=False)
+    add_components(enhancer, ["C_A", "C_B", "C_C"])
+    enhancer.add_error_code_to_knowledge_graph("E_D", "fault condition D", ["C_A", "C_B", "C_C"])
+    enhancer.add_model_to_knowledge_graph(42, "z-norm", "measure x", "model_d", "C_A", [], "CNN")
+    instance_gen = OntologyInstanceGenerator(kg_url=kg_url, verbose=False)
+    fault_cond = instance_gen.knowledge_graph_query_tool.query_fault_condition_instance_by_code("E_D")[0].split("#")[1]
+    with count_round_trips() as round_trips:
+        instance_gen.extend_knowledge_graph_with_diag_entity_data("entity_d")
+        signal_id = instance_gen.extend_knowledge_graph_with_sensor_signal([13.3, 13.6, 14.6, 16.7, 8.5] * 100)
+        heatmap_id = instance_gen.extend_knowledge_graph_with_heatmap("GradCAM", [0.4, 0.3, 0.7, 0.8] * 125)
+        fault_path_id = instance_gen.extend_knowledge_graph_with_fault_path("C_A -> C_B", fault_cond)
+        classifications = [
+            instance_gen.extend_knowledge_graph_with_signal_classification(
+                True, "diag_association_d", "C_A", 0.45, "model_d", signal_id, heatmap_id
+            ),
+            instance_gen.extend_knowledge_graph_with_signal_classification(
+                True, "diag_association_d", "C_B", 0.85, "model_d", signal_id, heatmap_id
+            ),
+            instance_gen.extend_knowledge_graph_with_manual_inspection(False, "diag_association_d", "C_C")
+        ]
+        instance_gen.extend_knowledge_graph_with_diag_log(
+            "19.03.2025", ["E_D"], [fault_path_id], classifications, "diag_entity_d"
+        )
+        instance_gen.flush()
+    return [result_entry('full_diagnosis', 0, round_trips.requests)]
+
+
+def check_snapshot_perspectives(kg_url: str) -> List[Dict]:
+    """
+    Counts the round trips of producing each snapshot perspective (export + presentation).
+
+    :param kg_url: URL of the knowledge graph server
+    :return: results (operation, perspective, round trips, budget)
+    """
+    connection = ConnectionController(ONTOLOGY_PREFIX, kg_url, verbose=False)
+    results = []
+    for snapshot, concepts in EXPERT_PERSPECTIVES + DIAG_PERSPECTIVES:
+        with count_round_trips() as round_trips, redirect_stdout(io.StringIO()):
+            snapshot(KnowledgeGraphIndex.from_export(connection, concepts, SNAPSHOT_LITERAL_LIMITS))
+        results.append(result_entry('snapshot_perspective', 0, round_trips.requests, snapshot.__name__))
+    return results
+
+
+def result_entry(operation: str, n: int, round_trips: int, name: str = "") -> Dict:
+    """
+    Compares the counted round trips of an operation with its budget.
+
+    :param operation: operation (key of `ROUND_TRIP_BUDGETS`)
+    :param n: number of suspect components (0 if not applicable)
+    :param round_trips: counted round trips
+    :param name: name to be reported instead of the operation, e.g., the snapshot perspective
+    :return: result (operation, round trips, budget, whether the budget is met)
+    """
+    budget = ROUND_TRIP_BUDGETS[operation](n)
+    return {
+        "operation": name if name != "" else operation + (" (n=" + str(n) + ")" if n > 0 else ""),
+        "round_trips": round_trips,
+        "budget": budget,
+        "ok": round_trips <= budget
+    }
+
+
+def run_budget_checks(kg_url: str = "", ontology: str = RAW_ONTOLOGY) -> List[Dict]:
+    """
+    Checks the round trips of the key operations against their budgets - the scenarios build on each other (expert
+    knowledge, diagnosis, snapshots).
+
+    :param kg_url: URL of a knowledge graph server (empty: in-process stand-in)
+    :param ontology: raw ontology loaded into the in-process stand-in
+    :return: results
+    """
+    if kg_url != "":
+        return check_add_error_code(kg_url) + check_full_diagnosis(kg_url) + check_snapshot_perspectives(kg_url)
+    with StandInServer() as server:
+        server.load(ontology)
+        return run_budget_checks(server.url)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Round trip budgets of the key operations (no Fuseki needed)')
+    parser.add_argument(
+        '--kg-url', type=str, default="", help='use the specified (empty) KG server instead of the in-process stand-in'
+    )
+    parser.add_argument('--ontology', type=str, default=RAW_ONTOLOGY, help='raw ontology loaded into the stand-in')
+    parser.add_argument('--output', type=str, default="", help='write the results to the specified JSON file')
+    args = parser.parse_args()
+
+    budget_results = run_budget_checks(args.kg_url, args.ontology)
+    for result in budget_results:
+        print(
+            ("OK  " if result["ok"] else "FAIL") + "\t" + result["operation"] + ":", result["round_trips"],
+            "round trips (budget: " + str(result["budget"]) + ")"
+        )
+    if args.output != "":
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(budget_results, f, indent=4)
+    if not all(result["ok"] for result in budget_results):
+        sys.exit(1)
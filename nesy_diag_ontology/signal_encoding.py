@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import base64
+import time
+import zlib
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from nesy_diag_ontology.blob_store import BlobStore
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX, SIGNAL_ENCODINGS
+
+# typed literal datatypes for base64-encoded little-endian arrays: (numpy dtype, zlib compressed)
+ARRAY_DATATYPES = {
+    ONTOLOGY_PREFIX + "float32Base64": ("<f4", False),
+    ONTOLOGY_PREFIX + "float16Base64": ("<f2", False),
+    ONTOLOGY_PREFIX + "float32Base64Zlib": ("<f4", True),
+    ONTOLOGY_PREFIX + "float16Base64Zlib": ("<f2", True),
+}
+# reference to an array in the external blob store: "sha256:<digest>;<dtype>;<comma-separated shape>"
+BLOB_REFERENCE_DATATYPE = ONTOLOGY_PREFIX + "npyBlobReference"
+BLOB_DTYPES = {"legacy": "<f8", "float32": "<f4", "float16": "<f2"}
+
+
+def get_array_datatype(encoding: str, compress: bool) -> str:
+    """
+    Returns the typed literal datatype for the specified encoding.
+
+    :param encoding: array encoding (float32 | float16)
+    :param compress: whether the encoded bytes are zlib compressed
+    :return: datatype IRI
+    """
+    assert encoding in SIGNAL_ENCODINGS[1:]
+    return ONTOLOGY_PREFIX + encoding + "Base64" + ("Zlib" if compress else "")
+
+
+def encode_array(
+        values: Union[List[float], np.ndarray], encoding: str = "float32", compress: bool = False
+) -> Tuple[str, str]:
+    """
+    Encodes the specified values as base64 string of little-endian floats.
+
+    :param values: values to be encoded, e.g., sensor signal or heatmap
+    :param encoding: array encoding (float32 | float16)
+    :param compress: whether the bytes should be zlib compressed before base64 encoding
+    :return: (lexical form, datatype IRI) of the typed literal
+    """
+    datatype = get_array_datatype(encoding, compress)
+    raw = np.asarray(values, dtype=ARRAY_DATATYPES[datatype][0]).tobytes()
+    if compress:
+        raw = zlib.compress(raw)
+    return base64.b64encode(raw).decode("ascii"), datatype
+
+
+def is_encoded_array(datatype: str) -> bool:
+    """
+    Checks whether the specified literal datatype denotes an encoded array.
+
+    :param datatype: datatype IRI of the literal
+    :return: whether it's an encoded array
+    """
+    return datatype in ARRAY_DATATYPES
+
+
+def encode_blob_reference(
+        values: Union[List[float], np.ndarray], blob_store: BlobStore, encoding: str = "legacy"
+) -> Tuple[str, str]:
+    """
+    Stores the specified values in the blob store and encodes the reference to them.
+
+    :param values: values to be stored, e.g., sensor signal or heatmap
+    :param blob_store: blob store holding the array payloads
+    :param encoding: signal encoding determining the stored dtype (legacy -> float64)
+    :return: (lexical form, datatype IRI) of the typed literal
+    """
+    arr = np.asarray(values, dtype=BLOB_DTYPES[encoding])
+    digest = blob_store.put(arr, arr.dtype.str)
+    shape = ",".join(str(dim) for dim in arr.shape)
+    return "sha256:" + digest + ";" + arr.dtype.str + ";" + shape, BLOB_REFERENCE_DATATYPE
+
+
+def parse_blob_reference(lexical: str) -> Tuple[str, str, Tuple[int, ...]]:
+    """
+    Parses the specified blob reference.
+
+    :param lexical: lexical form of the blob reference literal
+    :return: (digest, dtype, shape)
+    """
+    digest, dtype, shape = lexical.split(";")
+    assert digest.startswith("sha256:")
+    return digest[len("sha256:"):], dtype, tuple(int(dim) for dim in shape.split(",") if dim != "")
+
+
+def decode_array(lexical: str, datatype: str = "", blob_store: BlobStore = None) -> np.ndarray:
+    """
+    Decodes the specified literal into a NumPy array.
+
+    Literals without array datatype are interpreted as legacy list strings, e.g., "[13.3, 13.6, 14.6]".
+    Blob references are resolved to read-only memory-mapped views of the stored arrays.
+
+    :param lexical: lexical form of the literal
+    :param datatype: datatype IRI of the literal
+    :param blob_store: blob store required for resolving blob references
+    :return: decoded values
+    """
+    if datatype == BLOB_REFERENCE_DATATYPE:
+        assert blob_store is not None, "blob reference cannot be resolved without blob store"
+        digest, _, _ = parse_blob_reference(lexical)
+        return blob_store.get(digest)
+    if is_encoded_array(datatype):
+        dtype, compressed = ARRAY_DATATYPES[datatype]
+        raw = base64.b64decode(lexical)
+        if compressed:
+            raw = zlib.decompress(raw)
+        return np.frombuffer(raw, dtype=dtype)
+    values = lexical.strip()[1:-1].strip()
+    if len(values) == 0:
+        return np.array([], dtype=np.float64)
+    return np.array(values.split(","), dtype=np.float64)
+
+
+def benchmark(lengths: List[int], repetitions: int) -> None:
+    """
+    Compares the legacy list string representation to the binary encodings for the specified signal lengths.
+
+    :param lengths: signal lengths to be considered
+    :param repetitions: number of encoding / decoding repetitions per configuration
+    """
+    rng = np.random.default_rng(42)
+    print("length\tencoding\tcompressed\tsize (bytes)\tencode (ms)\tdecode (ms)")
+    for length in lengths:
+        # smooth signal with noise, roughly resembling a recorded voltage curve
+        signal = (13.0 + np.sin(np.linspace(0, 20, length)) + rng.normal(0, 0.1, length)).round(3).tolist()
+        configs = [("legacy", False)] + [(enc, comp) for enc in SIGNAL_ENCODINGS[1:] for comp in [False, True]]
+        for encoding, compress in configs:
+            start = time.perf_counter()
+            for _ in range(repetitions):
+                if encoding == "legacy":
+                    lexical, datatype = str(signal), ""
+                else:
+                    lexical, datatype = encode_array(signal, encoding, compress)
+            encode_ms = (time.perf_counter() - start) / repetitions * 1000
+            start = time.perf_counter()
+            for _ in range(repetitions):
+                decode_array(lexical, datatype)
+            decode_ms = (time.perf_counter() - start) / repetitions * 1000
+            print(f"{length}\t{encoding}\t{compress}\t{len(lexical)}\t{encode_ms:.3f}\t{decode_ms:.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of sensor signal / heatmap literal encodings')
+    parser.add_argument(
+        '--lengths', type=int, nargs='+', default=[500, 5000, 50000, 500000], help='signal lengths to benchmark'
+    )
+    parser.add_argument('--repetitions', type=int, default=10, help='repetitions per configuration')
+    args = parser.parse_args()
+    benchmark(args.lengths, args.repetitions)
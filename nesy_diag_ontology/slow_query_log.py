@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import hashlib
+import json
+import re
+import statistics
+import threading
+import time
+from collections import deque, defaultdict
+from typing import Dict, List, Tuple, Deque
+
+from nesy_diag_ontology.config import SLOW_QUERY_THRESHOLD_S, SLOW_QUERY_LOG, QUERY_STATS_SAMPLES, LOG_LITERAL_LIMIT
+from nesy_diag_ontology.kg_logging import get_logger, truncate
+from nesy_diag_ontology.metrics import METRICS
+
+logger = get_logger(__name__)
+
+# string literals (long / short, both quote styles), IRIs, comments and numeric literals of SPARQL queries
+QUERY_TOKEN = re.compile(
+    r'"""(?:[^"\\]|\\.|"(?!""))*"""'
+    r"|'''(?:[^'\\]|\\.|'(?!''))*'''"
+    r'|"(?:[^"\\\n]|\\.)*"'
+    r"|'(?:[^'\\\n]|\\.)*'"
+    r'|<[^<>"{}|^`\\\s]*>'
+    r'|#[^\n]*'
+    r'|(?<![\w:?$.])[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?(?![\w.])'
+)
+# inline data (lists of instances), e.g., VALUES ?diag_log { <...> <...> }
+VALUES_BLOCK = re.compile(r'(VALUES\s+(?:\?\w+|\([^)]*\))\s*)\{[^}]*\}', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint_query(query: str) -> Tuple[str, str, List[str]]:
+    """
+    Normalizes the specified query - literals (parameters) are replaced by `?`, inline data is collapsed and comments /
+    whitespace are removed, i.e., all executions of a query method share the same fingerprint.
+
+    :param query: SPARQL query
+    :return: (fingerprint, normalized query, parameters)
+    """
+    params = []
+
+    def normalize(match: re.Match) -> str:
+        token = match.group(0)
+        if token[0] == "<":
+            return token
+        if token[0] == "#":
+            return " "
+        params.append(token[1:-1] if token[0] in "\"'" else token)
+        return "?"
+
+    normalized = QUERY_TOKEN.sub(normalize, query)
+    normalized = VALUES_BLOCK.sub(r"\1{ ? }", normalized)
+    normalized = WHITESPACE.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16], normalized, params
+
+
+def query_source() -> str:
+    """
+    Returns the (innermost) instrumented operation that issued the current query, e.g., a query tool method.
+
+    :return: name of the operation (empty if unknown, e.g., metrics disabled)
+    """
+    for stats in reversed(METRICS.active_operations()):
+        if not stats.name.startswith("ConnectionController."):
+            return stats.name
+    return ""
+
+
+class FingerprintStats:
+    """
+    Latency statistics of a query fingerprint.
+    """
+
+    def __init__(self, fingerprint: str, normalized: str, source: str) -> None:
+        self.fingerprint = fingerprint
+        self.normalized = normalized
+        self.source = source
+        self.count = 0
+        self.slow = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.rows = 0
+        # most recent latencies (percentiles)
+        self.latencies: Deque[float] = deque(maxlen=QUERY_STATS_SAMPLES)
+
+    def to_dict(self) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            "fingerprint": self.fingerprint,
+            "source": self.source,
+            "count": self.count,
+            "slow": self.slow,
+            "total_s": round(self.total_s, 6),
+            "mean_s": round(self.total_s / self.count, 6),
+            "p50_s": round(latencies[len(latencies) // 2], 6),
+            "p95_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 6),
+            "max_s": round(self.max_s, 6),
+            "mean_rows": round(self.rows / self.count, 1),
+            "query": self.normalized
+        }
+
+
+class SlowQueryLog:
+    """
+    Per-fingerprint latency statistics of the queries sent by `ConnectionController`s - queries that take at least
+    the threshold are additionally written to the slow-query log (JSON Lines: fingerprint, issuing operation,
+    duration, result size, parameters and normalized query) and logged as warning.
+    """
+
+    def __init__(self, threshold_s: float = SLOW_QUERY_THRESHOLD_S, path: str = SLOW_QUERY_LOG) -> None:
+        """
+        Initializes the slow-query log.
+
+        :param threshold_s: minimum duration of slow queries in seconds
+        :param path: path of the slow-query log (JSON Lines), empty: slow queries are only logged as warning
+        """
+        self.threshold_s = threshold_s
+        self.path = path
+        self.fingerprints: Dict[str, FingerprintStats] = {}
+        self.lock = threading.Lock()
+
+    def record(self, query: str, duration: float, rows: int, source: str = None) -> str:
+        """
+        Records an executed query.
+
+        :param query: SPARQL query
+        :param duration: duration of the query in seconds (until the last result row was received)
+        :param rows: number of result rows
+        :param source: operation that issued the query (default: innermost active instrumented operation)
+        :return: fingerprint of the query
+        """
+        fingerprint, normalized, params = fingerprint_query(query)
+        if source is None:
+            source = query_source()
+        slow = duration >= self.threshold_s
+        with self.lock:
+            stats = self.fingerprints.get(fingerprint)
+            if stats is None:
+                stats = self.fingerprints[fingerprint] = FingerprintStats(fingerprint, normalized, source)
+            stats.count += 1
+            stats.slow += slow
+            stats.total_s += duration
+            stats.max_s = max(stats.max_s, duration)
+            stats.rows += rows
+            stats.latencies.append(duration)
+            if slow and self.path != "":
+                entry = {
+                    "timestamp": time.time(),
+                    "fingerprint": fingerprint,
+                    "source": source,
+                    "duration_s": round(duration, 6),
+                    "rows": rows,
+                    "params": [truncate(param, LOG_LITERAL_LIMIT) for param in params],
+                    "query": normalized
+                }
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+        if slow:
+            logger.warning(
+                "slow query %s (%s): %.3f s, %d rows, params: %s", fingerprint, source or "-", duration, rows, params
+            )
+        return fingerprint
+
+    def statistics(self) -> List[Dict]:
+        """
+        Returns the statistics of all fingerprints, sorted by total time (descending).
+
+        :return: statistics per fingerprint
+        """
+        with self.lock:
+            entries = [stats.to_dict() for stats in self.fingerprints.values()]
+        return sorted(entries, key=lambda entry: -entry["total_s"])
+
+    def reset(self) -> None:
+        with self.lock:
+            self.fingerprints = {}
+
+
+QUERY_LOG = SlowQueryLog()
+
+
+def rank_slow_queries(path: str, sort_by: str = "total_s") -> List[Dict]:
+    """
+    Aggregates the entries of the specified slow-query log by fingerprint.
+
+    :param path: path of the slow-query log (JSON Lines)
+    :param sort_by: ranking criterion [total_s | max_s | p95_s | count]
+    :return: worst offenders first
+    """
+    entries = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip() != "":
+                entry = json.loads(line)
+                entries[entry["fingerprint"]].append(entry)
+    ranking = []
+    for fingerprint, slow_queries in entries.items():
+        durations = sorted(entry["duration_s"] for entry in slow_queries)
+        slowest = max(slow_queries, key=lambda entry: entry["duration_s"])
+        ranking.append({
+            "fingerprint": fingerprint,
+            "source": slowest["source"],
+            "count": len(durations),
+            "total_s": sum(durations),
+            "p95_s": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            "max_s": durations[-1],
+            "mean_rows": statistics.mean(entry["rows"] for entry in slow_queries),
+            "slowest_params": slowest["params"],
+            "query": slowest["query"]
+        })
+    return sorted(ranking, key=lambda entry: -entry[sort_by])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Slow-query report - worst offenders by query fingerprint')
+    parser.add_argument('slow_query_log', type=str, help='slow-query log (JSON Lines)')
+    parser.add_argument('--top', type=int, default=10, help='number of presented fingerprints')
+    parser.add_argument(
+        '--sort', type=str, choices=['total_s', 'max_s', 'p95_s', 'count'], default='total_s', help='ranking criterion'
+    )
+    args = parser.parse_args()
+
+    for rank, offender in enumerate(rank_slow_queries(args.slow_query_log, args.sort)[:args.top]):
+        print(
+            str(rank + 1) + ".", offender["fingerprint"], "-", offender["source"] or "(unknown source)",
+            "\n\tslow executions:", offender["count"], "| total:", round(offender["total_s"], 3), "s | p95:",
+            round(offender["p95_s"], 3), "s | max:", round(offender["max_s"], 3), "s | mean rows:",
+            round(offender["mean_rows"], 1),
+            "\n\tparams of slowest:", offender["slowest_params"],
+            "\n\t" + truncate(offender["query"], 300) + "\n"
+        )
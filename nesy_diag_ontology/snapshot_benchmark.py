@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import List, Tuple, Callable
+
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL
+from nesy_diag_ontology.connection_controller import ConnectionController
+from nesy_diag_ontology.knowledge_graph_query_tool import KnowledgeGraphQueryTool
+from nesy_diag_ontology.knowledge_snapshot import THEME_PERSPECTIVES, print_theme_header, render_snapshot
+from nesy_diag_ontology.synthetic_kg import SyntheticKnowledgeGraph
+
+
+def count_requests(connection: ConnectionController) -> List[int]:
+    """
+    Counts the requests sent via the specified connection (by wrapping its query methods).
+
+    :param connection: connection to be observed
+    :return: single-element list holding the number of requests (updated in place)
+    """
+    counter = [0]
+    for name in ["query_knowledge_graph", "stream_query_results"]:
+        method = getattr(connection, name)
+
+        def counting(*args, method=method, **kwargs):
+            counter[0] += 1
+            return method(*args, **kwargs)
+
+        setattr(connection, name, counting)
+    return counter
+
+
+def run(render: Callable[[], None]) -> Tuple[str, float]:
+    """
+    Runs the specified snapshot rendering and captures its output.
+
+    :param render: rendering to be run
+    :return: (output, runtime in seconds)
+    """
+    buffer = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(buffer):
+        render()
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark - per-instance queries vs. bulk export for snapshots')
+    parser.add_argument('--kg-url', type=str, default=FUSEKI_URL, help='URL of an empty knowledge graph server')
+    parser.add_argument('--components', type=int, default=50, help='number of synthetic suspect components')
+    parser.add_argument('--error-codes', type=int, default=200, help='number of synthetic error codes')
+    parser.add_argument('--diagnoses', type=int, default=1000, help='number of synthetic diagnoses')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the synthetic KG')
+    parser.add_argument('--skip-population', action='store_true', help='use the KG as is')
+    parser.add_argument('--jobs', type=int, default=4, help='maximum number of concurrent exports')
+    args = parser.parse_args()
+
+    kg_connection = ConnectionController(namespace=ONTOLOGY_PREFIX, fuseki_url=args.kg_url, verbose=False)
+    if not args.skip_population:
+        synthetic_kg = "".join(SyntheticKnowledgeGraph(
+            components=args.components, error_codes=args.error_codes, diagnoses=args.diagnoses, seed=args.seed
+        ).triples())
+        print("uploading", synthetic_kg.count("\n"), "synthetic triples..")
+        kg_connection.upload_n_triples(synthetic_kg)
+    requests_sent = count_requests(kg_connection)
+    qt = KnowledgeGraphQueryTool(kg_url=args.kg_url, verbose=False)
+    qt.fuseki_connection = kg_connection
+
+    identical = True
+    for theme, perspectives in THEME_PERSPECTIVES.items():
+        requests_sent[0] = 0
+        per_instance_output, per_instance_time = run(
+            lambda: [print_theme_header(theme)] + [snapshot(qt) for snapshot, _ in perspectives]
+        )
+        per_instance_requests = requests_sent[0]
+        requests_sent[0] = 0
+        bulk_output, bulk_time = run(lambda: render_snapshot(kg_connection, [theme], jobs=args.jobs))
+        print(theme + ":")
+        print("\tper-instance queries:", per_instance_requests, "requests,", round(per_instance_time, 3), "s")
+        print("\tbulk export:", requests_sent[0], "requests,", round(bulk_time, 3), "s")
+        print("\tspeed-up:", round(per_instance_time / bulk_time, 1), "x")
+        print("\tidentical output:", per_instance_output == bulk_output)
+        identical = identical and per_instance_output == bulk_output
+    if not identical:
+        sys.exit(1)
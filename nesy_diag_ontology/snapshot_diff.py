@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import gzip
+import json
+from typing import Dict, Iterator, List, TextIO, Tuple
+
+
+def read_records(stream: TextIO, name: str) -> Iterator[Tuple[Tuple[str, str], Dict]]:
+    """
+    Reads the records of a structured snapshot (JSON Lines) and checks that they are sorted by concept and key.
+
+    :param stream: snapshot stream
+    :param name: name of the snapshot (for error messages)
+    :return: ((concept, key), properties) tuples
+    """
+    previous = None
+    for line_number, line in enumerate(stream, 1):
+        if len(line.strip()) == 0:
+            continue
+        record = json.loads(line)
+        record_key = (record["concept"], record["key"])
+        if previous is not None and record_key < previous:
+            raise ValueError(name + " is not sorted by concept and key (line " + str(line_number) + ")")
+        previous = record_key
+        yield record_key, record["properties"]
+
+
+def diff_properties(old: Dict, new: Dict) -> List[str]:
+    """
+    Compares the properties of two versions of an entity.
+
+    :param old: properties of the old version
+    :param new: properties of the new version
+    :return: descriptions of the changed properties / relations
+    """
+    changes = []
+    for prop in sorted(set(old) | set(new)):
+        old_val, new_val = old.get(prop), new.get(prop)
+        if old_val == new_val:
+            continue
+        if isinstance(old_val, list) and isinstance(new_val, list) and sorted(old_val) != sorted(new_val):
+            added = [val for val in new_val if val not in old_val]
+            removed = [val for val in old_val if val not in new_val]
+            changes.append(prop + ": +" + str(added) + " -" + str(removed))
+        else:
+            changes.append(prop + ": " + repr(old_val) + " -> " + repr(new_val))
+    return changes
+
+
+def diff_snapshots(
+        old: Iterator[Tuple[Tuple[str, str], Dict]], new: Iterator[Tuple[Tuple[str, str], Dict]], concept: str = "",
+        key: str = ""
+) -> Iterator[Tuple[str, str, str, List[str]]]:
+    """
+    Compares two sorted snapshots via merge join, i.e., in linear time and constant memory.
+
+    :param old: records of the old snapshot (sorted by concept and key)
+    :param new: records of the new snapshot (sorted by concept and key)
+    :param concept: if specified, only entities of this concept are considered
+    :param key: if specified, only entities with this key are considered
+    :return: (change type [+ | - | ~], concept, key, changed properties) tuples
+    """
+    def relevant(record_key: Tuple[str, str]) -> bool:
+        return (concept == "" or record_key[0] == concept) and (key == "" or record_key[1] == key)
+
+    old_record, new_record = next(old, None), next(new, None)
+    while old_record is not None or new_record is not None:
+        if new_record is None or (old_record is not None and old_record[0] < new_record[0]):
+            if relevant(old_record[0]):
+                yield "-", old_record[0][0], old_record[0][1], []
+            old_record = next(old, None)
+        elif old_record is None or new_record[0] < old_record[0]:
+            if relevant(new_record[0]):
+                yield "+", new_record[0][0], new_record[0][1], []
+            new_record = next(new, None)
+        else:
+            if relevant(old_record[0]) and old_record[1] != new_record[1]:
+                yield "~", old_record[0][0], old_record[0][1], diff_properties(old_record[1], new_record[1])
+            old_record, new_record = next(old, None), next(new, None)
+
+
+def open_snapshot(path: str) -> TextIO:
+    """
+    Opens the specified structured snapshot (optionally gzip compressed).
+
+    :param path: path of the `.jsonl` / `.jsonl.gz` file
+    :return: text stream
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Order-independent diff of two structured knowledge snapshots')
+    parser.add_argument('old', type=str, help='old snapshot (.jsonl / .jsonl.gz)')
+    parser.add_argument('new', type=str, help='new snapshot (.jsonl / .jsonl.gz)')
+    parser.add_argument('--concept', type=str, default="", help='only consider entities of this concept')
+    parser.add_argument('--key', type=str, default="", help='only consider entities with this key, e.g., C45')
+    parser.add_argument('--summary', action='store_true', help='only print the number of changes per concept')
+    args = parser.parse_args()
+
+    summary = {}
+    with open_snapshot(args.old) as old_file, open_snapshot(args.new) as new_file:
+        for change, concept, key, changes in diff_snapshots(
+                read_records(old_file, args.old), read_records(new_file, args.new), args.concept, args.key
+        ):
+            summary.setdefault(concept, {"+": 0, "-": 0, "~": 0})[change] += 1
+            if not args.summary:
+                print(change, concept, key)
+                for c in changes:
+                    print("\t" + c)
+    for concept, counts in sorted(summary.items()):
+        print(concept + ":", "added:", counts["+"], "removed:", counts["-"], "changed:", counts["~"])
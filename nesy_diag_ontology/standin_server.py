@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import json
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Iterator, Union, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from nesy_diag_ontology.config import DATA_ENDPOINT
+from nesy_diag_ontology.ntriples import open_n_triples
+
+# plain (unquoted) literals in tab-separated results, as written by 'Fuseki'
+TSV_PLAIN_DATATYPES = ["http://www.w3.org/2001/XMLSchema#integer", "http://www.w3.org/2001/XMLSchema#boolean"]
+# number of queries currently evaluated with the ordered BGP evaluation (registered in rdflib while > 0)
+ordered_bgp_users = 0
+ordered_bgp_lock = threading.Lock()
+
+
+def order_patterns(ctx, patterns: List[Tuple]) -> List[Tuple]:
+    """
+    Orders the triple patterns of a basic graph pattern greedily by their estimated number of matches - each next
+    pattern shares a bound variable if possible. rdflib only sorts the patterns by the number of bound terms, i.e.,
+    the class patterns of the queries (`?x a <Class>`) are evaluated first, joined as Cartesian product.
+
+    :param ctx: query context (rdflib)
+    :param patterns: triple patterns
+    :return: ordered triple patterns
+    """
+    from rdflib import Variable
+    bound = {term for pattern in patterns for term in pattern if isinstance(term, Variable) and ctx[term] is not None}
+    # matches of the constant terms of each pattern
+    matches = [
+        sum(1 for _ in ctx.graph.triples(tuple(None if isinstance(term, Variable) else term for term in pattern)))
+        for pattern in patterns
+    ]
+
+    def estimate(idx: int) -> Tuple[bool, float]:
+        bound_vars = sum(1 for term in patterns[idx] if isinstance(term, Variable) and term in bound)
+        # unconnected patterns last (as long as there are connected ones), each bound variable is highly selective
+        return bound_vars == 0 and len(bound) > 0, matches[idx] / 100 ** bound_vars
+
+    remaining, ordered = list(range(len(patterns))), []
+    while len(remaining) > 0:
+        idx = min(remaining, key=estimate)
+        remaining.remove(idx)
+        ordered.append(patterns[idx])
+        bound.update(term for term in patterns[idx] if isinstance(term, Variable))
+    return ordered
+
+
+def evaluate_bgp(ctx, part):
+    """
+    Evaluates basic graph patterns with ordered triple patterns (custom evaluation function of rdflib).
+
+    :param ctx: query context (rdflib)
+    :param part: part of the query algebra
+    :return: solutions
+    """
+    if part.name != "BGP" or len(part.triples) < 2:
+        # single patterns are evaluated per solution in joins - nothing to order
+        raise NotImplementedError()
+    from rdflib.plugins.sparql.evaluate import evalBGP
+    return evalBGP(ctx, order_patterns(ctx, part.triples))
+
+
+@contextmanager
+def ordered_bgp_evaluation() -> Iterator[None]:
+    """
+    Registers the ordered BGP evaluation as custom evaluation function of rdflib while queries of a stand-in are
+    evaluated - the registry is global, i.e., other rdflib users of the process must not be affected otherwise.
+    """
+    global ordered_bgp_users
+    from rdflib.plugins.sparql import CUSTOM_EVALS
+    with ordered_bgp_lock:
+        ordered_bgp_users += 1
+        CUSTOM_EVALS["stand_in_bgp"] = evaluate_bgp
+    try:
+        yield
+    finally:
+        with ordered_bgp_lock:
+            ordered_bgp_users -= 1
+            if ordered_bgp_users == 0:
+                CUSTOM_EVALS.pop("stand_in_bgp", None)
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the subset of the SPARQL 1.1 protocol / graph store protocol used by the package.
+    """
+
+    server: "StandInHTTPServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def respond(self, status: int, data: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def endpoint(self) -> Union[str, None]:
+        """
+        Returns the endpoint of the request (`sparql` / `data` / `update`) if it addresses the dataset.
+
+        :return: endpoint
+        """
+        path = urlparse(self.path).path.strip("/").split("/")
+        if len(path) != 2 or path[0] != self.server.dataset:
+            self.respond(404, b"unknown dataset / endpoint", 'text/plain')
+            return None
+        self.server.count_request()
+        return path[1]
+
+    def do_GET(self) -> None:
+        endpoint = self.endpoint()
+        if endpoint == "data":
+            with self.server.lock:
+                data = self.server.graph.serialize(format="nt").encode()
+            self.respond(200, data, 'application/n-triples')
+        elif endpoint == "sparql":
+            self.query(parse_qs(urlparse(self.path).query)["query"][0])
+        elif endpoint is not None:
+            self.respond(405, b"method not allowed", 'text/plain')
+
+    def do_POST(self) -> None:
+        endpoint = self.endpoint()
+        if endpoint is None:
+            return
+        body, content_type = self.read_body().decode("utf-8"), self.headers.get('Content-Type', '')
+        if 'x-www-form-urlencoded' in content_type:
+            body = parse_qs(body)["query" if endpoint == "sparql" else "update"][0]
+        try:
+            if endpoint == "sparql":
+                self.query(body)
+            elif endpoint == "data":
+                with self.server.lock:
+                    self.server.graph.parse(data=body, format="nt" if "n-triples" in content_type else "turtle")
+                self.respond(200, b"{}", 'application/json')
+            elif endpoint == "update":
+                with self.server.lock, ordered_bgp_evaluation():
+                    self.server.graph.update(body)
+                self.respond(200, b"{}", 'application/json')
+            else:
+                self.respond(404, b"unknown endpoint", 'text/plain')
+        except Exception as e:
+            self.respond(400, str(e).encode(), 'text/plain')
+
+    def query(self, query: str) -> None:
+        """
+        Evaluates the specified query and responds with the results in the requested format.
+
+        :param query: SPARQL query
+        """
+        # results are evaluated lazily, i.e., the evaluation function stays registered until the response is built
+        with self.server.lock, ordered_bgp_evaluation():
+            res = self.server.graph.query(query)
+            if res.type == "CONSTRUCT":
+                self.respond(200, res.graph.serialize(format="nt").encode(), 'application/n-triples')
+            elif res.type == "ASK":
+                self.respond(200, json.dumps({"head": {}, "boolean": res.askAnswer}).encode(), 'application/json')
+            elif 'tab-separated' in self.headers.get('Accept', ''):
+                rows = ["\t".join("?" + str(var) for var in res.vars)]
+                rows.extend("\t".join(self.tsv_term(row[var]) for var in res.vars) for row in res)
+                self.respond(200, ("\n".join(rows) + "\n").encode(), 'text/tab-separated-values')
+            else:
+                self.respond(200, res.serialize(format="json"), 'application/sparql-results+json')
+
+    @staticmethod
+    def tsv_term(term) -> str:
+        if term is None:
+            return ""
+        if getattr(term, "datatype", None) is not None and str(term.datatype) in TSV_PLAIN_DATATYPES:
+            return str(term)
+        return term.n3()
+
+
+class StandInHTTPServer(ThreadingHTTPServer):
+    """
+    HTTP server of the stand-in - holds the dataset (rdflib graph) and counts the requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, dataset: str) -> None:
+        # rdflib is only needed by the stand-in, not by the clients
+        from rdflib import Graph
+        super().__init__(address, StandInRequestHandler)
+        self.dataset = dataset
+        self.graph = Graph()
+        # the graph is not thread-safe, requests are evaluated one at a time
+        self.lock = threading.RLock()
+        self.requests = 0
+        self.requests_lock = threading.Lock()
+
+    def count_request(self) -> None:
+        with self.requests_lock:
+            self.requests += 1
+
+
+class StandInServer:
+    """
+    In-process stand-in for the 'Fuseki' server hosting the knowledge graph (SPARQL 1.1 protocol / graph store
+    protocol subset used by the package), backed by an in-memory rdflib graph.
+
+    Intended for tests and benchmarks on machines without 'Fuseki' - it's neither fast nor concurrent, i.e., latencies
+    are only comparable among runs against the stand-in.
+    """
+
+    def __init__(self, dataset: str = DATA_ENDPOINT.split("/")[1], port: int = 0) -> None:
+        """
+        Initializes the stand-in (not started yet).
+
+        :param dataset: name of the dataset, e.g., nesy_diag
+        :param port: port of the server (0: any free port)
+        """
+        self.httpd = StandInHTTPServer(("127.0.0.1", port), dataset)
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        URL of the stand-in (to be used as `kg_url`).
+
+        :return: URL
+        """
+        return "http://127.0.0.1:" + str(self.httpd.server_address[1])
+
+    @property
+    def requests(self) -> int:
+        """
+        Number of requests handled so far.
+
+        :return: number of requests
+        """
+        return self.httpd.requests
+
+    def __len__(self) -> int:
+        return len(self.httpd.graph)
+
+    def load(self, path: str) -> int:
+        """
+        Loads the specified KG file (N-Triples, optionally gzip / zstd compressed, or any RDF format rdflib can guess,
+        e.g., the raw ontology `.owl`).
+
+        :param path: path of the KG file
+        :return: number of triples in the dataset
+        """
+        with self.httpd.lock:
+            if path.endswith((".nt", ".nt.gz", ".nt.zst")):
+                with open_n_triples(path) as f:
+                    self.httpd.graph.parse(data=f.read(), format="nt")
+            else:
+                self.httpd.graph.parse(path)
+            return len(self.httpd.graph)
+
+    def start(self) -> "StandInServer":
+        """
+        Starts serving requests in a background thread.
+
+        :return: the stand-in
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops the server and releases its port.
+        """
+        if self.thread is not None:
+            self.httpd.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-process stand-in for the Fuseki server (tests / benchmarks)')
+    parser.add_argument('--port', type=int, default=3030, help='port of the server')
+    parser.add_argument(
+        '--dataset', type=str, default=DATA_ENDPOINT.split("/")[1], help='name of the dataset, e.g., nesy_diag'
+    )
+    parser.add_argument('--load', type=str, action='append', default=[], help='KG file(s) to be loaded on startup')
+    args = parser.parse_args()
+
+    server = StandInServer(args.dataset, args.port)
+    for kg_file in args.load:
+        print("loaded", kg_file, "-", server.load(kg_file), "triples")
+    print("serving dataset", args.dataset, "at", server.url, "(Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, List, Tuple, Callable, Union, TextIO, Iterable
+
+from nesy_diag_ontology.canonical_backup import ExternalSorter
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL
+from nesy_diag_ontology.connection_controller import ConnectionController
+from nesy_diag_ontology.knowledge_graph_index import KnowledgeGraphIndex
+from nesy_diag_ontology.knowledge_snapshot import KnowledgeAccess, SNAPSHOT_LITERAL_LIMITS, iter_exports
+
+
+def local_name(iri: str) -> str:
+    """
+    Returns the local name (instance ID) of the specified IRI.
+
+    :param iri: IRI of an instance
+    :return: local name
+    """
+    return iri.split("#")[1] if "#" in iri else iri
+
+
+def first(values: List[str]) -> str:
+    """
+    Returns the first of the specified values (empty string if there is none).
+
+    :param values: query results
+    :return: first value
+    """
+    return values[0] if len(values) > 0 else ""
+
+
+def snapshot_record(concept: str, key: str, properties: Dict) -> Dict:
+    """
+    Creates a structured snapshot record for a single entity.
+
+    :param concept: concept (class) of the entity
+    :param key: key identifying the entity within its concept (name / code / instance ID)
+    :param properties: properties and relations of the entity
+    :return: snapshot record
+    """
+    return {"concept": concept, "key": key, "properties": properties}
+
+
+def error_code_records(qt: KnowledgeAccess) -> Iterator[Dict]:
+    """
+    Creates the snapshot records of the error codes.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :return: snapshot records
+    """
+    for error_code in qt.query_all_error_code_instances(False):
+        suspect_components = qt.query_suspect_components_by_error_code(error_code, False)
+        ordered_sus_comp = {
+            int(qt.query_priority_id_by_error_code_and_sus_comp(error_code, comp, False)[0]): comp
+            for comp in suspect_components
+        }
+        yield snapshot_record("ErrorCode", error_code, {
+            "fault_condition": first(qt.query_fault_condition_by_error_code(error_code, False)),
+            "diag_entities": sorted(qt.query_diag_entity_by_error_code(error_code, False)),
+            # ordered by priority
+            "suspect_components": [ordered_sus_comp[prio] for prio in sorted(ordered_sus_comp)]
+        })
+
+
+def component_records(qt: KnowledgeAccess) -> Iterator[Dict]:
+    """
+    Creates the snapshot records of the suspect components.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :return: snapshot records
+    """
+    for comp in qt.query_all_component_instances(False):
+        yield snapshot_record("SuspectComponent", comp, {
+            "affected_by": sorted(qt.query_affected_by_relations_by_suspect_component(comp, False)),
+            "verifies": sorted(qt.query_verifies_relation_by_suspect_component(comp, False))
+        })
+
+
+def component_set_records(qt: KnowledgeAccess) -> Iterator[Dict]:
+    """
+    Creates the snapshot records of the component sets.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :return: snapshot records
+    """
+    for comp_set in qt.query_all_component_set_instances(False):
+        yield snapshot_record("ComponentSet", comp_set, {
+            "verified_by": sorted(qt.query_verifies_relations_by_component_set(comp_set, False)),
+            "includes": sorted(qt.query_includes_relation_by_component_set(comp_set, False))
+        })
+
+
+def signal_records(qt: KnowledgeAccess) -> Iterator[Dict]:
+    """
+    Creates the snapshot records of the sensor signals.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :return: snapshot records
+    """
+    for signal in qt.query_all_recorded_sensor_signals(False):
+        signal_id = local_name(signal)
+        signal_str = first(qt.query_signal_by_sensor_signal_instance(signal_id, False))
+        yield snapshot_record("SensorSignal", signal_id, {"signal_excerpt": signal_str[:50]})
+
+
+def classification_reason(qt: KnowledgeAccess, classification_id: str, inspection: bool) -> str:
+    """
+    Determines the reason for the specified classification (diagnostic association or previous classification).
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :param classification_id: ID of the signal classification / manual inspection
+    :param inspection: whether it's a manual inspection
+    :return: ID of the reason
+    """
+    if inspection:
+        reason = qt.query_reason_for_inspection(classification_id, False)
+        reason = reason or qt.query_led_to_for_inspection(classification_id, False)
+    else:
+        reason = qt.query_reason_for_classification(classification_id, False)
+        reason = reason or qt.query_led_to_for_classification(classification_id, False)
+    return local_name(first(reason))
+
+
+def signal_classification_records(qt: KnowledgeAccess) -> Iterator[Dict]:
+    """
+    Creates the snapshot records of the signal classifications.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :return: snapshot records
+    """
+    for signal_classification in qt.query_all_signal_classifications(False):
+        classification_id = local_name(signal_classification)
+        heatmap_id = local_name(first(qt.query_heatmap_by_classification_instance(classification_id, False)))
+        properties = {
+            "model_id": first(qt.query_model_id_by_signal_classification_id(classification_id, False)),
+            "uncertainty": first(qt.query_uncertainty_by_signal_classification_id(classification_id, False)),
+            "classifies": local_name(
+                first(qt.query_sensor_signal_by_classification_instance(classification_id, False))
+            ),
+            "produces": heatmap_id,
+            "checks": local_name(first(qt.query_suspect_component_by_classification(classification_id, False))),
+            "reason": classification_reason(qt, classification_id, False),
+            "prediction": first(qt.query_prediction_by_classification(classification_id, False))
+        }
+        if len(heatmap_id) > 0:
+            properties["generation_method"] = first(qt.query_generation_method_by_heatmap(heatmap_id, False))
+            properties["heatmap"] = first(qt.query_heatmap_string_by_heatmap(heatmap_id, False))
+        yield snapshot_record("SignalClassification", classification_id, properties)
+
+
+def manual_inspection_records(qt: KnowledgeAccess) -> Iterator[Dict]:
+    """
+    Creates the snapshot records of the manual inspections.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :return: snapshot records
+    """
+    for manual_inspection in qt.query_all_manual_inspection_instances(False):
+        inspection_id = local_name(manual_inspection)
+        yield snapshot_record("ManualInspection", inspection_id, {
+            "checks": local_name(first(qt.query_suspect_component_by_classification(inspection_id, False))),
+            "reason": classification_reason(qt, inspection_id, True),
+            "prediction": first(qt.query_prediction_by_classification(inspection_id, False))
+        })
+
+
+def diag_log_records(qt: KnowledgeAccess) -> Iterator[Dict]:
+    """
+    Creates the snapshot records of the diagnosis logs.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :return: snapshot records
+    """
+    for diag_log in qt.query_all_diag_log_instances(False):
+        diag_log_id = local_name(diag_log)
+        yield snapshot_record("DiagLog", diag_log_id, {
+            "date": first(qt.query_date_by_diag_log(diag_log_id, False)),
+            "error_codes": sorted(local_name(ec) for ec in qt.query_error_codes_by_diag_log(diag_log_id, False)),
+            "fault_path": local_name(first(qt.query_fault_path_by_diag_log(diag_log_id, False))),
+            "diag_entity": local_name(first(qt.query_diag_entity_by_diag_log(diag_log_id, False))),
+            "diag_steps": sorted(local_name(step) for step in qt.query_diag_steps_by_diag_log(diag_log_id, False))
+        })
+
+
+def fault_path_records(qt: KnowledgeAccess) -> Iterator[Dict]:
+    """
+    Creates the snapshot records of the fault paths.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :return: snapshot records
+    """
+    for fault_path in qt.query_all_fault_path_instances(False):
+        fault_path_id = local_name(fault_path)
+        yield snapshot_record("FaultPath", fault_path_id, {
+            "description": first(qt.query_fault_path_description_by_id(fault_path_id, False)),
+            "fault_conditions": sorted(
+                first(qt.query_fault_condition_description_by_id(local_name(fc), False))
+                for fc in qt.query_resulted_in_by_fault_path(fault_path_id, False)
+            )
+        })
+
+
+def diag_entity_records(qt: KnowledgeAccess) -> Iterator[Dict]:
+    """
+    Creates the snapshot records of the diag entities.
+
+    :param qt: access to the knowledge graph - query tool or in-memory index of a bulk export
+    :return: snapshot records
+    """
+    for diag_entity_instance, entity_id in qt.query_all_diag_entity_instances(False):
+        diag_entity_id = local_name(diag_entity_instance)
+        yield snapshot_record("DiagEntity", diag_entity_id, {
+            "entity_id": entity_id,
+            "error_codes": sorted(qt.query_error_codes_recorded_in_diag_entity(diag_entity_id, False))
+        })
+
+
+THEME_RECORDS: Dict[str, List[Tuple[Callable[[KnowledgeAccess], Iterator[Dict]], List[str]]]] = {
+    'expert': [
+        (
+            error_code_records,
+            ['ErrorCode', 'FaultCondition', 'DiagnosticAssociation', 'SuspectComponent', 'DiagLog', 'DiagEntity']
+        ),
+        (component_records, ['SuspectComponent', 'ComponentSet']),
+        (component_set_records, ['SuspectComponent', 'ComponentSet'])
+    ],
+    'diag': [
+        (signal_records, ['SensorSignal']),
+        (
+            signal_classification_records,
+            ['SignalClassification', 'ManualInspection', 'DiagnosticAssociation', 'Model', 'Heatmap']
+        ),
+        (manual_inspection_records, ['ManualInspection', 'SignalClassification', 'DiagnosticAssociation']),
+        (diag_log_records, ['DiagLog', 'ErrorCode', 'SignalClassification', 'ManualInspection']),
+        (fault_path_records, ['FaultPath', 'FaultCondition']),
+        (diag_entity_records, ['DiagEntity', 'DiagLog', 'ErrorCode'])
+    ]
+}
+
+
+def sortable_record(record: Dict) -> bytes:
+    """
+    Serializes the specified record as line whose bytewise order is the order by concept and key (UTF-8 preserves
+    the code point order, NUL precedes all other characters).
+
+    :param record: snapshot record
+    :return: line to be sorted (`<concept> NUL <key> NUL <JSON record>`)
+    """
+    key = record["key"].replace("\n", "\\n")
+    return (record["concept"] + "\0" + key + "\0" + json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def generate_snapshot_records(
+        connection: Union[ConnectionController, None], themes: List[str], index: KnowledgeGraphIndex = None,
+        jobs: int = 1, max_run_bytes: int = 64 * 1024 * 1024
+) -> Iterator[Dict]:
+    """
+    Creates the structured snapshot records of the specified themes, sorted by concept and key.
+
+    The records are sorted by an external merge sort, i.e., the memory is bounded independent of the number of
+    records. At most `jobs` exports are held at a time (cf. `iter_exports`).
+
+    :param connection: connection to the knowledge graph (not needed if an index is specified)
+    :param themes: snapshot themes [expert | diag]
+    :param index: optional index of the entire KG (e.g., read from a backup) - if specified, no queries are sent
+    :param jobs: maximum number of concurrent exports
+    :param max_run_bytes: memory used for the records of a sorted run before it is spilled to disk
+    :return: sorted snapshot records (generated lazily)
+    """
+    record_functions = [entry for theme in themes for entry in THEME_RECORDS[theme]]
+    if index is None:
+        indexes = iter_exports(connection, [concepts for _, concepts in record_functions], jobs)
+    else:
+        indexes = (index for _ in record_functions)
+    with ExternalSorter(max_run_bytes) as sorter:
+        for (record_function, _), function_index in zip(record_functions, indexes):
+            for record in record_function(function_index):
+                sorter.add(sortable_record(record))
+        for line in sorter.merge():
+            yield json.loads(line.split(b"\0", 2)[2])
+
+
+def write_snapshot_records(records: Iterable[Dict], out: TextIO) -> None:
+    """
+    Writes the specified snapshot records as JSON Lines (one record per line, canonical key order).
+
+    :param records: sorted snapshot records
+    :param out: output stream
+    """
+    for record in records:
+        out.write(json.dumps(record, sort_keys=True, ensure_ascii=False) + "\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Structured knowledge snapshot - one JSON record per entity')
+    parser.add_argument(
+        '--perspective', type=str, help='perspective of snapshot [expert | diag | all]', required=False, default='all'
+    )
+    parser.add_argument('--kg-url', type=str, help='URL of the knowledge graph server', default=FUSEKI_URL)
+    parser.add_argument(
+        '--from-file', type=str, required=False, default="",
+        help='create the snapshot from the specified KG backup (.nt / .nt.gz / .nt.zst) or binary snapshot (.kgb)'
+    )
+    parser.add_argument('--jobs', type=int, help='maximum number of concurrent queries', required=False, default=4)
+    args = parser.parse_args()
+    snapshot_themes = ['expert', 'diag'] if args.perspective == 'all' else [args.perspective]
+    kg_connection, kg_index = None, None
+    if args.from_file != "":
+        # NumPy is only needed for binary snapshots
+        from nesy_diag_ontology.binary_snapshot import load_kg_file
+        # only the triples of the concepts of the generated records are indexed
+        snapshot_classes = sorted({
+            concept for theme in snapshot_themes for _, concepts in THEME_RECORDS[theme] for concept in concepts
+        })
+        kg_index = load_kg_file(args.from_file, SNAPSHOT_LITERAL_LIMITS, snapshot_classes)
+    else:
+        kg_connection = ConnectionController(namespace=ONTOLOGY_PREFIX, fuseki_url=args.kg_url, verbose=False)
+    write_snapshot_records(generate_snapshot_records(kg_connection, snapshot_themes, kg_index, args.jobs), sys.stdout)
@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import io
+import random
+import sys
+import time
+import uuid
+from typing import Iterator, List, Set, Tuple, Dict
+
+import numpy as np
+
+from nesy_diag_ontology.backup import COMPRESSION_SUFFIXES, open_compressed_writer
+from nesy_diag_ontology.config import ONTOLOGY_PREFIX
+from nesy_diag_ontology.signal_encoding import SIGNAL_ENCODINGS, encode_array
+
+RAW_ONTOLOGY = "knowledge_base/raw_nesy_diag_ontology.owl"
+RDF_TYPE = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+ARCHITECTURES = ["CNN", "RNN", "XCM", "ResNet"]
+NORMALIZATION_METHODS = ["z-norm", "min-max-norm", "none"]
+HEATMAP_METHODS = ["GradCAM", "HiResCAM", "TSInsight"]
+
+
+def ontology_terms(path: str = RAW_ONTOLOGY) -> Tuple[Set[str], Set[str]]:
+    """
+    Returns the classes and object properties (relations) defined in the specified ontology.
+
+    :param path: path of the ontology, e.g., the raw ontology `.owl`
+    :return: (local names of the classes, local names of the object properties)
+    """
+    # rdflib is only needed to check the vocabulary, not to generate the KG
+    from rdflib import Graph, RDF, OWL
+    onto = Graph()
+    onto.parse(path)
+    classes = {str(cls).split("#")[-1] for cls in onto.subjects(RDF.type, OWL.Class)}
+    relations = {str(rel).split("#")[-1] for rel in onto.subjects(RDF.type, OWL.ObjectProperty)}
+    return classes, relations
+
+
+def literal(value) -> str:
+    """
+    Returns the N-Triples representation of the specified value as entered by the `ExpertKnowledgeEnhancer` /
+    `OntologyInstanceGenerator` (rdflib literals, i.e., strings as plain literals).
+
+    :param value: literal value (str, bool, int or float)
+    :return: N-Triples literal
+    """
+    if isinstance(value, bool):
+        return '"' + str(value).lower() + '"^^<' + XSD + 'boolean>'
+    if isinstance(value, int):
+        return '"' + str(value) + '"^^<' + XSD + 'integer>'
+    if isinstance(value, float):
+        return '"' + repr(value) + '"^^<' + XSD + 'double>'
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+class SyntheticKnowledgeGraph:
+    """
+    Seedable generator of synthetic knowledge graphs (N-Triples) of configurable scale - expert knowledge (channels,
+    suspect components, subcomponents, component sets, models, error codes) and diagnosis histories of diag entities
+    (diag logs, sensor signals, heatmaps, signal classifications, manual inspections, fault paths).
+
+    The facts have the layout of the facts entered by the `ExpertKnowledgeEnhancer` / `OntologyInstanceGenerator`
+    (instance IDs, literal datatypes, relation directions) and only use classes and relations of the raw ontology.
+    The triples are generated lazily, i.e., the size of the KG is only limited by the output, e.g., tens of millions
+    of triples (roughly 35 + 10 per classification step per diagnosis).
+    """
+
+    # classes / relations instantiated by the generator (checked against the ontology)
+    CLASSES = [
+        "Channel", "SuspectComponent", "SubComponent", "ComponentSet", "Model", "InputChannelRequirement",
+        "ErrorCode", "FaultCondition", "DiagnosticAssociation", "DiagEntity", "DiagLog", "FaultPath", "SensorSignal",
+        "ParallelRecSignalSet", "Heatmap", "SignalClassification", "ManualInspection"
+    ]
+    RELATIONS = [
+        "hasChannel", "hasCOI", "elementOf", "includes", "verifies", "hasRequirement", "expects", "assesses",
+        "represents", "hasAssociation", "pointsTo", "createdFor", "appearsIn", "entails", "resultedIn", "diagStep",
+        "partOf", "overlays", "classifies", "produces", "checks", "performs", "ledTo", "reasonFor"
+    ]
+
+    def __init__(
+            self, components: int = 129, channels: int = 10, error_codes: int = 50, models: int = 0,
+            diag_entities: int = 10, diagnoses: int = 100, max_suspect_components: int = 5, signal_length: int = 500,
+            heatmap_length: int = 0, signal_encoding: str = "legacy", seed: int = 42, ontology: str = RAW_ONTOLOGY
+    ) -> None:
+        """
+        Initializes the generator.
+
+        :param components: number of suspect components
+        :param channels: number of channels
+        :param error_codes: number of error codes (each with a fault condition and 1 to `max_suspect_components`
+                            prioritized suspect components)
+        :param models: number of classification models (each assessing a distinct suspect component, default: one
+                       per second component), components without model are inspected manually
+        :param diag_entities: number of diag entities the diagnoses are distributed among (diagnosis histories)
+        :param diagnoses: number of diagnoses (diag logs)
+        :param max_suspect_components: maximum number of suspect components per error code
+        :param signal_length: number of values per sensor signal
+        :param heatmap_length: number of values per heatmap (default: signal length)
+        :param signal_encoding: representation of signals and heatmaps ("legacy" list strings, "float32" / "float16"
+                                base64-encoded typed literals), cf. `OntologyInstanceGenerator`
+        :param seed: seed of the random generators, i.e., the same parameters and seed yield the same KG
+        :param ontology: ontology whose classes and relations are used (empty: not checked)
+        """
+        assert components > 0 and channels > 0 and error_codes > 0 and diag_entities > 0
+        assert signal_encoding in SIGNAL_ENCODINGS
+        self.num_components = components
+        self.num_channels = channels
+        self.num_error_codes = error_codes
+        self.num_models = min(models if models > 0 else (components + 1) // 2, components)
+        self.num_diag_entities = diag_entities
+        self.num_diagnoses = diagnoses
+        self.max_suspect_components = max(1, min(max_suspect_components, components))
+        self.signal_length = signal_length
+        self.heatmap_length = heatmap_length if heatmap_length > 0 else signal_length
+        self.signal_encoding = signal_encoding
+        self.seed = seed
+        if ontology != "":
+            self.check_vocabulary(ontology)
+
+    def check_vocabulary(self, ontology: str) -> None:
+        """
+        Ensures that the generated classes and relations are defined in the specified ontology.
+
+        :param ontology: path of the ontology
+        """
+        classes, relations = ontology_terms(ontology)
+        unknown = [c for c in self.CLASSES if c not in classes] + [r for r in self.RELATIONS if r not in relations]
+        if len(unknown) > 0:
+            raise ValueError("terms not defined in " + ontology + ": " + ", ".join(unknown))
+
+    def triples(self) -> Iterator[str]:
+        """
+        Generates the synthetic KG - expert knowledge first, followed by the diagnosis histories.
+
+        :return: N-Triples lines
+        """
+        rand = random.Random(self.seed)
+        # signals / heatmaps are drawn from a separate generator (vectorized)
+        values = np.random.default_rng(self.seed)
+        expert = yield from self.expert_knowledge(rand)
+        yield from self.diagnosis_histories(rand, values, expert)
+
+    @staticmethod
+    def new_id(rand: random.Random, prefix: str) -> str:
+        # same shape as the IDs of the `ExpertKnowledgeEnhancer` / `OntologyInstanceGenerator` (UUID4 hex)
+        return prefix + "%032x" % rand.getrandbits(128)
+
+    @staticmethod
+    def instance(inst: str, cls: str) -> str:
+        return "<" + ONTOLOGY_PREFIX + inst + "> " + RDF_TYPE + " <" + ONTOLOGY_PREFIX + cls + "> .\n"
+
+    @staticmethod
+    def relation(subj: str, rel: str, obj: str) -> str:
+        return "<" + ONTOLOGY_PREFIX + subj + "> <" + ONTOLOGY_PREFIX + rel + "> <" + ONTOLOGY_PREFIX + obj + "> .\n"
+
+    @staticmethod
+    def prop(subj: str, prop: str, value) -> str:
+        return "<" + ONTOLOGY_PREFIX + subj + "> <" + ONTOLOGY_PREFIX + prop + "> " + literal(value) + " .\n"
+
+    def array_prop(self, subj: str, prop: str, array: np.ndarray) -> str:
+        """
+        Generates the property triple of a sensor signal / heatmap in the configured encoding.
+
+        :param subj: ID of the signal / heatmap
+        :param prop: array property (`signal` / `generated_heatmap`)
+        :param array: values
+        :return: N-Triples line
+        """
+        if self.signal_encoding == "legacy":
+            return self.prop(subj, prop, str(array.tolist()))
+        lexical, datatype = encode_array(array, self.signal_encoding)
+        return "<" + ONTOLOGY_PREFIX + subj + "> <" + ONTOLOGY_PREFIX + prop + '> "' + lexical + '"^^<' + datatype \
+            + "> .\n"
+
+    def expert_knowledge(self, rand: random.Random) -> Iterator[str]:
+        """
+        Generates the expert knowledge.
+
+        :param rand: random generator
+        :return: N-Triples lines, returns the instances the diagnoses refer to
+        """
+        channels = [self.new_id(rand, "channel_") for _ in range(self.num_channels)]
+        for idx, chan in enumerate(channels):
+            yield self.instance(chan, "Channel")
+            yield self.prop(chan, "channel_name", "CHAN" + str(idx))
+
+        comps = [self.new_id(rand, "comp_") for _ in range(self.num_components)]
+        affected_by = []
+        for idx, comp in enumerate(comps):
+            yield self.instance(comp, "SuspectComponent")
+            yield self.prop(comp, "component_name", "C" + str(idx))
+            yield self.relation(comp, "hasChannel", rand.choice(channels))
+            yield self.relation(comp, "hasCOI", rand.choice(channels))
+            # few components affect a component, ...
+            others = rand.sample(range(self.num_components), min(rand.randint(0, 3), self.num_components))
+            affected_by.append([other for other in others if other != idx])
+            for other in affected_by[-1]:
+                yield self.prop(comp, "affected_by", "C" + str(other))
+            # ... few components consist of subcomponents
+            for sub_idx in range(rand.choice([0, 0, 0, 1, 2])):
+                sub_comp = self.new_id(rand, "sub_comp_")
+                yield self.instance(sub_comp, "SubComponent")
+                yield self.prop(sub_comp, "component_name", "C" + str(idx) + "_" + str(sub_idx))
+                yield self.relation(sub_comp, "elementOf", comp)
+                yield self.relation(sub_comp, "hasChannel", rand.choice(channels))
+                yield self.relation(sub_comp, "hasCOI", rand.choice(channels))
+
+        for idx in range(max(1, self.num_components // 10)):
+            comp_set = self.new_id(rand, "component_set_")
+            yield self.instance(comp_set, "ComponentSet")
+            yield self.prop(comp_set, "set_name", "S" + str(idx))
+            for comp in rand.sample(comps, min(5, self.num_components)):
+                yield self.relation(comp_set, "includes", comp)
+            yield self.relation(rand.choice(comps), "verifies", comp_set)
+
+        # model per classified component: (model instance, number of input channels)
+        models: Dict[int, Tuple[str, int]] = {}
+        for idx, comp_idx in enumerate(rand.sample(range(self.num_components), self.num_models)):
+            model = self.new_id(rand, "model_")
+            yield self.instance(model, "Model")
+            yield self.prop(model, "input_shape", self.signal_length)
+            yield self.prop(model, "exp_normalization_method", rand.choice(NORMALIZATION_METHODS))
+            yield self.prop(model, "measuring_instruction", "measure C" + str(comp_idx) + " (CHAN " + str(idx) + ")")
+            yield self.prop(model, "model_id", "M" + str(idx))
+            yield self.prop(model, "architecture", rand.choice(ARCHITECTURES))
+            input_channels = rand.sample(channels, min(rand.choice([1, 1, 2, 4]), self.num_channels))
+            for chan_idx, chan in enumerate(input_channels):
+                input_chan_req = self.new_id(rand, "input_chan_req_")
+                yield self.instance(input_chan_req, "InputChannelRequirement")
+                yield self.prop(input_chan_req, "channel_idx", chan_idx)
+                yield self.relation(input_chan_req, "expects", chan)
+                yield self.relation(model, "hasRequirement", input_chan_req)
+            yield self.relation(model, "assesses", comps[comp_idx])
+            models[comp_idx] = (model, len(input_channels))
+
+        # error code: (error code instance, fault condition instance, [(diag association, component index)])
+        error_codes: List[Tuple[str, str, List[Tuple[str, int]]]] = []
+        for idx in range(self.num_error_codes):
+            error_code, fault_cond = self.new_id(rand, "error_code_"), self.new_id(rand, "fault_cond_")
+            yield self.instance(error_code, "ErrorCode")
+            yield self.prop(error_code, "code", "E" + str(idx))
+            yield self.instance(fault_cond, "FaultCondition")
+            yield self.prop(fault_cond, "condition_desc", "fault condition of E" + str(idx))
+            yield self.relation(error_code, "represents", fault_cond)
+            associations = []
+            suspects = rand.sample(range(self.num_components), rand.randint(1, self.max_suspect_components))
+            for prio, comp_idx in enumerate(suspects):
+                diag_association = self.new_id(rand, "diag_association_")
+                yield self.instance(diag_association, "DiagnosticAssociation")
+                yield self.relation(error_code, "hasAssociation", diag_association)
+                yield self.prop(diag_association, "priority_id", prio)
+                yield self.relation(diag_association, "pointsTo", comps[comp_idx])
+                associations.append((diag_association, comp_idx))
+            error_codes.append((error_code, fault_cond, associations))
+        return comps, affected_by, models, error_codes
+
+    def diagnosis_histories(self, rand: random.Random, values: np.random.Generator, expert: Tuple) -> Iterator[str]:
+        """
+        Generates the diagnoses - each diag log covers one to three error codes of a diag entity. The suspect
+        components of the first error code are checked in the order of their priority (signal classification if
+        there is a model for the component, manual inspection otherwise) until an anomaly is found, which is traced
+        back along the components affecting the anomalous one (fault path).
+
+        :param rand: random generator
+        :param values: random generator of the signals / heatmaps
+        :param expert: instances of the expert knowledge
+        :return: N-Triples lines
+        """
+        comps, affected_by, models, error_codes = expert
+        diag_entities = []
+        for _ in range(self.num_diag_entities):
+            # the `OntologyInstanceGenerator` uses the UUID string (not hex) for diag entities
+            diag_entity = "diag_entity_" + str(uuid.UUID(int=rand.getrandbits(128), version=4))
+            yield self.instance(diag_entity, "DiagEntity")
+            yield self.prop(diag_entity, "entity_id", "ENTITY" + "%010X" % rand.getrandbits(40))
+            diag_entities.append(diag_entity)
+        time_axis = np.linspace(0, 8 * np.pi, self.signal_length)
+
+        for _ in range(self.num_diagnoses):
+            diag_log = self.new_id(rand, "diag_log_")
+            yield self.instance(diag_log, "DiagLog")
+            yield self.prop(diag_log, "date", "%02d.%02d.%d" % (
+                rand.randint(1, 28), rand.randint(1, 12), rand.randint(2020, 2025)
+            ))
+            yield self.relation(diag_log, "createdFor", rand.choice(diag_entities))
+            codes = rand.sample(error_codes, rand.choice([1, 1, 1, 2, 3]))
+            for error_code, _, _ in codes:
+                yield self.relation(error_code, "appearsIn", diag_log)
+
+            # check suspect components (by priority) until an anomaly is found, then follow the affecting components
+            pending = [(comp_idx, diag_association) for diag_association, comp_idx in codes[0][2]]
+            fault_path, visited = [], set()
+            while len(pending) > 0:
+                comp_idx, reason = pending.pop(0)
+                if comp_idx in visited:
+                    continue
+                visited.add(comp_idx)
+                anomaly = rand.random() < 0.4
+                if comp_idx in models:
+                    classification = self.new_id(rand, "signal_classification_")
+                    yield from self.signal_classification(
+                        rand, values, time_axis, classification, models[comp_idx], anomaly
+                    )
+                else:
+                    classification = self.new_id(rand, "manual_inspection_")
+                    yield self.instance(classification, "ManualInspection")
+                    yield self.prop(classification, "prediction", anomaly)
+                yield self.relation(classification, "checks", comps[comp_idx])
+                yield self.relation(reason, "ledTo" if reason.startswith("diag_association_") else "reasonFor",
+                                    classification)
+                yield self.relation(classification, "diagStep", diag_log)
+                if anomaly:
+                    fault_path.append(comp_idx)
+                    pending = [(other, classification) for other in affected_by[comp_idx]]
+            if len(fault_path) > 0:
+                path = self.new_id(rand, "fault_path_")
+                yield self.instance(path, "FaultPath")
+                yield self.prop(path, "fault_path_desc", " -> ".join("C" + str(c) for c in reversed(fault_path)))
+                yield self.relation(codes[0][1], "resultedIn", path)
+                yield self.relation(diag_log, "entails", path)
+
+    def signal_classification(
+            self, rand: random.Random, values: np.random.Generator, time_axis: np.ndarray, classification: str,
+            model: Tuple[str, int], anomaly: bool
+    ) -> Iterator[str]:
+        """
+        Generates a signal classification including its (parallel recorded) sensor signals and heatmaps.
+
+        :param rand: random generator
+        :param values: random generator of the signals / heatmaps
+        :param time_axis: time axis of the signals
+        :param classification: ID of the classification instance
+        :param model: (model instance, number of input channels)
+        :param anomaly: prediction of the classification
+        :return: N-Triples lines
+        """
+        model_instance, num_channels = model
+        yield self.instance(classification, "SignalClassification")
+        yield self.prop(classification, "prediction", anomaly)
+        yield self.prop(classification, "uncertainty", round(rand.random() * 0.5, 2))
+        yield self.relation(model_instance, "performs", classification)
+        signal_set = ""
+        if num_channels > 1:
+            signal_set = self.new_id(rand, "parallel_rec_signal_set_")
+            yield self.instance(signal_set, "ParallelRecSignalSet")
+        heatmap_method = rand.choice(HEATMAP_METHODS)
+        for _ in range(num_channels):
+            signal, heatmap = self.new_id(rand, "sensor_signal_"), self.new_id(rand, "heatmap_")
+            # noisy oscillation (with a distortion in case of an anomaly)
+            samples = values.uniform(5, 15) + values.uniform(1, 5) * np.sin(time_axis + values.uniform(0, np.pi)) \
+                + values.normal(0, 0.3, self.signal_length)
+            if anomaly:
+                start = int(values.integers(0, max(1, self.signal_length // 2)))
+                samples[start:start + self.signal_length // 10] *= values.uniform(0.2, 0.6)
+            yield self.instance(signal, "SensorSignal")
+            yield self.array_prop(signal, "signal", np.round(samples, 2))
+            if signal_set != "":
+                yield self.relation(signal, "partOf", signal_set)
+            yield self.instance(heatmap, "Heatmap")
+            yield self.prop(heatmap, "generation_method", heatmap_method)
+            yield self.array_prop(heatmap, "generated_heatmap", np.round(values.random(self.heatmap_length), 2))
+            yield self.relation(heatmap, "overlays", signal)
+            yield self.relation(classification, "classifies", signal)
+            yield self.relation(classification, "produces", heatmap)
+
+    def write(self, path: str, compression: str = "") -> int:
+        """
+        Streams the synthetic KG into the specified file.
+
+        :param path: path of the N-Triples file (`-`: stdout)
+        :param compression: compression [gzip | zstd | none] (default: derived from the file extension)
+        :return: number of triples
+        """
+        if compression == "":
+            compression = "gzip" if path.endswith(".gz") else "zstd" if path.endswith(".zst") else "none"
+        num_triples = 0
+        if path == "-":
+            for num_triples, line in enumerate(self.triples(), 1):
+                sys.stdout.write(line)
+            return num_triples
+        with open(path, "wb") as f:
+            writer = open_compressed_writer(f, compression)
+            # batch the lines (far fewer writes / compressor calls)
+            batch = io.StringIO()
+            for num_triples, line in enumerate(self.triples(), 1):
+                batch.write(line)
+                if num_triples % 10000 == 0:
+                    writer.write(batch.getvalue().encode("utf-8"))
+                    batch = io.StringIO()
+            writer.write(batch.getvalue().encode("utf-8"))
+            if writer is not f:
+                writer.close()
+        return num_triples
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Seedable generator of synthetic knowledge graphs (N-Triples)')
+    parser.add_argument('output', type=str, help='N-Triples file (.nt / .nt.gz / .nt.zst, -: stdout)')
+    parser.add_argument('--components', type=int, default=129, help='number of suspect components')
+    parser.add_argument('--channels', type=int, default=10, help='number of channels')
+    parser.add_argument('--error-codes', type=int, default=50, help='number of error codes')
+    parser.add_argument('--models', type=int, default=0, help='number of models (default: half of the components)')
+    parser.add_argument('--diag-entities', type=int, default=10, help='number of diag entities')
+    parser.add_argument('--diagnoses', type=int, default=100, help='number of diagnoses (diag logs)')
+    parser.add_argument('--max-suspect-components', type=int, default=5, help='suspect components per error code')
+    parser.add_argument('--signal-length', type=int, default=500, help='number of values per sensor signal')
+    parser.add_argument('--heatmap-length', type=int, default=0, help='values per heatmap (default: signal length)')
+    parser.add_argument(
+        '--signal-encoding', type=str, choices=SIGNAL_ENCODINGS, default="legacy", help='encoding of signals / heatmaps'
+    )
+    parser.add_argument('--seed', type=int, default=42, help='seed of the random generators')
+    parser.add_argument('--ontology', type=str, default=RAW_ONTOLOGY, help='ontology (vocabulary check)')
+    parser.add_argument(
+        '--compression', type=str, choices=list(COMPRESSION_SUFFIXES), default="", help='default: by file extension'
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    triple_count = SyntheticKnowledgeGraph(
+        args.components, args.channels, args.error_codes, args.models, args.diag_entities, args.diagnoses,
+        args.max_suspect_components, args.signal_length, args.heatmap_length, args.signal_encoding, args.seed,
+        args.ontology
+    ).write(args.output, args.compression)
+    if args.output != "-":
+        print("generated", triple_count, "triples in", round(time.perf_counter() - start, 1), "s")
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import functools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, TextIO, Union
+
+from nesy_diag_ontology.config import TRACE_FILE
+
+SERVICE_NAME = "nesy_diag_ontology"
+# OTLP span kinds / status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """
+    Timed operation within a trace (OpenTelemetry data model).
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: str, kind: int, attributes: Dict[str, Any]) -> None:
+        """
+        Initializes (starts) the span.
+
+        :param name: name of the span, e.g., KnowledgeGraphQueryTool.query_fault_condition_by_error_code
+        :param trace_id: ID of the trace (32 hex digits)
+        :param parent_id: ID of the parent span (16 hex digits), empty for root spans
+        :param kind: span kind (OTLP), e.g., `SPAN_KIND_CLIENT` for HTTP requests
+        :param attributes: attributes of the span
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.status = STATUS_OK
+        self.status_message = ""
+        self.start = time.time_ns()
+        self.end = 0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict:
+        """
+        Returns the span in the OTLP JSON encoding.
+
+        :return: OTLP span
+        """
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [{"key": key, "value": otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status, **({"message": self.status_message} if self.status_message else {})}
+        }
+        if self.parent_id != "":
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class NoOpSpan:
+    """
+    Span returned while tracing is disabled - ignores all attributes.
+    """
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NO_OP_SPAN = NoOpSpan()
+
+
+def otlp_value(value: Any) -> Dict:
+    """
+    Returns the specified attribute value in the OTLP JSON encoding (64-bit integers as strings).
+
+    :param value: attribute value
+    :return: OTLP any value
+    """
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    """
+    Records hierarchical spans per thread and exports each finished trace (root span including all descendants of
+    the thread) as one line of a JSON Lines file in the OTLP JSON layout (`ExportTraceServiceRequest`, as written by
+    the file exporter of the OpenTelemetry collector).
+
+    While tracing is disabled, opening a span costs a single attribute check.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.out: Union[TextIO, None] = None
+        self.lock = threading.Lock()
+        # spans currently open in the thread (outermost first) and finished spans of the thread's current trace
+        self.local = threading.local()
+
+    def enable(self, path: str) -> None:
+        """
+        Enables tracing - the traces are appended to the specified file.
+
+        :param path: path of the trace file (JSON Lines)
+        """
+        with self.lock:
+            if self.out is not None:
+                self.out.close()
+            self.out = open(path, "a", encoding="utf-8")
+            self.enabled = True
+
+    def disable(self) -> None:
+        """
+        Disables tracing and closes the trace file (traces still open are discarded).
+        """
+        with self.lock:
+            self.enabled = False
+            if self.out is not None:
+                self.out.close()
+                self.out = None
+
+    def open_spans(self) -> List[Span]:
+        spans = getattr(self.local, "spans", None)
+        if spans is None:
+            spans = self.local.spans = []
+            self.local.finished = []
+        return spans
+
+    def start_span(self, name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Dict[str, Any] = None) -> Span:
+        """
+        Starts a span as child of the thread's current span (or as root of a new trace).
+
+        :param name: name of the span
+        :param kind: span kind (OTLP)
+        :param attributes: attributes of the span
+        :return: started span
+        """
+        spans = self.open_spans()
+        if len(spans) > 0:
+            span = Span(name, spans[-1].trace_id, spans[-1].span_id, kind, attributes or {})
+        else:
+            span = Span(name, "%032x" % random.getrandbits(128), "", kind, attributes or {})
+        spans.append(span)
+        return span
+
+    def end_span(self, span: Span, error: BaseException = None) -> None:
+        """
+        Ends the specified span (the thread's current one) - the trace is exported once its root span ended.
+
+        :param span: span to be ended
+        :param error: exception raised within the span, if any
+        """
+        span.end = time.time_ns()
+        if error is not None:
+            span.status, span.status_message = STATUS_ERROR, type(error).__name__ + ": " + str(error)[:200]
+        spans = self.open_spans()
+        spans.pop()
+        self.local.finished.append(span)
+        if len(spans) == 0:
+            finished, self.local.finished = self.local.finished, []
+            self.export(finished)
+
+    def export(self, spans: List[Span]) -> None:
+        """
+        Appends the specified spans (one trace) to the trace file.
+
+        :param spans: finished spans
+        """
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": [span.to_otlp() for span in spans]}]
+        }]})
+        with self.lock:
+            if self.out is not None:
+                self.out.write(line + "\n")
+                self.out.flush()
+
+    def current_span(self) -> Union[Span, NoOpSpan]:
+        """
+        Returns the thread's current span.
+
+        :return: current span (no-op span if there is none or tracing is disabled)
+        """
+        spans = getattr(self.local, "spans", None)
+        return spans[-1] if self.enabled and spans else NO_OP_SPAN
+
+
+TRACER = Tracer()
+if TRACE_FILE != "":
+    TRACER.enable(TRACE_FILE)
+
+
+def enable_tracing(path: str) -> None:
+    """
+    Enables tracing - each finished trace is appended to the specified file (OTLP JSON Lines).
+
+    :param path: path of the trace file
+    """
+    TRACER.enable(path)
+
+
+def disable_tracing() -> None:
+    """
+    Disables tracing and closes the trace file.
+    """
+    TRACER.disable()
+
+
+@contextmanager
+def span(
+        name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Dict[str, Any] = None
+) -> Iterator[Union[Span, NoOpSpan]]:
+    """
+    Traces the enclosed block as span (child of the thread's current span).
+
+    :param name: name of the span
+    :param kind: span kind (OTLP)
+    :param attributes: attributes of the span
+    :return: span (no-op span while tracing is disabled)
+    """
+    if not TRACER.enabled:
+        yield NO_OP_SPAN
+        return
+    current = TRACER.start_span(name, kind, attributes)
+    try:
+        yield current
+    except BaseException as e:
+        TRACER.end_span(current, e)
+        raise
+    TRACER.end_span(current)
+
+
+def current_span() -> Union[Span, NoOpSpan]:
+    """
+    Returns the current span of the calling thread, e.g., to attach attributes.
+
+    :return: current span (no-op span while tracing is disabled)
+    """
+    return TRACER.current_span()
+
+
+def traced(name: str, func: Callable) -> Callable:
+    """
+    Wraps the specified function such that each call is traced as span (result size as attribute, if any).
+
+    :param name: name of the span, e.g., KnowledgeGraphQueryTool.query_fault_condition_by_error_code
+    :param func: function to be traced
+    :return: traced function
+    """
+    namespace, _, function = name.rpartition(".")
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not TRACER.enabled:
+            return func(*args, **kwargs)
+        current = TRACER.start_span(name, SPAN_KIND_INTERNAL, {"code.namespace": namespace, "code.function": function})
+        try:
+            res = func(*args, **kwargs)
+        except BaseException as e:
+            TRACER.end_span(current, e)
+            raise
+        if isinstance(res, (list, tuple, dict)):
+            current.set_attribute("result.size", len(res))
+        TRACER.end_span(current)
+        return res
+
+    return wrapper
+
+
+def summarize_traces(path: str) -> List[Dict]:
+    """
+    Aggregates the spans of the specified trace file by name - total time and self time (without child spans).
+
+    :param path: path of the trace file (OTLP JSON Lines)
+    :return: statistics per span name, sorted by self time (descending)
+    """
+    stats = defaultdict(lambda: {"count": 0, "errors": 0, "total_ms": 0.0, "self_ms": 0.0})
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            spans = [
+                s for resource in json.loads(line)["resourceSpans"] for scope in resource["scopeSpans"]
+                for s in scope["spans"]
+            ]
+            durations = {s["spanId"]: (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6 for s in spans}
+            child_time = defaultdict(float)
+            for s in spans:
+                if "parentSpanId" in s:
+                    child_time[s["parentSpanId"]] += durations[s["spanId"]]
+            for s in spans:
+                entry = stats[s["name"]]
+                entry["count"] += 1
+                entry["errors"] += s["status"]["code"] == STATUS_ERROR
+                entry["total_ms"] += durations[s["spanId"]]
+                entry["self_ms"] += durations[s["spanId"]] - child_time[s["spanId"]]
+    return sorted(({"name": name, **entry} for name, entry in stats.items()), key=lambda entry: -entry["self_ms"])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summary of a trace file - where did the time go (self time per span)')
+    parser.add_argument('trace_file', type=str, help='trace file (OTLP JSON Lines)')
+    parser.add_argument('--top', type=int, default=25, help='number of presented span names')
+    args = parser.parse_args()
+
+    print("self ms\t\ttotal ms\tcount\terrors\tspan")
+    for span_stats in summarize_traces(args.trace_file)[:args.top]:
+        print(
+            str(round(span_stats["self_ms"], 2)) + "\t\t" + str(round(span_stats["total_ms"], 2)) + "\t\t"
+            + str(span_stats["count"]) + "\t" + str(span_stats["errors"]) + "\t" + span_stats["name"]
+        )
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @author Tim Bohne
+
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Callable, Iterator, List, Set, Tuple
+
+from nesy_diag_ontology.config import WAL_RETRY_BACKOFF_S, WAL_MAX_BACKOFF_S
+
+
+class WriteAheadLog:
+    """
+    Append-only local log of fact batches (N-Triples) to be entered into the knowledge graph.
+
+    Batches are appended to segment files and fsync'd before their upload is attempted (concurrent writers share an
+    fsync, i.e., group commit). A checkpoint keeps track of the batches that have been uploaded successfully, i.e.,
+    pending batches survive server outages as well as crashes of the writing process and can be replayed in bulk once
+    the server is reachable again. Re-uploading an already committed batch is harmless, since inserting a triple twice
+    does not change the knowledge graph. While the server is unreachable, replays are attempted with exponential
+    backoff instead of with every appended batch.
+    """
+
+    def __init__(self, log_dir: str, max_segment_bytes: int = 64 * 1024 * 1024) -> None:
+        """
+        Initializes the write-ahead log - recovers the state of an existing log in the specified directory.
+
+        :param log_dir: directory containing the log segments and the checkpoint
+        :param max_segment_bytes: size after which a new segment is started
+        """
+        self.log_dir = log_dir
+        self.max_segment_bytes = max_segment_bytes
+        self.lock = threading.Lock()
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.checkpoint = self.read_checkpoint()
+        # batches that were uploaded while an earlier one is still pending
+        self.uploaded_ahead: Set[int] = set()
+        self.last_seq = self.checkpoint
+        for _, record_seq, _ in self.read_records(self.checkpoint):
+            self.last_seq = max(self.last_seq, record_seq)
+        # sequence number up to which the log is fsync'd
+        self.synced_seq = self.last_seq
+        self.sync_lock = threading.Lock()
+        # backoff of replay attempts after failed uploads
+        self.backoff_s = 0.0
+        self.retry_at = 0.0
+        # always start a new segment after recovery
+        self.segment = None
+        self.start_segment()
+
+    def get_segments(self) -> List[Tuple[int, str]]:
+        """
+        Returns the log segments ordered by the sequence number of their first batch.
+
+        :return: list of (first sequence number, path) tuples
+        """
+        segments = []
+        for name in os.listdir(self.log_dir):
+            if name.startswith("segment_") and name.endswith(".log"):
+                segments.append((int(name[len("segment_"):-len(".log")]), os.path.join(self.log_dir, name)))
+        return sorted(segments)
+
+    def start_segment(self) -> None:
+        """
+        Closes the current segment (if any) and starts a new one.
+        """
+        if self.segment is not None:
+            self.sync()
+            self.segment.close()
+        path = os.path.join(self.log_dir, "segment_" + str(self.last_seq + 1).zfill(12) + ".log")
+        torn = False
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self.segment = open(path, "a", encoding="utf-8")
+        if torn:
+            # terminate the torn record so that it is skipped instead of corrupting the next one
+            self.segment.write("\n")
+
+    def read_checkpoint(self) -> int:
+        """
+        Reads the sequence number up to which all batches have been uploaded.
+
+        :return: checkpoint sequence number (0 if nothing has been uploaded yet)
+        """
+        path = os.path.join(self.log_dir, "checkpoint")
+        if not os.path.isfile(path):
+            return 0
+        with open(path, "r") as f:
+            return int(f.read().strip() or 0)
+
+    def write_checkpoint(self) -> None:
+        """
+        Atomically persists the current checkpoint and removes segments that only contain uploaded batches.
+        """
+        path = os.path.join(self.log_dir, "checkpoint")
+        with open(path + ".tmp", "w") as f:
+            f.write(str(self.checkpoint))
+        os.replace(path + ".tmp", path)
+        segments = self.get_segments()
+        for (first_seq, seg_path), (next_first_seq, _) in zip(segments, segments[1:]):
+            if next_first_seq - 1 <= self.checkpoint and seg_path != self.segment.name:
+                os.remove(seg_path)
+
+    def read_records(self, after_seq: int) -> Iterator[Tuple[str, int, str]]:
+        """
+        Iterates over the logged batches with a sequence number greater than the specified one.
+
+        :param after_seq: sequence number after which the batches are returned
+        :return: (segment path, sequence number, N-Triples data) tuples in log order
+        """
+        for _, path in self.get_segments():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # torn write of a crashed process - the batch was never acknowledged
+                        continue
+                    if record["seq"] > after_seq:
+                        yield path, record["seq"], record["data"]
+
+    def append(self, data: str) -> int:
+        """
+        Appends the specified batch to the log.
+
+        The batch is handed to the OS right away (i.e., it survives crashes of the writing process), `sync_until`
+        makes it durable.
+
+        :param data: N-Triples serialization of the fact batch
+        :return: sequence number of the batch
+        """
+        with self.lock:
+            self.last_seq += 1
+            self.segment.write(json.dumps({"seq": self.last_seq, "data": data}) + "\n")
+            self.segment.flush()
+            if self.segment.tell() >= self.max_segment_bytes:
+                self.start_segment()
+            return self.last_seq
+
+    def sync_until(self, seq: int) -> None:
+        """
+        Makes sure that the batch with the specified sequence number is fsync'd - batches appended concurrently in the
+        meantime are covered by the same fsync (group commit).
+
+        :param seq: sequence number of the batch
+        """
+        with self.sync_lock:
+            if self.synced_seq >= seq:
+                return
+            with self.lock:
+                self.sync()
+
+    def sync(self) -> None:
+        """
+        Flushes the current segment to disk.
+        """
+        self.segment.flush()
+        os.fsync(self.segment.fileno())
+        self.synced_seq = self.last_seq
+
+    def upload_failed(self) -> None:
+        """
+        Records a failed upload - further replays are only attempted after the (exponentially growing) backoff.
+        """
+        with self.lock:
+            self.backoff_s = min(WAL_MAX_BACKOFF_S, max(WAL_RETRY_BACKOFF_S, 2 * self.backoff_s))
+            self.retry_at = time.monotonic() + self.backoff_s
+
+    def replay_due(self) -> bool:
+        """
+        Checks whether the backoff after the last failed upload has expired.
+
+        :return: whether a replay should be attempted
+        """
+        with self.lock:
+            return time.monotonic() >= self.retry_at
+
+    def mark_uploaded(self, seq: int) -> None:
+        """
+        Marks the batch with the specified sequence number as uploaded and advances the checkpoint if possible.
+
+        :param seq: sequence number of the uploaded batch
+        """
+        with self.lock:
+            if seq <= self.checkpoint:
+                return
+            self.uploaded_ahead.add(seq)
+            advanced = False
+            while self.checkpoint + 1 in self.uploaded_ahead:
+                self.checkpoint += 1
+                self.uploaded_ahead.remove(self.checkpoint)
+                advanced = True
+            if advanced:
+                self.write_checkpoint()
+
+    def is_uploaded(self, seq: int) -> bool:
+        """
+        Checks whether the batch with the specified sequence number has been uploaded.
+
+        :param seq: sequence number of the batch
+        :return: whether the batch has been uploaded
+        """
+        with self.lock:
+            return seq <= self.checkpoint or seq in self.uploaded_ahead
+
+    def has_pending(self, before_seq: int = None) -> bool:
+        """
+        Checks whether there are batches that have not been uploaded yet.
+
+        :param before_seq: if specified, only batches with a smaller sequence number are considered
+        :return: whether there are pending batches
+        """
+        with self.lock:
+            last = self.last_seq if before_seq is None else before_seq - 1
+            return any(seq not in self.uploaded_ahead for seq in range(self.checkpoint + 1, last + 1))
+
+    def replay(self, upload: Callable[[str], bool], max_batch_bytes: int = 32 * 1024 * 1024) -> int:
+        """
+        Uploads all pending batches, concatenated into uploads of bounded size, in log order.
+
+        Stops at the first failed upload - the remaining batches stay pending and the backoff is increased.
+
+        :param upload: function uploading N-Triples data, returns whether the upload was successful
+        :param max_batch_bytes: maximum size of a single upload
+        :return: number of replayed batches
+        """
+        with self.lock:
+            self.sync()
+            checkpoint = self.checkpoint
+        replayed = 0
+        chunk, chunk_seqs, chunk_size = [], [], 0
+        for _, seq, data in self.read_records(checkpoint):
+            if chunk_size + len(data) > max_batch_bytes and len(chunk) > 0:
+                if not upload("".join(chunk)):
+                    self.upload_failed()
+                    return replayed
+                for s in chunk_seqs:
+                    self.mark_uploaded(s)
+                replayed += len(chunk_seqs)
+                chunk, chunk_seqs, chunk_size = [], [], 0
+            chunk.append(data if data.endswith("\n") else data + "\n")
+            chunk_seqs.append(seq)
+            chunk_size += len(data)
+        if len(chunk) > 0:
+            if not upload("".join(chunk)):
+                self.upload_failed()
+                return replayed
+            for s in chunk_seqs:
+                self.mark_uploaded(s)
+            replayed += len(chunk_seqs)
+        with self.lock:
+            self.backoff_s, self.retry_at = 0.0, 0.0
+        return replayed
+
+    def close(self) -> None:
+        """
+        Syncs and closes the current segment.
+        """
+        with self.lock:
+            self.sync()
+            self.segment.close()
+
+
+if __name__ == '__main__':
+    from nesy_diag_ontology.config import ONTOLOGY_PREFIX, FUSEKI_URL
+    from nesy_diag_ontology.connection_controller import ConnectionController
+
+    parser = argparse.ArgumentParser(description='Replays the pending batches of a KG write-ahead log')
+    parser.add_argument('--wal-dir', type=str, required=True, help='directory of the write-ahead log')
+    parser.add_argument('--kg-url', type=str, default=FUSEKI_URL, help='URL of the knowledge graph server')
+    args = parser.parse_args()
+    connection = ConnectionController(ONTOLOGY_PREFIX, args.kg_url, write_ahead_log=WriteAheadLog(args.wal_dir))
+    print("replayed batches:", connection.replay_write_ahead_log())